@@ -0,0 +1,78 @@
+import threading
+import time
+
+
+def routing_key(payload):
+    # The ID a payload is routed on: action_id for block actions and suggestions,
+    # callback_id for modal submissions
+    payload_type = payload.get("type")
+    if payload_type in ("block_actions", "block_suggestion"):
+        actions = payload.get("actions") or [payload]
+        return payload_type, actions[0].get("action_id")
+    if payload_type in ("view_submission", "view_closed"):
+        return payload_type, payload.get("view", {}).get("callback_id")
+    return payload_type, None
+
+
+# Handler table for /slack/actions keyed by (payload type, action/callback ID).
+# Exact IDs are a single dict lookup; prefix routes (e.g. view_profile_button1..5)
+# are only checked when no exact route matches. Each handler's latency is recorded.
+class ActionRouter:
+    def __init__(self):
+        self._routes = {}
+        self._prefix_routes = []
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.unhandled = 0
+
+    def route(self, payload_type, key=None, prefix=None):
+        def register(handler):
+            if prefix is not None:
+                self._prefix_routes.append((payload_type, prefix, handler))
+            else:
+                self._routes[(payload_type, key)] = handler
+            return handler
+        return register
+
+    def resolve(self, payload_type, key):
+        handler = self._routes.get((payload_type, key))
+        if handler is None and key:
+            for route_type, prefix, prefix_handler in self._prefix_routes:
+                if route_type == payload_type and key.startswith(prefix):
+                    return prefix_handler
+        return handler
+
+    def handles(self, payload):
+        # Cheap check used to ack unknown payloads without queueing them
+        if self.resolve(*routing_key(payload)) is not None:
+            return True
+        with self._lock:
+            self.unhandled += 1
+        return False
+
+    def dispatch(self, payload):
+        # Returns the handler's response, or None when nothing is registered for the payload
+        payload_type, key = routing_key(payload)
+        handler = self.resolve(payload_type, key)
+        if handler is None:
+            with self._lock:
+                self.unhandled += 1
+            return None
+
+        started_at = time.perf_counter()
+        try:
+            return handler(payload)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            with self._lock:
+                stats = self._stats.setdefault(handler.__name__, {"calls": 0, "time_total": 0.0, "time_max": 0.0})
+                stats["calls"] += 1
+                stats["time_total"] += elapsed
+                stats["time_max"] = max(stats["time_max"], elapsed)
+
+    def stats(self):
+        with self._lock:
+            handlers = {}
+            for name, stats in self._stats.items():
+                handlers[name] = dict(stats, time_avg=stats["time_total"] / stats["calls"])
+            return {"handlers": handlers, "unhandled": self.unhandled}
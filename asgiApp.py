@@ -0,0 +1,275 @@
+# ASGI entry point: serves /slack/events and /slack/actions on an event loop.
+#
+#   uvicorn asgiApp:app --port 5002
+#
+# The loop verifies, parses and acks each request; the existing handlers from bot.py run
+# on a bounded thread pool, so a slow Slack or DB call never holds up the next request.
+# ASGI_EVENTS / ASGI_ACTIONS switch each endpoint independently (both on by default);
+# any route that isn't switched, and everything else, is served by the Flask app.
+# With ASGI_ASYNC_DB (on by default) the profiles a handler is about to read are loaded
+# on the loop through the async DB pool first, so the handler thread finds them cached.
+# That prefetch is the only async I/O: the handlers themselves still make blocking Slack
+# calls (users.info, views.open/update/push, chat.*), each holding a pool thread until it
+# returns. So the loop keeps acking under load, but handler throughput is still capped at
+# ASGI_HANDLER_THREADS concurrent Slack calls, as it is under the Flask server.
+# At most ASGI_HANDLER_BACKLOG acked requests wait for or run on that pool; past it new
+# events get a 503 (Slack retries them later) and actions go to the action queue if it's
+# enabled, else get a 503 too, rather than piling up in the pool's unbounded queue.
+import asyncio
+import contextvars
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+import bot
+import sqlConnector
+
+ASGI_EVENTS = os.environ.get("ASGI_EVENTS", "1") == "1"
+ASGI_ACTIONS = os.environ.get("ASGI_ACTIONS", "1") == "1"
+ASGI_ASYNC_DB = os.environ.get("ASGI_ASYNC_DB", "1") == "1"
+
+handler_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("ASGI_HANDLER_THREADS", 32)),
+    thread_name_prefix="asgi-handler"
+)
+wsgi_app = WsgiToAsgi(bot.app)
+pending_tasks = set()
+
+# Requests accepted for the handler pool that haven't finished; only touched on the loop
+ASGI_HANDLER_BACKLOG = int(os.environ.get("ASGI_HANDLER_BACKLOG", 256))
+backlog = 0
+backlog_rejected = 0
+
+
+def reserve_slot():
+    global backlog, backlog_rejected
+    if backlog >= ASGI_HANDLER_BACKLOG:
+        backlog_rejected += 1
+        return False
+    backlog += 1
+    return True
+
+
+def release_slot():
+    global backlog
+    backlog -= 1
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def respond(send, status, body=b"", content_type="text/plain"):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def is_verified(body, headers):
+    # The verifier decodes the body as UTF-8; a body that isn't can't have come from Slack
+    try:
+        return bot.signature_verifier.is_valid_request(body, headers)
+    except UnicodeDecodeError:
+        return False
+
+
+def run_in_background(func, *args):
+    # Fire-and-forget on the handler pool, carrying context variables into the thread
+    context = contextvars.copy_context()
+    future = asyncio.get_running_loop().run_in_executor(handler_pool, context.run, func, *args)
+    future.add_done_callback(log_failure)
+    return future
+
+
+async def prefetch_profiles(team_id, user_ids):
+    # Concurrency is bounded by the async pool, not by threads
+    if not ASGI_ASYNC_DB or not team_id:
+        return
+    results = await asyncio.gather(
+        *(sqlConnector.load_profile_from_db_async(user_id, team_id) for user_id in user_ids if user_id),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Error prefetching profile: {result}")
+
+
+def profiles_for_event(event_data):
+    event = event_data.get("event", {})
+    if event.get("type") == "app_home_opened":
+        return [event.get("user")]
+    return []
+
+
+def profiles_for_action(payload):
+    # Only the profile a View Profile button opens; the other action handlers don't read
+    # the clicker's profile, so prefetching it would be a wasted DB read per click
+    return [
+        action.get("value")
+        for action in payload.get("actions", [])
+        if action.get("action_id", "").startswith("view_profile_button")
+    ]
+
+
+def prefetch_then(team_id, user_ids, func, *args):
+    # Acks first: the DB reads and the handler run after the response has been sent.
+    # The caller's backlog slot is held until the handler has finished.
+    async def run():
+        try:
+            await prefetch_profiles(team_id, user_ids)
+            handler = func(*args)
+            if handler is not None:
+                await handler
+        finally:
+            release_slot()
+    task = asyncio.get_running_loop().create_task(run())
+    # The loop only keeps weak references to tasks
+    pending_tasks.add(task)
+    task.add_done_callback(pending_tasks.discard)
+    task.add_done_callback(log_failure)
+    return task
+
+
+def log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Error in background handler: {future.exception()}")
+
+
+def flask_response(result):
+    # Turn a handler's Flask-style return value into (status, body, content type)
+    if isinstance(result, tuple):
+        response, status = result
+    else:
+        response, status = result, 200
+    if isinstance(response, str):
+        return status, response.encode(), "text/plain"
+    return status, response.get_data(), response.content_type
+
+
+def run_action_sync(payload):
+    with bot.app.app_context():
+        return flask_response(bot.process_action_payload(payload))
+
+
+async def handle_events(scope, receive, send, headers):
+    body = await read_body(receive)
+    if not is_verified(body, headers):
+        return await respond(send, 403)
+
+    try:
+        event_data = json.loads(body)
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON event: {e}")
+        return await respond(send, 400)
+    if not isinstance(event_data, dict):
+        return await respond(send, 400)
+    if event_data.get("type") == "url_verification":
+        return await respond(send, 200, json.dumps({"challenge": event_data["challenge"]}).encode(), "application/json")
+
+    event_type = event_data.get("event", {}).get("type")
+    if event_type:
+        if not reserve_slot():
+            print("Handler backlog is full, asking Slack to retry the event.")
+            return await respond(send, 503)
+        # Dedup happens inside the handlers; hand them the retry number through the context
+        bot.retry_num_var.set(headers.get("x-slack-retry-num"))
+        prefetch_then(
+            event_data.get("team_id"), profiles_for_event(event_data),
+            run_in_background, bot.slack_event_adapter.emit, event_type, event_data
+        )
+    await respond(send, 200)
+
+
+async def handle_actions(scope, receive, send, headers):
+    body = await read_body(receive)
+    if not is_verified(body, headers):
+        return await respond(send, 403)
+
+    form = parse_qs(body.decode())
+    if "payload" not in form:
+        return await respond(send, 400)
+    try:
+        payload = json.loads(form["payload"][0])
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON payload: {e}")
+        return await respond(send, 400)
+    if not isinstance(payload, dict):
+        return await respond(send, 400)
+
+    if not bot.action_router.handles(payload):
+        return await respond(send, 200)
+
+    if not reserve_slot():
+        if payload["type"] != "block_suggestion" and queue_action(payload):
+            return await respond(send, 200)
+        print("Handler backlog is full, turning the action away.")
+        return await respond(send, 503)
+
+    # Channel picker lookups have to be answered in the response body
+    if payload["type"] == "block_suggestion":
+        try:
+            status, response_body, content_type = await asyncio.get_running_loop().run_in_executor(
+                handler_pool, run_action_sync, payload
+            )
+        finally:
+            release_slot()
+        return await respond(send, status, response_body, content_type)
+
+    # Ack right away; the handler runs once its profiles are cached
+    prefetch_then(bot.team_from_payload(payload), profiles_for_action(payload), submit_action, payload)
+    await respond(send, 200)
+
+
+def queue_action(payload):
+    # trigger_id payloads jump the action queue when it's enabled
+    if bot.action_queue is None:
+        return False
+    has_trigger = "trigger_id" in payload
+    priority = bot.PRIORITY_TRIGGER if has_trigger else bot.PRIORITY_DEFAULT
+    return bot.action_queue.submit(bot.run_action_job, payload, priority=priority, has_trigger=has_trigger)
+
+
+def submit_action(payload):
+    if queue_action(payload):
+        return None
+    if bot.action_queue is not None:
+        print("Action queue is full, handling the action on the handler pool.")
+    return run_in_background(run_action_sync, payload)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            bot.start_background_work()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            handler_pool.shutdown(wait=False)
+            await sqlConnector.async_storage.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+
+    if scope["type"] == "http" and scope["method"] == "POST":
+        headers = {key.decode().lower(): value.decode() for key, value in scope["headers"]}
+        if ASGI_EVENTS and scope["path"] == "/slack/events":
+            return await handle_events(scope, receive, send, headers)
+        if ASGI_ACTIONS and scope["path"] == "/slack/actions":
+            return await handle_actions(scope, receive, send, headers)
+
+    await wsgi_app(scope, receive, send)
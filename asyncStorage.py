@@ -0,0 +1,161 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from dbPool import PoolTimeoutError
+
+
+class _WaitStats:
+    def __init__(self):
+        self._stats = {"acquired": 0, "waits": 0, "wait_time_total": 0.0, "wait_time_max": 0.0, "timeouts": 0}
+
+    def record(self, waited, timed_out=False):
+        if timed_out:
+            self._stats["timeouts"] += 1
+            return
+        self._stats["acquired"] += 1
+        if waited > 0.001:
+            self._stats["waits"] += 1
+            self._stats["wait_time_total"] += waited
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+
+    def stats(self):
+        return dict(self._stats)
+
+
+# Async profile reads on aiomysql pools, for code running on an event loop.
+# At most `size` queries are in flight per server; further callers wait for a connection
+# (up to `timeout` seconds) instead of tying up a thread each. Reads follow the sync
+# storage's replica router, so they see the same replicas and read-your-writes keys.
+# Pools are created on first use, on the loop that uses them.
+class AsyncMySQLStorage:
+    def __init__(self, storage, size=None, timeout=None):
+        self.storage = storage
+        self.size = size or int(os.environ.get("DB_ASYNC_POOL_SIZE", os.environ.get("DB_POOL_SIZE", 5)))
+        self.timeout = timeout or float(os.environ.get("DB_POOL_TIMEOUT", 10))
+        self._pools = {}      # replica name, or None for the primary -> aiomysql pool
+        self._creating = {}   # same keys -> future of the pool being created
+        self._waits = _WaitStats()
+
+    async def _get_pool(self, host=None):
+        pool = self._pools.get(host)
+        if pool is None:
+            if host not in self._creating:
+                self._creating[host] = asyncio.ensure_future(self._create_pool(host))
+            creating = self._creating[host]
+            try:
+                pool = await creating
+            except Exception:
+                # Let the next caller try again rather than re-raise this failure forever
+                if self._creating.get(host) is creating:
+                    del self._creating[host]
+                raise
+            self._pools[host] = pool
+        return pool
+
+    async def _create_pool(self, host=None):
+        import aiomysql
+        params = dict(self.storage.params)
+        if host is not None:
+            # "host" or "host:port", as in MySQLStorage.connect
+            params["host"], _, port = host.partition(":")
+            if port:
+                params["port"] = int(port)
+        return await aiomysql.create_pool(
+            host=params["host"],
+            port=params.get("port", 3306),
+            user=params["user"],
+            password=params["password"],
+            db=params["database"],
+            minsize=1,
+            maxsize=self.size,
+            autocommit=False,
+        )
+
+    async def _read_host(self, key):
+        # The replica to read key from, or None for the primary
+        router = self.storage.replicas
+        if router is None:
+            return None
+        if router.needs_check():
+            # Lag is measured over the sync replica pools; keep that off the loop
+            await asyncio.get_running_loop().run_in_executor(None, router.refresh)
+        return router.replica_for(key, refresh=False)
+
+    @asynccontextmanager
+    async def cursor(self, dictionary=False, host=None):
+        import aiomysql
+        pool = await self._get_pool(host)
+        started_at = time.monotonic()
+        try:
+            conn = await asyncio.wait_for(pool.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self._waits.record(0, timed_out=True)
+            raise PoolTimeoutError(f"No async DB connection available after {self.timeout}s (pool size {self.size})")
+        self._waits.record(time.monotonic() - started_at)
+        try:
+            cursor = await conn.cursor(aiomysql.DictCursor if dictionary else aiomysql.Cursor)
+            try:
+                yield conn, cursor
+            finally:
+                await cursor.close()
+                # Never hand an open transaction to the next borrower
+                await conn.rollback()
+        finally:
+            pool.release(conn)
+
+    async def load_profile(self, user_id, team_id):
+        host = await self._read_host((team_id, user_id))
+        async with self.cursor(dictionary=True, host=host) as (conn, cursor):
+            await cursor.execute("SELECT * FROM user_profiles WHERE user_id = %s AND team_id = %s", (user_id, team_id))
+            return await cursor.fetchone()
+
+    def stats(self):
+        stats = self._waits.stats()
+        stats["size"] = self.size
+        if self._pools:
+            stats["open"] = sum(pool.size for pool in self._pools.values())
+            stats["idle"] = sum(pool.freesize for pool in self._pools.values())
+        return stats
+
+    async def close(self):
+        pools = list(self._pools.values())
+        self._pools = {}
+        self._creating = {}
+        for pool in pools:
+            pool.close()
+            await pool.wait_closed()
+
+
+# Same interface for backends without an async driver (SQLite): each call runs the sync
+# storage method on the default executor, with at most `size` of them in flight.
+class ThreadedAsyncStorage:
+    def __init__(self, storage, size=None):
+        self.storage = storage
+        self.size = size or int(os.environ.get("DB_ASYNC_POOL_SIZE", os.environ.get("DB_POOL_SIZE", 5)))
+        self._slots = None
+        self._waits = _WaitStats()
+
+    async def _run(self, method, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        started_at = time.monotonic()
+        async with self._slots:
+            self._waits.record(time.monotonic() - started_at)
+            return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+    async def load_profile(self, user_id, team_id):
+        return await self._run(self.storage.load_profile, user_id, team_id)
+
+    def stats(self):
+        return dict(self._waits.stats(), size=self.size)
+
+    async def close(self):
+        pass
+
+
+def async_storage_for(storage):
+    if storage.name == "mysql":
+        return AsyncMySQLStorage(storage)
+    return ThreadedAsyncStorage(storage)
@@ -0,0 +1,148 @@
+# Pairing simulation and benchmark harness.
+#
+# Runs sqlConnector.pair_users_weekly against the embedded SQLite storage backend
+# and a fake Slack client, on synthetic teams with a configurable amount of pairing
+# history, and reports wall time, query and Slack call counts, peak memory and whether
+# every user was matched.
+#
+#   python benchmarks/pairing_benchmark.py --sizes 10 1000 50000 --history 4
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# sqlConnector reads these at import time; the benchmark never talks to Slack
+os.environ.setdefault("SIGNING_SECRET", "benchmark")
+os.environ.setdefault("SLACK_TOKEN", "xoxb-benchmark")
+
+import sqlConnector  # noqa: E402
+from storage import SQLiteStorage  # noqa: E402
+from optInMembership import OptInMembership  # noqa: E402
+
+
+class FakeSlackClient:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self._channels = itertools.count(1)
+
+    def conversations_open(self, users):
+        self.calls["conversations.open"] += 1
+        time.sleep(self.latency)
+        return {"channel": {"id": f"D{next(self._channels):08d}"}}
+
+    def chat_postMessage(self, channel, text=None, blocks=None, metadata=None):
+        self.calls["chat.postMessage"] += 1
+        time.sleep(self.latency)
+        return {"ok": True, "channel": channel}
+
+    def conversations_history(self, channel, limit=None, include_all_metadata=False):
+        self.calls["conversations.history"] += 1
+        time.sleep(self.latency)
+        return {"ok": True, "messages": []}
+
+
+def seed_team(storage, team_id, size, history_per_user, rng):
+    users = [f"U{team_id}{i:06d}" for i in range(size)]
+    # Roughly history_per_user past partners for every user (repeats are dropped)
+    pair_count = int(size * history_per_user / 2)
+    with storage.pool.connection() as db:
+        cursor = db.cursor()
+        cursor.executemany(
+            "INSERT INTO introductions (user_id, team_id, intro_text) VALUES (%s, %s, %s)",
+            [(user, team_id, "benchmark") for user in users]
+        )
+        if size > 1:
+            cursor.executemany(
+                storage.insert_ignore("pairings", ("team_id", "user_id1", "user_id2")),
+                [(team_id, *rng.sample(users, 2)) for _ in range(pair_count)]
+            )
+        db.commit()
+        cursor.close()
+    return users
+
+
+def query_rows(storage, query):
+    with storage.pool.connection() as db:
+        cursor = db.cursor()
+        cursor.execute(query)
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+def run(size, history_per_user, teams, slack_latency, seed, verbose):
+    rng = random.Random(seed)
+    storage = SQLiteStorage(":memory:")
+    for t in range(teams):
+        seed_team(storage, f"T{t}", size, history_per_user, rng)
+    storage.statements.clear()
+
+    slack = FakeSlackClient(latency=slack_latency)
+    sqlConnector.storage = storage
+    sqlConnector.opt_in_membership = OptInMembership(storage)
+    sqlConnector.client = slack
+
+    output = None if verbose else io.StringIO()
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+        results = sqlConnector.pair_users_weekly()
+    wall_time = time.perf_counter() - started_at
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    queries = dict(storage.statements)
+
+    unmatched = query_rows(storage, "SELECT COUNT(*) FROM introductions")[0][0]
+    outbox = dict(query_rows(storage, "SELECT status, COUNT(*) FROM notification_outbox GROUP BY status"))
+    storage.pool.close()
+    return {
+        "users": size * teams,
+        "teams": teams,
+        "history_per_user": history_per_user,
+        "wall_time": round(wall_time, 4),
+        "queries": sum(queries.values()),
+        "queries_by_kind": queries,
+        "slack_calls": sum(slack.calls.values()),
+        "notifications_failed": sum(1 for result in results if not result["ok"]),
+        "outbox": outbox,
+        "peak_memory_mb": round(peak / 1024 / 1024, 2),
+        "unmatched": unmatched,
+        "all_matched": unmatched == 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pair_users_weekly on synthetic teams")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 50000], help="users per team")
+    parser.add_argument("--history", type=float, default=4, help="average past partners per user")
+    parser.add_argument("--teams", type=int, default=1, help="teams per run")
+    parser.add_argument("--slack-latency", type=float, default=0.0, help="seconds added to each fake Slack call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per run")
+    parser.add_argument("--verbose", action="store_true", help="show pair_users_weekly's own output")
+    args = parser.parse_args()
+
+    if not args.json:
+        print(f"{'users':>8} {'teams':>5} {'wall s':>8} {'queries':>8} {'slack':>7} {'peak MB':>8} {'unmatched':>9}")
+    for size in args.sizes:
+        report = run(size, args.history, args.teams, args.slack_latency, args.seed, args.verbose)
+        if args.json:
+            print(json.dumps(report))
+        else:
+            print(f"{report['users']:>8} {report['teams']:>5} {report['wall_time']:>8.3f} {report['queries']:>8} "
+                  f"{report['slack_calls']:>7} {report['peak_memory_mb']:>8.2f} {report['unmatched']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Cold-start benchmark.
+#
+# Imports a module (bot by default) in a fresh interpreter several times and reports
+# the process wall time, the time the bot reports for its own import (startup_seconds),
+# and the slowest imports according to python -X importtime. Runs offline: the Slack
+# identity comes from SLACK_TEAM_ID / SLACK_BOT_USER_ID and the pairing scheduler is off.
+#
+#   python benchmarks/startup_benchmark.py --runs 5 --top 15
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+OFFLINE_ENV = {
+    "SIGNING_SECRET": "benchmark",
+    "SLACK_TOKEN": "xoxb-benchmark",
+    "SLACK_TEAM_ID": "T0BENCHMARK",
+    "SLACK_BOT_USER_ID": "U0BENCHMARK",
+    "PAIRING_SCHEDULER": "0",
+}
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+LOADED_LINE = re.compile(r"loaded in ([0-9.]+)s")
+
+
+def run_once(module):
+    env = dict(os.environ, **OFFLINE_ENV)
+    started_at = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    wall_time = time.perf_counter() - started_at
+    if process.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{process.stderr[-2000:]}")
+
+    imports = {}
+    for line in process.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        # Cumulative microseconds of the imports the module makes itself (one level below
+        # the top), so each dependency is counted once with everything it pulls in
+        if match and len(match.group(3)) == 3:
+            imports[match.group(4)] = int(match.group(2))
+    loaded = LOADED_LINE.search(process.stdout)
+    return {
+        "wall_time": wall_time,
+        "startup_seconds": float(loaded.group(1)) if loaded else None,
+        "imports": imports,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the bot")
+    parser.add_argument("--module", default="bot", help="module to import")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    runs = [run_once(args.module) for _ in range(args.runs)]
+    wall_times = [run["wall_time"] for run in runs]
+    startup_times = [run["startup_seconds"] for run in runs if run["startup_seconds"] is not None]
+
+    # Import times from the last run, when the OS file cache is warm like a restarted replica
+    slowest = sorted(runs[-1]["imports"].items(), key=lambda item: item[1], reverse=True)[:args.top]
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "wall_time_median": statistics.median(wall_times),
+        "wall_time_max": max(wall_times),
+        "startup_seconds_median": statistics.median(startup_times) if startup_times else None,
+        "slowest_imports": [{"module": name, "cumulative_ms": micros / 1000} for name, micros in slowest],
+    }
+
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(f"{args.module}: {args.runs} runs, wall median {report['wall_time_median']:.3f}s, max {report['wall_time_max']:.3f}s")
+    if report["startup_seconds_median"] is not None:
+        print(f"startup_seconds median {report['startup_seconds_median']:.3f}s")
+    print(f"{'cumulative ms':>14}  module")
+    for entry in report["slowest_imports"]:
+        print(f"{entry['cumulative_ms']:>14.1f}  {entry['module']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,9 @@
 #imports
+import time
+
+# Measures how long importing the bot takes, reported as startup_seconds on /stats
+STARTED_AT = time.perf_counter()
+
 import slack_sdk
 import os
 from pathlib import Path
@@ -6,11 +11,26 @@ from dotenv import load_dotenv
 from flask import Flask, request
 from slackeventsapi import SlackEventAdapter
 import json
-from flask import Flask, request, jsonify
-from sqlConnector import load_profile_from_db, save_profile_to_db, opt_in_user, opt_out_user, is_user_opted_in, pair_users_weekly
+import functools
+import contextvars
+import hashlib
+import hmac
+import secrets
+import threading
+from flask import Flask, request, jsonify, has_request_context, make_response, redirect
+from urllib.parse import urlencode
+from sqlConnector import load_profile_from_db, save_profile_to_db, opt_in_user, opt_out_user, is_user_opted_in, pair_users_weekly, invalidate_profile, profile_version, storage, async_storage, db_pool, profile_cache, installation_store, client_pool, opt_in_membership
 from slack_sdk.errors import SlackApiError
-from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timedelta
+from slack_sdk.signature import SignatureVerifier
+from installationStore import TeamClient, current_team, team_scope, team_from_payload
+from slackClient import RateLimitedClient
+from channelCatalog import ChannelCatalog
+from userDirectory import UserDirectory
+from ttlCache import TTLCache
+from actionRouter import ActionRouter
+from eventDedup import deduplicator_from_env
+from workQueue import WorkQueue, PRIORITY_TRIGGER, PRIORITY_DEFAULT
 
 
 env_path = Path('.') / '.env'
@@ -19,19 +39,61 @@ load_dotenv(dotenv_path=env_path)
 # For connecting to the server that the bot is in
 app = Flask(__name__)
 slack_event_adapter = SlackEventAdapter(os.environ['SIGNING_SECRET'], '/slack/events', app)
+signature_verifier = SignatureVerifier(os.environ['SIGNING_SECRET'])
 
 # Gets slack token
-client = slack_sdk.WebClient(token= os.environ['SLACK_TOKEN'])
+# Every Web API call goes to the rate-limited client of the workspace being served
+client = TeamClient(client_pool)
+
+# Fast-ack mode for /slack/actions: verify, enqueue and return before Slack's 3 second deadline
+ACTIONS_ASYNC = os.environ.get("ACTIONS_ASYNC", "0") == "1"
+action_queue = WorkQueue(
+    workers=int(os.environ.get("ACTIONS_WORKERS", 8)),
+    max_size=int(os.environ.get("ACTIONS_QUEUE_SIZE", 1000)),
+    name="actions",
+) if ACTIONS_ASYNC else None
+
+# Workspace of the event or payload being handled, else the SLACK_TOKEN workspace
+def current_team_id():
+    return current_team.get() or installation_store.default_team_id()
+
+# Local users.info cache (user IDs are unique across workspaces)
+user_directory = UserDirectory(client)
+
+# Public channels for the Introduce Yourself picker, one catalog per recently active workspace
+# Catalogs are kept (LRU) rather than expired, so an old one keeps answering while it reloads
+channel_catalogs = TTLCache(
+    max_size=int(os.environ.get("CHANNEL_CATALOG_TEAMS", 256)),
+    ttl=float("inf"),
+)
+CHANNEL_CATALOG_TTL = float(os.environ.get("CHANNEL_CATALOG_TTL", 86400))
+
+def current_channel_catalog():
+    team_id = current_team_id()
+    catalog = channel_catalogs.get(team_id)
+    if catalog is None:
+        catalog = ChannelCatalog(client)
+        channel_catalogs.set(team_id, catalog)
+    else:
+        age = catalog.age()
+        if age is not None and age > CHANNEL_CATALOG_TTL:
+            catalog.refresh_in_background()
+    return catalog
+
+# Warm both for the SLACK_TOKEN workspace in the background
+def warm_default_team():
+    if installation_store.default_token is None:
+        return
+    try:
+        with team_scope(installation_store.default_team_id()):
+            user_directory.warm()
+            current_channel_catalog().warm()
+    except Exception as e:
+        print(f"Error warming caches for the default workspace: {e}")
 
 # Send a test message when the bot starts
 #client.chat_postMessage(channel='#test', text="Hello World!")
 
-# Get ID of a Slack server
-team_id = client.auth_test()['team_id']
-
-# Gives id of bot
-BOT_ID = client.api_call("auth.test")['user_id']
-
 #converts rich text to slack text channel
 def convert_rich_text_to_slack_format(rich_text):
     formatted_text = ""
@@ -100,20 +162,113 @@ def convert_rich_text_to_slack_format(rich_text):
 
 
 
+# Drops redelivered events (same event_id) and, depending on SLACK_RETRY_POLICY, Slack retries
+event_dedup = deduplicator_from_env(storage)
+
+# X-Slack-Retry-Num for events delivered outside a Flask request (the ASGI server sets this)
+retry_num_var = contextvars.ContextVar("slack_retry_num", default=None)
+
+def current_retry_num():
+    if has_request_context():
+        return request.headers.get("X-Slack-Retry-Num")
+    return retry_num_var.get()
+
+def deduplicated(handler):
+    @functools.wraps(handler)
+    def wrapper(event_data, *args, **kwargs):
+        retry_num = current_retry_num()
+        if event_dedup.should_skip(event_data.get("event_id"), retry_num):
+            return None
+        return handler(event_data, *args, **kwargs)
+    return wrapper
+
+# Runs an event handler against the workspace the event came from
+def team_scoped(handler):
+    @functools.wraps(handler)
+    def wrapper(event_data, *args, **kwargs):
+        with team_scope(team_from_payload(event_data) or current_team.get()):
+            return handler(event_data, *args, **kwargs)
+    return wrapper
+
+
 # Messages user if they join the slack server
 @slack_event_adapter.on("team_join")
+@deduplicated
+@team_scoped
 def handle_team_join(event_data):
     user_id = event_data["event"]["user"]["id"]
+    user_directory.update_from_user(event_data["event"]["user"])
     welcome_message = f"Welcome to the team, <@{user_id}>! Please introduce yourself in the Introductions text channel!"
     
     # Send a DM to the new user
     client.chat_postMessage(channel=user_id, text=welcome_message)
 
+# Keep the user directory current when someone changes their name or avatar
+@slack_event_adapter.on("user_change")
+@deduplicated
+@team_scoped
+def handle_user_change(event_data):
+    user_directory.update_from_user(event_data["event"]["user"])
+
+# Keep the channel picker in sync with the workspace's public channels
+@slack_event_adapter.on("channel_created")
+@deduplicated
+@team_scoped
+def handle_channel_created(event_data):
+    channel = event_data["event"]["channel"]
+    current_channel_catalog().upsert(channel["id"], channel["name"])
+
+@slack_event_adapter.on("channel_rename")
+@deduplicated
+@team_scoped
+def handle_channel_rename(event_data):
+    channel = event_data["event"]["channel"]
+    current_channel_catalog().upsert(channel["id"], channel["name"])
+
+@slack_event_adapter.on("channel_archive")
+@deduplicated
+@team_scoped
+def handle_channel_archive(event_data):
+    current_channel_catalog().remove(event_data["event"]["channel"])
+
+@slack_event_adapter.on("channel_deleted")
+@deduplicated
+@team_scoped
+def handle_channel_deleted(event_data):
+    current_channel_catalog().remove(event_data["event"]["channel"])
+
+@slack_event_adapter.on("channel_unarchive")
+@deduplicated
+@team_scoped
+def handle_channel_unarchive(event_data):
+    # The event only carries the channel ID, so reload the catalog to pick up its name
+    current_channel_catalog().refresh_in_background()
+
+# Forget a workspace's token and client once the app is removed from it
+def forget_installation(team_id):
+    installation_store.delete(team_id)
+    client_pool.evict(team_id)
+    channel_catalogs.invalidate(team_id)
+
+@slack_event_adapter.on("app_uninstalled")
+@deduplicated
+@team_scoped
+def handle_app_uninstalled(event_data):
+    forget_installation(current_team_id())
+
+@slack_event_adapter.on("tokens_revoked")
+@deduplicated
+@team_scoped
+def handle_tokens_revoked(event_data):
+    # Only the bot token is stored; revoked user tokens need nothing
+    if event_data["event"].get("tokens", {}).get("bot"):
+        forget_installation(current_team_id())
+
 user_profiles = {}
 
 def send_introduction_message(user_id, channel_id, intro_text):
     # Fetch the user’s profile from the database
-    profile = load_profile_from_db(user_id, team_id)
+    profile = load_profile_from_db(user_id, current_team_id())
 
     # Default to the user's name if no profile is found
     full_name = profile.get("full_name", "User")
@@ -170,10 +325,29 @@ def calculate_countdown():
         return f"{minutes} minutes"
     
 
+# Last Home tab hash this process published per (team_id, user_id). It is per process:
+# another worker may since have published a different view for the user (after an opt-in
+# or a profile save it handled), and this one would still skip its own, now stale, view.
+# The short TTL bounds how long such a skip can hide that; it only needs to cover the
+# repeated app_home_opened events of one visit.
+home_tab_hashes = TTLCache(
+    max_size=int(os.environ.get("HOME_TAB_HASH_CACHE_SIZE", 10000)),
+    ttl=float(os.environ.get("HOME_TAB_HASH_TTL", 60)),
+)
+home_tab_stats = {"published": 0, "skipped": 0}
+
+# Hash of everything the Home tab shows: profile fields, opt-in state, countdown and avatar
+def home_tab_fingerprint(profile, opted_in, countdown_text, profile_picture_url):
+    inputs = json.dumps([profile, bool(opted_in), countdown_text, profile_picture_url], sort_keys=True, default=str)
+    return hashlib.sha256(inputs.encode("utf-8")).hexdigest()
+
 # Handle app_home_opened event to update the Home Tab
 @slack_event_adapter.on("app_home_opened")
+@deduplicated
+@team_scoped
 def update_home_tab(event_data, opted_in=False):
     user_id = event_data["event"]["user"]
+    team_id = current_team_id()
 
     # Create the updated view with the opt-in button
     if opted_in == True:
@@ -190,9 +364,9 @@ def update_home_tab(event_data, opted_in=False):
 
     try:
         # Default info
-        user_info = client.users_info(user=user_id)
-        full_name = user_info['user']['profile'].get('real_name', 'User')  # Get the full name or default to 'User'
-        profile_picture_url = user_info['user']['profile'].get('image_192', '')  # Get the profile picture URL
+        user_info = user_directory.get(user_id)
+        full_name = user_info['real_name']  # Get the full name or default to 'User'
+        profile_picture_url = user_info['image_192'] or ''  # Get the profile picture URL
 
         # Get profile from db
         profile = load_profile_from_db(user_id, team_id)
@@ -206,6 +380,12 @@ def update_home_tab(event_data, opted_in=False):
                 "bio": "Hi there!\nPlease make sure to *Update Your Profile* :pencil2:\n\n\n*Introduce yourself* to everyone! :wave:"
             })
 
+        # Skip the publish when nothing visible has changed since the last one
+        fingerprint = home_tab_fingerprint(profile, opted_in, countdown_text, profile_picture_url)
+        if home_tab_hashes.get((team_id, user_id)) == fingerprint:
+            home_tab_stats["skipped"] += 1
+            return
+
        # Define the Home Tab layout
         profile_blocks = [
             {
@@ -358,1233 +538,929 @@ def update_home_tab(event_data, opted_in=False):
             user_id=user_id,
             view=view
         )
+        home_tab_hashes.set((team_id, user_id), fingerprint)
+        home_tab_stats["published"] += 1
 
     except slack_sdk.errors.SlackApiError as e:
         print(f"Error publishing home tab: {e.response['error']}")
 
 
-# Handle button interactions and modal submissions
-@app.route("/slack/actions", methods=["POST"])
-def slack_actions():
-    payload = request.form["payload"]
-    data = json.loads(payload)
-    payload = request.form.get("payload")
-    
-    if payload:
-        try:
-            # Parse the JSON string into a Python dictionary
-            payload = json.loads(payload)
-        except json.JSONDecodeError as e:
-            print(f"Error decoding JSON payload: {e}")
-            return "", 400
+# Rendered "View Profile" modals keyed on (team, user, profile version, name, avatar)
+profile_modal_cache = TTLCache(
+    max_size=int(os.environ.get("PROFILE_MODAL_CACHE_SIZE", 2000)),
+    ttl=float(os.environ.get("PROFILE_MODAL_CACHE_TTL", 300)),
+)
+
+# Profile fields shown on the profile card, in order
+profile_card_fields = [
+    ("*Full Name:*", "full_name"),
+    ("*Pronouns:*", "pronouns"),
+    (":round_pushpin: *Location:*", "location"),
+    (":house: *Hometown:*", "hometown"),
+    (":mortar_board: *Education:*", "education"),
+    (":speech_balloon: *Languages:*", "languages"),
+    (":clapper: *Hobbies:*", "hobbies"),
+    (":birthday: *Birthday:*", "birthday"),
+    (":bulb: *Ask Me About:*", "ask_me_about"),
+]
+
+# Builds the modal behind every "View Profile" button
+def render_profile_modal(profile_user_id, team_id):
+    # Fetch the user's profile information from Slack (to get the profile picture)
+    try:
+        user_info = user_directory.get(profile_user_id)
+        profile_pic_url = user_info["image_512"]  # Use a larger image size
+        user_name = user_info["real_name"]
+    except Exception as e:
+        print(f"Error fetching user info: {e}")
+        profile_pic_url = None
+        user_name = "Unknown User"
+
+    key = (team_id, profile_user_id, profile_version(profile_user_id, team_id), user_name, profile_pic_url)
+    profile_modal = profile_modal_cache.get(key)
+    if profile_modal is not None:
+        return profile_modal
+
+    profile = load_profile_from_db(profile_user_id, team_id)
+
+    if profile is None:
+        # Show message if no profile data exists
+        profile_modal = {
+            "type": "modal",
+            "title": {"type": "plain_text", "text": "User Profile"},
+            "blocks": [
+                {
+                    "type": "section",
+                    "text": {"type": "mrkdwn", "text": "No profile available for this user."}
+                }
+            ]
+        }
+    else:
+        # Construct profile modal using profile data
+        profile_blocks = [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*Profile of {user_name}*"
+                },
+                "accessory": {
+                    "type": "image",
+                    "image_url": profile_pic_url,
+                    "alt_text": f"{user_name}'s profile picture"
+                }
+            },
+            {"type": "divider"},
+        ]
 
+        # Construct fields with emojis for each profile attribute
+        profile_fields = [
+            {"type": "mrkdwn", "text": f"{field_label} {profile[field_key]}"}
+            for field_label, field_key in profile_card_fields
+            if profile.get(field_key)
+        ]
 
+        # Add fields to the profile blocks
+        profile_blocks.append({
+            "type": "section",
+            "fields": profile_fields
+        })
 
-    # Check and handle the action
-    actions = payload.get("actions", [])
-    if actions:
-        first_action = actions[0]
-        action_id = first_action.get("action_id")
-        user_id = first_action.get("value")
+        # Add bio if available
+        profile_blocks.append({
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": profile.get("bio", "No bio available.")}
+        })
 
+        # Construct the full profile modal
+        profile_modal = {
+            "type": "modal",
+            "title": {"type": "plain_text", "text": "User Profile"},
+            "blocks": profile_blocks
+        }
 
-    if data["type"] == "block_actions":
-        user_id = data["user"]["id"]
-        action_id = data["actions"][0]["action_id"]
+    profile_modal_cache.set(key, profile_modal)
+    return profile_modal
+
+
+# Handlers for /slack/actions, registered below by payload type and action/callback ID
+action_router = ActionRouter()
+
+# Handle button interactions and modal submissions
+@app.route("/slack/actions", methods=["POST"])
+def slack_actions():
+    # Verify the request came from Slack before doing any work
+    if not signature_verifier.is_valid_request(request.get_data(), request.headers):
+        return "", 403
 
-        profile = load_profile_from_db(user_id, team_id) or {}  # Ensure profile is at least an empty dict
+    payload = request.form.get("payload")
+    if not payload:
+        return "", 400
 
-        # Handle the profile button interaction
-        if action_id == "update_profile_button":
-            # Open a new modal where users can create or edit their profile
-            profile_modal_view = {
-                "type": "modal",
-                "callback_id": "profile_creation_modal",
-                "title": {
+    try:
+        # Parse the JSON string into a Python dictionary
+        payload = json.loads(payload)
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON payload: {e}")
+        return "", 400
+    if not isinstance(payload, dict):
+        return "", 400
+
+    # Fast path for payloads no handler is registered for
+    if not action_router.handles(payload):
+        return "", 200
+
+    # Channel picker lookups have to be answered in the response body
+    if payload["type"] == "block_suggestion":
+        return process_action_payload(payload)
+
+    # Ack right away and let the worker pool do the Slack/DB work
+    if ACTIONS_ASYNC:
+        has_trigger = "trigger_id" in payload
+        priority = PRIORITY_TRIGGER if has_trigger else PRIORITY_DEFAULT
+        if action_queue.submit(run_action_job, payload, priority=priority, has_trigger=has_trigger):
+            return "", 200
+        print("Action queue is full, handling the action inline.")
+
+    return process_action_payload(payload)
+
+
+def run_action_job(payload):
+    # Handlers build responses with jsonify, which needs an app context outside a request
+    with app.app_context():
+        process_action_payload(payload)
+
+
+def process_action_payload(payload):
+    with team_scope(team_from_payload(payload)):
+        response = action_router.dispatch(payload)
+    if response is None:
+        return "", 200
+    return response
+
+
+@action_router.route("block_actions", "update_profile_button")
+def handle_update_profile_button(data):
+    user_id = data["user"]["id"]
+    profile = load_profile_from_db(user_id, current_team_id()) or {}  # Ensure profile is at least an empty dict
+
+    # Open a new modal where users can create or edit their profile
+    profile_modal_view = {
+        "type": "modal",
+        "callback_id": "profile_creation_modal",
+        "title": {
+            "type": "plain_text",
+            "text": "Create Your Profile"
+        },
+        "submit": {
+            "type": "plain_text",
+            "text": "Submit"
+        },
+        "blocks": [
+            {
+                "type": "input",
+                "block_id": "bio_input",
+                "element": {
+                    "type": "plain_text_input",
+                    "multiline": True,
+                    "action_id": "bio",
+                    "initial_value": profile.get("bio", "") or "",
+                    "placeholder": {
+                        "type": "plain_text",
+                        "text": "Small blurb about yourself, be sure to include important links (e.g. LinkedIn)"
+                    }
+                },
+                "label": {
                     "type": "plain_text",
-                    "text": "Create Your Profile"
+                    "text": ":notebook: Bio"
+                },
+                "optional": True
+            },
+            {
+                "type": "input",
+                "block_id": "full_name_input",
+                "element": {
+                    "type": "plain_text_input",
+                    "action_id": "full_name",
+                    "initial_value": profile.get("full_name", "") or "",  # Default to empty string if not present
+                    "placeholder": {
+                        "type": "plain_text",
+                        "text": "e.g. George Audi"
+                    }
                 },
-                "submit": {
+                "label": {
                     "type": "plain_text",
-                    "text": "Submit"
+                    "text": ":speech_balloon: Full Name"
+                }
+            },
+            {
+                "type": "input",
+                "block_id": "pronouns_input",
+                "element": {
+                    "type": "plain_text_input",
+                    "action_id": "pronouns",
+                    "initial_value": profile.get("pronouns", "") or "",  # Default to empty string if not present
+                    "placeholder": {
+                        "type": "plain_text",
+                        "text": "e.g. He/him, She/her, They/them"
+                    }
                 },
-                "blocks": [
-                    {
-                        "type": "input",
-                        "block_id": "bio_input",
-                        "element": {
-                            "type": "plain_text_input",
-                            "multiline": True,
-                            "action_id": "bio",
-                            "initial_value": profile.get("bio", "") or "",
-                            "placeholder": {
-                                "type": "plain_text",
-                                "text": "Small blurb about yourself, be sure to include important links (e.g. LinkedIn)"
-                            }
-                        },
-                        "label": {
-                            "type": "plain_text",
-                            "text": ":notebook: Bio"
-                        },
-                        "optional": True
-                    },
-                    {
-                        "type": "input",
-                        "block_id": "full_name_input",
-                        "element": {
-                            "type": "plain_text_input",
-                            "action_id": "full_name",
-                            "initial_value": profile.get("full_name", "") or "",  # Default to empty string if not present
-                            "placeholder": {
-                                "type": "plain_text",
-                                "text": "e.g. George Audi"
-                            }
-                        },
-                        "label": {
-                            "type": "plain_text",
-                            "text": ":speech_balloon: Full Name"
-                        }
-                    },
-                    {
-                        "type": "input",
-                        "block_id": "pronouns_input",
-                        "element": {
-                            "type": "plain_text_input",
-                            "action_id": "pronouns",
-                            "initial_value": profile.get("pronouns", "") or "",  # Default to empty string if not present
-                            "placeholder": {
-                                "type": "plain_text",
-                                "text": "e.g. He/him, She/her, They/them"
-                            }
-                        },
-                        "label": {
-                            "type": "plain_text",
-                            "text": "Pronouns"
-                        },
-                        "optional": True
-                    },
-                    {
-                        "type": "input",
-                        "block_id": "location_input",
-                        "element": {
-                            "type": "plain_text_input",
-                            "action_id": "location",
-                            "initial_value": profile.get("location", "") or "",  # Default to empty string if not present
-                            "placeholder": {
-                                "type": "plain_text",
-                                "text": "e.g. New York"
-                            }
-                        },
-                        "label": {
-                            "type": "plain_text",
-                            "text": ":round_pushpin: Where you are located (optional)"
-                        },
-                        "optional": True
-                    },
-                    {
-                        "type": "input",
-                        "block_id": "hometown_input",
-                        "element": {
-                            "type": "plain_text_input",
-                            "action_id": "hometown",
-                            "initial_value": profile.get("hometown", "") or "",  # Default to empty string if not present
-                            "placeholder": {
-                                "type": "plain_text",
-                                "text": "e.g. New York"
-                            }
-                        },
-                        "label": {
-                            "type": "plain_text",
-                            "text": ":house: Where you are from"
-                        },
-                        "optional": True
-                    },
-                    {
-                        "type": "input",
-                        "block_id": "education_input",
-                        "element": {
-                            "type": "plain_text_input",
-                            "action_id": "education",
-                            "initial_value": profile.get("education", "") or "",  # Default to empty string if not present
-                            "placeholder": {
-                                "type": "plain_text",
-                                "text": "e.g. Boston University"
-                            }
-                        },
-                        "label": {
-                            "type": "plain_text",
-                            "text": ":mortar_board: Education"
-                        },
-                        "optional": True
-                    },
-                    {
-                        "type": "input",
-                        "block_id": "languages_input",
-                        "element": {
-                            "type": "plain_text_input",
-                            "action_id": "languages",
-                            "initial_value": profile.get("languages", "") or "",  # Default to empty string if not present
-                            "placeholder": {
-                                "type": "plain_text",
-                                "text": "e.g. English, Spanish, Arabic"
-                            }
-                        },
-                        "label": {
-                            "type": "plain_text",
-                            "text": ":speech_balloon: What languages do you speak?"
-                        },
-                        "optional": True
-                    },
-                    {
-                        "type": "input",
-                        "block_id": "hobbies_input",
-                        "element": {
-                            "type": "plain_text_input",
-                            "action_id": "hobbies",
-                            "initial_value": profile.get("hobbies", "") or "",  # Default to empty string if not present
-                            "placeholder": {
-                                "type": "plain_text",
-                                "text": "e.g. Golf, Reading, Movies"
-                            }
-                        },
-                        "label": {
-                            "type": "plain_text",
-                            "text": ":clapper: Hobbies"
-                        },
-                        "optional": True
-                    },
+                "label": {
+                    "type": "plain_text",
+                    "text": "Pronouns"
+                },
+                "optional": True
+            },
+            {
+                "type": "input",
+                "block_id": "location_input",
+                "element": {
+                    "type": "plain_text_input",
+                    "action_id": "location",
+                    "initial_value": profile.get("location", "") or "",  # Default to empty string if not present
+                    "placeholder": {
+                        "type": "plain_text",
+                        "text": "e.g. New York"
+                    }
+                },
+                "label": {
+                    "type": "plain_text",
+                    "text": ":round_pushpin: Where you are located (optional)"
+                },
+                "optional": True
+            },
+            {
+                "type": "input",
+                "block_id": "hometown_input",
+                "element": {
+                    "type": "plain_text_input",
+                    "action_id": "hometown",
+                    "initial_value": profile.get("hometown", "") or "",  # Default to empty string if not present
+                    "placeholder": {
+                        "type": "plain_text",
+                        "text": "e.g. New York"
+                    }
+                },
+                "label": {
+                    "type": "plain_text",
+                    "text": ":house: Where you are from"
+                },
+                "optional": True
+            },
+            {
+                "type": "input",
+                "block_id": "education_input",
+                "element": {
+                    "type": "plain_text_input",
+                    "action_id": "education",
+                    "initial_value": profile.get("education", "") or "",  # Default to empty string if not present
+                    "placeholder": {
+                        "type": "plain_text",
+                        "text": "e.g. Boston University"
+                    }
+                },
+                "label": {
+                    "type": "plain_text",
+                    "text": ":mortar_board: Education"
+                },
+                "optional": True
+            },
+            {
+                "type": "input",
+                "block_id": "languages_input",
+                "element": {
+                    "type": "plain_text_input",
+                    "action_id": "languages",
+                    "initial_value": profile.get("languages", "") or "",  # Default to empty string if not present
+                    "placeholder": {
+                        "type": "plain_text",
+                        "text": "e.g. English, Spanish, Arabic"
+                    }
+                },
+                "label": {
+                    "type": "plain_text",
+                    "text": ":speech_balloon: What languages do you speak?"
+                },
+                "optional": True
+            },
+            {
+                "type": "input",
+                "block_id": "hobbies_input",
+                "element": {
+                    "type": "plain_text_input",
+                    "action_id": "hobbies",
+                    "initial_value": profile.get("hobbies", "") or "",  # Default to empty string if not present
+                    "placeholder": {
+                        "type": "plain_text",
+                        "text": "e.g. Golf, Reading, Movies"
+                    }
+                },
+                "label": {
+                    "type": "plain_text",
+                    "text": ":clapper: Hobbies"
+                },
+                "optional": True
+            },
+            {
+                "type": "input",
+                "block_id": "birthday_input",
+                "element": {
+                    "type": "plain_text_input",
+                    "action_id": "birthday",
+                    "initial_value": profile.get("birthday", "") or "",  # Default to empty string if not present
+                    "placeholder": {
+                        "type": "plain_text",
+                        "text": "e.g. July 27th, 2004"
+                    }
+                },
+                "label": {
+                    "type": "plain_text",
+                    "text": ":birthday: Birthday"
+                },
+                "optional": True
+            },
+            {
+                "type": "input",
+                "block_id": "ask_me_about_input",
+                "element": {
+                    "type": "plain_text_input",
+                    "action_id": "ask_me_about",
+                    "initial_value": profile.get("ask_me_about", "") or "",  # Default to empty string if not present
+                    "placeholder": {
+                        "type": "plain_text",
+                        "text": "Highlight what makes you excited!"
+                    }
+                },
+                "label": {
+                    "type": "plain_text",
+                    "text": ":bulb: Ask me About"
+                },
+                "optional": True
+            }
+        ]
+    }
+
+    # Open the profile creation modal
+    client.views_open(
+        trigger_id=data["trigger_id"],
+        view=profile_modal_view
+    )
+
+
+@action_router.route("block_actions", "reset_profile_button")
+def handle_reset_profile_button(data):
+    # Reset the user's profile to the default message
+    # Open a confirmation modal for resetting the profile
+    confirmation_modal_view = {
+        "type": "modal",
+        "callback_id": "reset_profile_confirmation_modal",
+        "title": {
+            "type": "plain_text",
+            "text": "Confirm Reset Profile"
+        },
+        "blocks": [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": "Are you sure you want to reset your profile? This action cannot be undone."
+                }
+            },
+            {
+                "type": "actions",
+                "elements": [
                     {
-                        "type": "input",
-                        "block_id": "birthday_input",
-                        "element": {
-                            "type": "plain_text_input",
-                            "action_id": "birthday",
-                            "initial_value": profile.get("birthday", "") or "",  # Default to empty string if not present
-                            "placeholder": {
-                                "type": "plain_text",
-                                "text": "e.g. July 27th, 2004"
-                            }
-                        },
-                        "label": {
+                        "type": "button",
+                        "text": {
                             "type": "plain_text",
-                            "text": ":birthday: Birthday"
+                            "text": "Yes, Reset"
                         },
-                        "optional": True
+                        "style": "danger",
+                        "value": "confirm_reset",
+                        "action_id": "confirm_reset_button"
                     },
                     {
-                        "type": "input",
-                        "block_id": "ask_me_about_input",
-                        "element": {
-                            "type": "plain_text_input",
-                            "action_id": "ask_me_about",
-                            "initial_value": profile.get("ask_me_about", "") or "",  # Default to empty string if not present
-                            "placeholder": {
-                                "type": "plain_text",
-                                "text": "Highlight what makes you excited!"
-                            }
-                        },
-                        "label": {
+                        "type": "button",
+                        "text": {
                             "type": "plain_text",
-                            "text": ":bulb: Ask me About"
+                            "text": "Cancel"
                         },
-                        "optional": True
+                        "value": "cancel_reset",
+                        "action_id": "cancel_reset_button"
                     }
                 ]
             }
+        ]
+    }
 
-            # Open the profile creation modal
-            client.views_open(
-                trigger_id=data["trigger_id"],
-                view=profile_modal_view
-            )
 
+    # Open the confirmation modal
+    client.views_open(
+        trigger_id=data["trigger_id"],
+        view=confirmation_modal_view
+    )
 
 
-        elif action_id == "reset_profile_button":
-            # Reset the user's profile to the default message
-            # Open a confirmation modal for resetting the profile
-            confirmation_modal_view = {
-                "type": "modal",
-                "callback_id": "reset_profile_confirmation_modal",
-                "title": {
-                    "type": "plain_text",
-                    "text": "Confirm Reset Profile"
-                },
-                "blocks": [
-                    {
-                        "type": "section",
-                        "text": {
-                            "type": "mrkdwn",
-                            "text": "Are you sure you want to reset your profile? This action cannot be undone."
-                        }
-                    },
-                    {
-                        "type": "actions",
-                        "elements": [
-                            {
-                                "type": "button",
-                                "text": {
-                                    "type": "plain_text",
-                                    "text": "Yes, Reset"
-                                },
-                                "style": "danger",
-                                "value": "confirm_reset",
-                                "action_id": "confirm_reset_button"
-                            },
-                            {
-                                "type": "button",
-                                "text": {
-                                    "type": "plain_text",
-                                    "text": "Cancel"
-                                },
-                                "value": "cancel_reset",
-                                "action_id": "cancel_reset_button"
-                            }
-                        ]
-                    }
-                ]
-            }
+@action_router.route("block_actions", "confirm_reset_button")
+def handle_confirm_reset_button(data):
+    user_id = data["user"]["id"]
+    if user_id in user_profiles:
+        del user_profiles[user_id]  # Remove the custom profile
+    invalidate_profile(user_id, current_team_id())
 
+    # Update the home tab after resetting
+    update_home_tab({"event": {"user": user_id}}, is_user_opted_in(user_id, current_team_id()))
+    return jsonify({"response_action": "clear"}), 200
 
-            # Open the confirmation modal
-            client.views_open(
-                trigger_id=data["trigger_id"],
-                view=confirmation_modal_view
-            )
 
-         # Handle confirmation from the modal
-        elif action_id == "confirm_reset_button":
-            if user_id in user_profiles:
-                del user_profiles[user_id]  # Remove the custom profile
-
-            # Update the home tab after resetting
-            update_home_tab({"event": {"user": user_id}}, is_user_opted_in(user_id, team_id))
-            return jsonify({"response_action": "clear"}), 200
-        
-        elif action_id == "cancel_reset_button":
-            # Close the modal without action
-            return jsonify({"response_action": "clear"}), 200
-
-        elif action_id == "introduce_yourself_button":
-            # Existing "Introduce Yourself" button functionality
-            channels_response = client.conversations_list()
-            channels = channels_response['channels']
-            channel_options = [
-                {
-                    "text": {
-                        "type": "plain_text",
-                        "text": channel['name']
-                    },
-                    "value": channel['id']
-                }
-                for channel in channels if not channel['is_private']  # Filter for public channels only
-            ]
+@action_router.route("block_actions", "cancel_reset_button")
+def handle_cancel_reset_button(data):
+    # Close the modal without action
+    return jsonify({"response_action": "clear"}), 200
 
-            # Open a modal for the user to type their introduction
-            modal_view = {
-                "type": "modal",
-                "callback_id": "introduce_yourself_modal",
-                "title": {
-                    "type": "plain_text",
-                    "text": "Introduce Yourself"
+
+@action_router.route("block_actions", "introduce_yourself_button")
+def handle_introduce_yourself_button(data):
+    # Channel options are served from the channel catalog through block_suggestion requests
+
+    # Open a modal for the user to type their introduction
+    modal_view = {
+        "type": "modal",
+        "callback_id": "introduce_yourself_modal",
+        "title": {
+            "type": "plain_text",
+            "text": "Introduce Yourself"
+        },
+        "blocks": [
+            {
+                "type": "input",
+                "block_id": "introduction_input",
+                "element": {
+                    "type": "rich_text_input"  # Use rich_text_input for rich text editing
                 },
-                "blocks": [
-                    {
-                        "type": "input",
-                        "block_id": "introduction_input",
-                        "element": {
-                            "type": "rich_text_input"  # Use rich_text_input for rich text editing
-                        },
-                        "label": {
-                            "type": "plain_text",
-                            "text": "Tell us about yourself!"
-                        }
-                    },
-                    {
-                        "type": "input",
-                        "block_id": "channel_select",
-                        "element": {
-                            "type": "static_select",
-                            "placeholder": {
-                                "type": "plain_text",
-                                "text": "Select a channel"
-                            },
-                            "options": channel_options
-                        },
-                        "label": {
-                            "type": "plain_text",
-                            "text": "Select the channel to send your introduction"
-                        }
+                "label": {
+                    "type": "plain_text",
+                    "text": "Tell us about yourself!"
+                }
+            },
+            {
+                "type": "input",
+                "block_id": "channel_select",
+                "element": {
+                    "type": "external_select",
+                    "action_id": "introduction_channel",
+                    "min_query_length": 0,
+                    "placeholder": {
+                        "type": "plain_text",
+                        "text": "Select a channel"
                     }
-                ],
-                "submit": {
+                },
+                "label": {
                     "type": "plain_text",
-                    "text": "Send"
+                    "text": "Select the channel to send your introduction"
                 }
             }
+        ],
+        "submit": {
+            "type": "plain_text",
+            "text": "Send"
+        }
+    }
 
-            # Open the modal
-            client.views_open(
-                trigger_id=data["trigger_id"],
-                view=modal_view
-            )
+    # Open the modal
+    client.views_open(
+        trigger_id=data["trigger_id"],
+        view=modal_view
+    )
+
+
+@action_router.route("block_suggestion", "introduction_channel")
+def handle_introduction_channel_suggestion(data):
+    return jsonify({"options": current_channel_catalog().options(data.get("value", ""))}), 200
 
-        elif action_id == "view_profile_button":
-
-            # Safely get user ID from the action payload
-            if isinstance(payload.get("actions"), list) and len(payload["actions"]) > 0:
-                profile_user_id = payload["actions"][0].get("value")
-
-                if profile_user_id:
-                    profile = load_profile_from_db(profile_user_id, team_id)
-
-                    # Fetch the user's profile information from Slack (to get the profile picture)
-                    try:
-                        user_info = client.users_info(user=profile_user_id)
-                        profile_pic_url = user_info["user"]["profile"].get("image_512")  # Use a larger image size
-                        user_name = user_info["user"]["real_name"]
-                    except Exception as e:
-                        print(f"Error fetching user info: {e}")
-                        profile_pic_url = None
-                        user_name = "Unknown User"
-
-                    if profile is None:
-                        # Show message if no profile data exists
-                        profile_modal = {
-                            "type": "modal",
-                            "title": {"type": "plain_text", "text": "User Profile"},
-                            "blocks": [
-                                {
-                                    "type": "section",
-                                    "text": {"type": "mrkdwn", "text": "No profile available for this user."}
-                                }
-                            ]
-                        }
-                    else:
-                        # Construct profile modal using profile data
-                        profile_blocks = [
-                            {
-                                "type": "section",
-                                "text": {
-                                    "type": "mrkdwn",
-                                    "text": f"*Profile of {user_name}*"
-                                },
-                                "accessory": {
-                                    "type": "image",
-                                    "image_url": profile_pic_url,
-                                    "alt_text": f"{user_name}'s profile picture"
-                                }
-                            },
-                            {"type": "divider"},
-                        ]
-
-                        # Construct fields with emojis for each profile attribute
-                        profile_fields = []
-                        if profile.get("full_name"):
-                            profile_fields.append({"type": "mrkdwn", "text": f"*Full Name:* {profile.get('full_name', 'N/A')}"})
-                        if profile.get("pronouns"):
-                            profile_fields.append({"type": "mrkdwn", "text": f"*Pronouns:* {profile.get('pronouns', 'N/A')}"})
-                        if profile.get("location"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":round_pushpin: *Location:* {profile.get('location', 'N/A')}"})
-                        if profile.get("hometown"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":house: *Hometown:* {profile.get('hometown', 'N/A')}"})
-                        if profile.get("education"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":mortar_board: *Education:* {profile.get('education', 'N/A')}"})
-                        if profile.get("languages"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":speech_balloon: *Languages:* {profile.get(profile.get('languages', 'N/A'))}"})
-                        if profile.get("hobbies"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":clapper: *Hobbies:* {profile.get(profile.get('hobbies', 'N/A'))}"})
-                        if profile.get("birthday"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":birthday: *Birthday:* {profile.get('birthday', 'N/A')}"})
-                        if profile.get("ask_me_about"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":bulb: *Ask Me About:* {profile.get(profile.get('ask_me_about', 'N/A'))}"})
-
-                        # Add fields to the profile blocks
-                        profile_blocks.append({
-                            "type": "section",
-                            "fields": profile_fields
-                        })
-                        
-                        # Add bio if available
-                        profile_blocks.append({
-                            "type": "section",
-                            "text": {"type": "mrkdwn", "text": profile.get("bio", "No bio available.")}
-                        })
-
-                        # Construct the full profile modal
-                        profile_modal = {
-                            "type": "modal",
-                            "title": {"type": "plain_text", "text": "User Profile"},
-                            "blocks": profile_blocks
-                        }
 
-                    # Open the modal to view the profile
-                    client.views_open(
-                        trigger_id=payload["trigger_id"],
-                        view=profile_modal
-                    )
-                else:
-                    print("profile_user_id is missing or None.")
-            else:
-                print("payload['actions'] is not as expected:", payload.get("actions"))
-
-        elif action_id == "opt_in_button":
-            trigger_id = data["trigger_id"]
-            client.views_open(
-                trigger_id=trigger_id,
-                view={
-                    "type": "modal",
-                    "callback_id": "opt_in_confirmation",
-                    "title": {"type": "plain_text", "text": "Confirm Opt-In"},
-                    "blocks": [
-                        {"type": "section", "text": {"type": "mrkdwn", "text": "Are you sure you want to opt-in?"}},
+@action_router.route("block_actions", prefix="view_profile_button")
+def handle_view_profile_button(data):
+    # view_profile_button (introductions) and view_profile_button1..5 (pairing messages)
+    profile_user_id = data["actions"][0].get("value")
+
+    if profile_user_id:
+        # Open the modal to view the profile
+        client.views_open(
+            trigger_id=data["trigger_id"],
+            view=render_profile_modal(profile_user_id, current_team_id())
+        )
+    else:
+        print("profile_user_id is missing or None.")
+
+
+@action_router.route("block_actions", "opt_in_button")
+def handle_opt_in_button(data):
+    trigger_id = data["trigger_id"]
+    client.views_open(
+        trigger_id=trigger_id,
+        view={
+            "type": "modal",
+            "callback_id": "opt_in_confirmation",
+            "title": {"type": "plain_text", "text": "Confirm Opt-In"},
+            "blocks": [
+                {"type": "section", "text": {"type": "mrkdwn", "text": "Are you sure you want to opt-in?"}},
+                {
+                    "type": "actions",
+                    "elements": [
                         {
-                            "type": "actions",
-                            "elements": [
-                                {
-                                    "type": "button",
-                                    "text": {"type": "plain_text", "text": "Yes, Opt In"},
-                                    "value": "yes_opt_in",
-                                    "action_id": "confirm_opt_in"
-                                },
-                                {
-                                    "type": "button",
-                                    "text": {"type": "plain_text", "text": "Cancel"},
-                                    "value": "cancel_opt_in",
-                                    "action_id": "cancel_opt_in"
-                                }
-                            ]
+                            "type": "button",
+                            "text": {"type": "plain_text", "text": "Yes, Opt In"},
+                            "value": "yes_opt_in",
+                            "action_id": "confirm_opt_in"
+                        },
+                        {
+                            "type": "button",
+                            "text": {"type": "plain_text", "text": "Cancel"},
+                            "value": "cancel_opt_in",
+                            "action_id": "cancel_opt_in"
                         }
                     ]
                 }
-            )
+            ]
+        }
+    )
 
-        elif action_id == "confirm_opt_in":
-            user_id = data["user"]["id"]
-            full_name = load_profile_from_db(user_id, team_id).get("full_name", "Anonymous")
-
-            # Update opt-in status in DB and change the button to "Opt Out"
-            opt_in_user(user_id, team_id, full_name)
-            update_home_tab({"event": {"user": user_id}}, True)   # True indicates "opted in"
-
-            trigger_id = data["trigger_id"]
-            client.views_update(
-                view_id=data["view"]["id"],
-                view={
-                    "type": "modal",
-                    "title": {"type": "plain_text", "text": "Opted In"},
-                    "blocks": [
-                        {
-                            "type": "section",
-                            "text": {"type": "mrkdwn", "text": "You're now opted in! 🎉"}
-                        }
-                    ]
+
+@action_router.route("block_actions", "confirm_opt_in")
+def handle_confirm_opt_in(data):
+    user_id = data["user"]["id"]
+    full_name = load_profile_from_db(user_id, current_team_id()).get("full_name", "Anonymous")
+
+    # Update opt-in status in DB and change the button to "Opt Out"
+    opt_in_user(user_id, current_team_id(), full_name)
+    update_home_tab({"event": {"user": user_id}}, True)   # True indicates "opted in"
+
+    trigger_id = data["trigger_id"]
+    client.views_update(
+        view_id=data["view"]["id"],
+        view={
+            "type": "modal",
+            "title": {"type": "plain_text", "text": "Opted In"},
+            "blocks": [
+                {
+                    "type": "section",
+                    "text": {"type": "mrkdwn", "text": "You're now opted in! 🎉"}
                 }
-            )
-        
-        elif action_id == "cancel_opt_in":
-            # Close the modal without any action on "Cancel"
-            trigger_id = data["trigger_id"]
-            client.views_update(
-                view_id=data["view"]["id"],
-                view={
-                    "type": "modal",
-                    "title": {"type": "plain_text", "text": "Cancelled"},
-                    "blocks": [
-                        {
-                            "type": "section",
-                            "text": {"type": "mrkdwn", "text": "Your request has been cancelled."}
-                        }
-                    ],
-                    "close": {"type": "plain_text", "text": "Close"}
+            ]
+        }
+    )
+
+
+@action_router.route("block_actions", "cancel_opt_in")
+def handle_cancel_opt_in(data):
+    # Close the modal without any action on "Cancel"
+    trigger_id = data["trigger_id"]
+    client.views_update(
+        view_id=data["view"]["id"],
+        view={
+            "type": "modal",
+            "title": {"type": "plain_text", "text": "Cancelled"},
+            "blocks": [
+                {
+                    "type": "section",
+                    "text": {"type": "mrkdwn", "text": "Your request has been cancelled."}
                 }
-            )
+            ],
+            "close": {"type": "plain_text", "text": "Close"}
+        }
+    )
+
 
-        elif action_id == "opt_out_button":
-            trigger_id = data["trigger_id"]
-            client.views_open(
-                trigger_id=trigger_id,
-                view={
-                    "type": "modal",
-                    "callback_id": "opt_in_confirmation",
-                    "title": {"type": "plain_text", "text": "Confirm Opt-Out"},
-                    "blocks": [
-                        {"type": "section", "text": {"type": "mrkdwn", "text": "Are you sure you want to opt-out?"}},
+@action_router.route("block_actions", "opt_out_button")
+def handle_opt_out_button(data):
+    trigger_id = data["trigger_id"]
+    client.views_open(
+        trigger_id=trigger_id,
+        view={
+            "type": "modal",
+            "callback_id": "opt_in_confirmation",
+            "title": {"type": "plain_text", "text": "Confirm Opt-Out"},
+            "blocks": [
+                {"type": "section", "text": {"type": "mrkdwn", "text": "Are you sure you want to opt-out?"}},
+                {
+                    "type": "actions",
+                    "elements": [
                         {
-                            "type": "actions",
-                            "elements": [
-                                {
-                                    "type": "button",
-                                    "text": {"type": "plain_text", "text": "Yes, Opt Out"},
-                                    "value": "yes_opt_out",
-                                    "action_id": "confirm_opt_out"
-                                },
-                                {
-                                    "type": "button",
-                                    "text": {"type": "plain_text", "text": "Cancel"},
-                                    "value": "cancel_opt_out",
-                                    "action_id": "cancel_opt_out"
-                                }
-                            ]
-                        }
-                    ]
-                }
-            )
-        elif action_id == "confirm_opt_out":
-            user_id = data["user"]["id"]
-
-            # Update opt-out status in DB and revert the button to "Opt In"
-            opt_out_user(user_id, team_id)
-            update_home_tab({"event": {"user": user_id}}, False)  # False indicates "opted out"
-           
-            trigger_id = data["trigger_id"]
-            client.views_update(
-                view_id=data["view"]["id"],
-                view={
-                    "type": "modal",
-                    "title": {"type": "plain_text", "text": "Opted Out"},
-                    "blocks": [
+                            "type": "button",
+                            "text": {"type": "plain_text", "text": "Yes, Opt Out"},
+                            "value": "yes_opt_out",
+                            "action_id": "confirm_opt_out"
+                        },
                         {
-                            "type": "section",
-                            "text": {"type": "mrkdwn", "text": "You're now opted out :( you can always opt back in by clicking the Opt in button again :)"}
+                            "type": "button",
+                            "text": {"type": "plain_text", "text": "Cancel"},
+                            "value": "cancel_opt_out",
+                            "action_id": "cancel_opt_out"
                         }
                     ]
                 }
-            )
-        elif action_id == "cancel_opt_out":
-            # Close the modal without any action on "Cancel"
-            trigger_id = data["trigger_id"]
-            client.views_update(
-                view_id=data["view"]["id"],
-                view={
-                    "type": "modal",
-                    "title": {"type": "plain_text", "text": "Cancelled"},
-                    "blocks": [
-                        {
-                            "type": "section",
-                            "text": {"type": "mrkdwn", "text": "Your request has been cancelled."}
-                        }
-                    ],
-                    "close": {"type": "plain_text", "text": "Close"}
-                }
-            )
+            ]
+        }
+    )
 
-        elif action_id == "view_profile_button1":
-            print("hello")
-            # Safely get user ID from the action payload
-            if isinstance(payload.get("actions"), list) and len(payload["actions"]) > 0:
-                profile_user_id = payload["actions"][0].get("value")
-
-                if profile_user_id:
-                    profile = load_profile_from_db(profile_user_id, team_id)
-
-                    # Fetch the user's profile information from Slack (to get the profile picture)
-                    try:
-                        user_info = client.users_info(user=profile_user_id)
-                        profile_pic_url = user_info["user"]["profile"].get("image_512")  # Use a larger image size
-                        user_name = user_info["user"]["real_name"]
-                    except Exception as e:
-                        print(f"Error fetching user info: {e}")
-                        profile_pic_url = None
-                        user_name = "Unknown User"
-
-                    if profile is None:
-                        # Show message if no profile data exists
-                        profile_modal = {
-                            "type": "modal",
-                            "title": {"type": "plain_text", "text": "User Profile"},
-                            "blocks": [
-                                {
-                                    "type": "section",
-                                    "text": {"type": "mrkdwn", "text": "No profile available for this user."}
-                                }
-                            ]
-                        }
-                    else:
-                        # Construct profile modal using profile data
-                        profile_blocks = [
-                            {
-                                "type": "section",
-                                "text": {
-                                    "type": "mrkdwn",
-                                    "text": f"*Profile of {user_name}*"
-                                },
-                                "accessory": {
-                                    "type": "image",
-                                    "image_url": profile_pic_url,
-                                    "alt_text": f"{user_name}'s profile picture"
-                                }
-                            },
-                            {"type": "divider"},
-                        ]
-
-                        # Construct fields with emojis for each profile attribute
-                        profile_fields = []
-                        if profile.get("full_name"):
-                            profile_fields.append({"type": "mrkdwn", "text": f"*Full Name:* {profile.get('full_name', 'N/A')}"})
-                        if profile.get("pronouns"):
-                            profile_fields.append({"type": "mrkdwn", "text": f"*Pronouns:* {profile.get('pronouns', 'N/A')}"})
-                        if profile.get("location"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":round_pushpin: *Location:* {profile.get('location', 'N/A')}"})
-                        if profile.get("hometown"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":house: *Hometown:* {profile.get('hometown', 'N/A')}"})
-                        if profile.get("education"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":mortar_board: *Education:* {profile.get('education', 'N/A')}"})
-                        if profile.get("languages"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":speech_balloon: *Languages:* {profile.get(profile.get('languages', 'N/A'))}"})
-                        if profile.get("hobbies"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":clapper: *Hobbies:* {profile.get(profile.get('hobbies', 'N/A'))}"})
-                        if profile.get("birthday"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":birthday: *Birthday:* {profile.get('birthday', 'N/A')}"})
-                        if profile.get("ask_me_about"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":bulb: *Ask Me About:* {profile.get(profile.get('ask_me_about', 'N/A'))}"})
-
-                        # Add fields to the profile blocks
-                        profile_blocks.append({
-                            "type": "section",
-                            "fields": profile_fields
-                        })
-                        
-                        # Add bio if available
-                        profile_blocks.append({
-                            "type": "section",
-                            "text": {"type": "mrkdwn", "text": profile.get("bio", "No bio available.")}
-                        })
-
-                        # Construct the full profile modal
-                        profile_modal = {
-                            "type": "modal",
-                            "title": {"type": "plain_text", "text": "User Profile"},
-                            "blocks": profile_blocks
-                        }
 
-                    # Open the modal to view the profile
-                    client.views_open(
-                        trigger_id=payload["trigger_id"],
-                        view=profile_modal
-                    )
-                else:
-                    print("profile_user_id is missing or None.")
-            else:
-                print("payload['actions'] is not as expected:", payload.get("actions"))
+@action_router.route("block_actions", "confirm_opt_out")
+def handle_confirm_opt_out(data):
+    user_id = data["user"]["id"]
 
-    
+    # Update opt-out status in DB and revert the button to "Opt In"
+    opt_out_user(user_id, current_team_id())
+    update_home_tab({"event": {"user": user_id}}, False)  # False indicates "opted out"
 
-        elif action_id == "view_profile_button2":
-            print("hello")
-            # Safely get user ID from the action payload
-            if isinstance(payload.get("actions"), list) and len(payload["actions"]) > 0:
-                profile_user_id = payload["actions"][0].get("value")
-
-                if profile_user_id:
-                    profile = load_profile_from_db(profile_user_id, team_id)
-
-                    # Fetch the user's profile information from Slack (to get the profile picture)
-                    try:
-                        user_info = client.users_info(user=profile_user_id)
-                        profile_pic_url = user_info["user"]["profile"].get("image_512")  # Use a larger image size
-                        user_name = user_info["user"]["real_name"]
-                    except Exception as e:
-                        print(f"Error fetching user info: {e}")
-                        profile_pic_url = None
-                        user_name = "Unknown User"
-
-                    if profile is None:
-                        # Show message if no profile data exists
-                        profile_modal = {
-                            "type": "modal",
-                            "title": {"type": "plain_text", "text": "User Profile"},
-                            "blocks": [
-                                {
-                                    "type": "section",
-                                    "text": {"type": "mrkdwn", "text": "No profile available for this user."}
-                                }
-                            ]
-                        }
-                    else:
-                        # Construct profile modal using profile data
-                        profile_blocks = [
-                            {
-                                "type": "section",
-                                "text": {
-                                    "type": "mrkdwn",
-                                    "text": f"*Profile of {user_name}*"
-                                },
-                                "accessory": {
-                                    "type": "image",
-                                    "image_url": profile_pic_url,
-                                    "alt_text": f"{user_name}'s profile picture"
-                                }
-                            },
-                            {"type": "divider"},
-                        ]
-
-                        # Construct fields with emojis for each profile attribute
-                        profile_fields = []
-                        if profile.get("full_name"):
-                            profile_fields.append({"type": "mrkdwn", "text": f"*Full Name:* {profile.get('full_name', 'N/A')}"})
-                        if profile.get("pronouns"):
-                            profile_fields.append({"type": "mrkdwn", "text": f"*Pronouns:* {profile.get('pronouns', 'N/A')}"})
-                        if profile.get("location"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":round_pushpin: *Location:* {profile.get('location', 'N/A')}"})
-                        if profile.get("hometown"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":house: *Hometown:* {profile.get('hometown', 'N/A')}"})
-                        if profile.get("education"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":mortar_board: *Education:* {profile.get('education', 'N/A')}"})
-                        if profile.get("languages"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":speech_balloon: *Languages:* {profile.get(profile.get('languages', 'N/A'))}"})
-                        if profile.get("hobbies"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":clapper: *Hobbies:* {profile.get(profile.get('hobbies', 'N/A'))}"})
-                        if profile.get("birthday"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":birthday: *Birthday:* {profile.get('birthday', 'N/A')}"})
-                        if profile.get("ask_me_about"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":bulb: *Ask Me About:* {profile.get(profile.get('ask_me_about', 'N/A'))}"})
-
-                        # Add fields to the profile blocks
-                        profile_blocks.append({
-                            "type": "section",
-                            "fields": profile_fields
-                        })
-                        
-                        # Add bio if available
-                        profile_blocks.append({
-                            "type": "section",
-                            "text": {"type": "mrkdwn", "text": profile.get("bio", "No bio available.")}
-                        })
-
-                        # Construct the full profile modal
-                        profile_modal = {
-                            "type": "modal",
-                            "title": {"type": "plain_text", "text": "User Profile"},
-                            "blocks": profile_blocks
-                        }
+    trigger_id = data["trigger_id"]
+    client.views_update(
+        view_id=data["view"]["id"],
+        view={
+            "type": "modal",
+            "title": {"type": "plain_text", "text": "Opted Out"},
+            "blocks": [
+                {
+                    "type": "section",
+                    "text": {"type": "mrkdwn", "text": "You're now opted out :( you can always opt back in by clicking the Opt in button again :)"}
+                }
+            ]
+        }
+    )
 
-                    # Open the modal to view the profile
-                    client.views_open(
-                        trigger_id=payload["trigger_id"],
-                        view=profile_modal
-                    )
-                else:
-                    print("profile_user_id is missing or None.")
-            else:
-                print("payload['actions'] is not as expected:", payload.get("actions"))
-
-        elif action_id == "view_profile_button3":
-            print("hello")
-            # Safely get user ID from the action payload
-            if isinstance(payload.get("actions"), list) and len(payload["actions"]) > 0:
-                profile_user_id = payload["actions"][0].get("value")
-
-                if profile_user_id:
-                    profile = load_profile_from_db(profile_user_id, team_id)
-
-                    # Fetch the user's profile information from Slack (to get the profile picture)
-                    try:
-                        user_info = client.users_info(user=profile_user_id)
-                        profile_pic_url = user_info["user"]["profile"].get("image_512")  # Use a larger image size
-                        user_name = user_info["user"]["real_name"]
-                    except Exception as e:
-                        print(f"Error fetching user info: {e}")
-                        profile_pic_url = None
-                        user_name = "Unknown User"
-
-                    if profile is None:
-                        # Show message if no profile data exists
-                        profile_modal = {
-                            "type": "modal",
-                            "title": {"type": "plain_text", "text": "User Profile"},
-                            "blocks": [
-                                {
-                                    "type": "section",
-                                    "text": {"type": "mrkdwn", "text": "No profile available for this user."}
-                                }
-                            ]
-                        }
-                    else:
-                        # Construct profile modal using profile data
-                        profile_blocks = [
-                            {
-                                "type": "section",
-                                "text": {
-                                    "type": "mrkdwn",
-                                    "text": f"*Profile of {user_name}*"
-                                },
-                                "accessory": {
-                                    "type": "image",
-                                    "image_url": profile_pic_url,
-                                    "alt_text": f"{user_name}'s profile picture"
-                                }
-                            },
-                            {"type": "divider"},
-                        ]
-
-                        # Construct fields with emojis for each profile attribute
-                        profile_fields = []
-                        if profile.get("full_name"):
-                            profile_fields.append({"type": "mrkdwn", "text": f"*Full Name:* {profile.get('full_name', 'N/A')}"})
-                        if profile.get("pronouns"):
-                            profile_fields.append({"type": "mrkdwn", "text": f"*Pronouns:* {profile.get('pronouns', 'N/A')}"})
-                        if profile.get("location"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":round_pushpin: *Location:* {profile.get('location', 'N/A')}"})
-                        if profile.get("hometown"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":house: *Hometown:* {profile.get('hometown', 'N/A')}"})
-                        if profile.get("education"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":mortar_board: *Education:* {profile.get('education', 'N/A')}"})
-                        if profile.get("languages"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":speech_balloon: *Languages:* {profile.get(profile.get('languages', 'N/A'))}"})
-                        if profile.get("hobbies"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":clapper: *Hobbies:* {profile.get(profile.get('hobbies', 'N/A'))}"})
-                        if profile.get("birthday"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":birthday: *Birthday:* {profile.get('birthday', 'N/A')}"})
-                        if profile.get("ask_me_about"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":bulb: *Ask Me About:* {profile.get(profile.get('ask_me_about', 'N/A'))}"})
-
-                        # Add fields to the profile blocks
-                        profile_blocks.append({
-                            "type": "section",
-                            "fields": profile_fields
-                        })
-                        
-                        # Add bio if available
-                        profile_blocks.append({
-                            "type": "section",
-                            "text": {"type": "mrkdwn", "text": profile.get("bio", "No bio available.")}
-                        })
-
-                        # Construct the full profile modal
-                        profile_modal = {
-                            "type": "modal",
-                            "title": {"type": "plain_text", "text": "User Profile"},
-                            "blocks": profile_blocks
-                        }
 
-                    # Open the modal to view the profile
-                    client.views_open(
-                        trigger_id=payload["trigger_id"],
-                        view=profile_modal
-                    )
-                else:
-                    print("profile_user_id is missing or None.")
-            else:
-                print("payload['actions'] is not as expected:", payload.get("actions"))
-
-        elif action_id == "view_profile_button4":
-            print("hello")
-            # Safely get user ID from the action payload
-            if isinstance(payload.get("actions"), list) and len(payload["actions"]) > 0:
-                profile_user_id = payload["actions"][0].get("value")
-
-                if profile_user_id:
-                    profile = load_profile_from_db(profile_user_id, team_id)
-
-                    # Fetch the user's profile information from Slack (to get the profile picture)
-                    try:
-                        user_info = client.users_info(user=profile_user_id)
-                        profile_pic_url = user_info["user"]["profile"].get("image_512")  # Use a larger image size
-                        user_name = user_info["user"]["real_name"]
-                    except Exception as e:
-                        print(f"Error fetching user info: {e}")
-                        profile_pic_url = None
-                        user_name = "Unknown User"
-
-                    if profile is None:
-                        # Show message if no profile data exists
-                        profile_modal = {
-                            "type": "modal",
-                            "title": {"type": "plain_text", "text": "User Profile"},
-                            "blocks": [
-                                {
-                                    "type": "section",
-                                    "text": {"type": "mrkdwn", "text": "No profile available for this user."}
-                                }
-                            ]
-                        }
-                    else:
-                        # Construct profile modal using profile data
-                        profile_blocks = [
-                            {
-                                "type": "section",
-                                "text": {
-                                    "type": "mrkdwn",
-                                    "text": f"*Profile of {user_name}*"
-                                },
-                                "accessory": {
-                                    "type": "image",
-                                    "image_url": profile_pic_url,
-                                    "alt_text": f"{user_name}'s profile picture"
-                                }
-                            },
-                            {"type": "divider"},
-                        ]
-
-                        # Construct fields with emojis for each profile attribute
-                        profile_fields = []
-                        if profile.get("full_name"):
-                            profile_fields.append({"type": "mrkdwn", "text": f"*Full Name:* {profile.get('full_name', 'N/A')}"})
-                        if profile.get("pronouns"):
-                            profile_fields.append({"type": "mrkdwn", "text": f"*Pronouns:* {profile.get('pronouns', 'N/A')}"})
-                        if profile.get("location"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":round_pushpin: *Location:* {profile.get('location', 'N/A')}"})
-                        if profile.get("hometown"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":house: *Hometown:* {profile.get('hometown', 'N/A')}"})
-                        if profile.get("education"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":mortar_board: *Education:* {profile.get('education', 'N/A')}"})
-                        if profile.get("languages"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":speech_balloon: *Languages:* {profile.get(profile.get('languages', 'N/A'))}"})
-                        if profile.get("hobbies"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":clapper: *Hobbies:* {profile.get(profile.get('hobbies', 'N/A'))}"})
-                        if profile.get("birthday"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":birthday: *Birthday:* {profile.get('birthday', 'N/A')}"})
-                        if profile.get("ask_me_about"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":bulb: *Ask Me About:* {profile.get(profile.get('ask_me_about', 'N/A'))}"})
-
-                        # Add fields to the profile blocks
-                        profile_blocks.append({
-                            "type": "section",
-                            "fields": profile_fields
-                        })
-                        
-                        # Add bio if available
-                        profile_blocks.append({
-                            "type": "section",
-                            "text": {"type": "mrkdwn", "text": profile.get("bio", "No bio available.")}
-                        })
-
-                        # Construct the full profile modal
-                        profile_modal = {
-                            "type": "modal",
-                            "title": {"type": "plain_text", "text": "User Profile"},
-                            "blocks": profile_blocks
-                        }
+@action_router.route("block_actions", "cancel_opt_out")
+def handle_cancel_opt_out(data):
+    # Close the modal without any action on "Cancel"
+    trigger_id = data["trigger_id"]
+    client.views_update(
+        view_id=data["view"]["id"],
+        view={
+            "type": "modal",
+            "title": {"type": "plain_text", "text": "Cancelled"},
+            "blocks": [
+                {
+                    "type": "section",
+                    "text": {"type": "mrkdwn", "text": "Your request has been cancelled."}
+                }
+            ],
+            "close": {"type": "plain_text", "text": "Close"}
+        }
+    )
 
-                    # Open the modal to view the profile
-                    client.views_open(
-                        trigger_id=payload["trigger_id"],
-                        view=profile_modal
-                    )
-                else:
-                    print("profile_user_id is missing or None.")
-            else:
-                print("payload['actions'] is not as expected:", payload.get("actions"))
-
-        elif action_id == "view_profile_button5":
-            print("hello")
-            # Safely get user ID from the action payload
-            if isinstance(payload.get("actions"), list) and len(payload["actions"]) > 0:
-                profile_user_id = payload["actions"][0].get("value")
-
-                if profile_user_id:
-                    profile = load_profile_from_db(profile_user_id, team_id)
-
-                    # Fetch the user's profile information from Slack (to get the profile picture)
-                    try:
-                        user_info = client.users_info(user=profile_user_id)
-                        profile_pic_url = user_info["user"]["profile"].get("image_512")  # Use a larger image size
-                        user_name = user_info["user"]["real_name"]
-                    except Exception as e:
-                        print(f"Error fetching user info: {e}")
-                        profile_pic_url = None
-                        user_name = "Unknown User"
-
-                    if profile is None:
-                        # Show message if no profile data exists
-                        profile_modal = {
-                            "type": "modal",
-                            "title": {"type": "plain_text", "text": "User Profile"},
-                            "blocks": [
-                                {
-                                    "type": "section",
-                                    "text": {"type": "mrkdwn", "text": "No profile available for this user."}
-                                }
-                            ]
-                        }
-                    else:
-                        # Construct profile modal using profile data
-                        profile_blocks = [
-                            {
-                                "type": "section",
-                                "text": {
-                                    "type": "mrkdwn",
-                                    "text": f"*Profile of {user_name}*"
-                                },
-                                "accessory": {
-                                    "type": "image",
-                                    "image_url": profile_pic_url,
-                                    "alt_text": f"{user_name}'s profile picture"
-                                }
-                            },
-                            {"type": "divider"},
-                        ]
-
-                        # Construct fields with emojis for each profile attribute
-                        profile_fields = []
-                        if profile.get("full_name"):
-                            profile_fields.append({"type": "mrkdwn", "text": f"*Full Name:* {profile.get('full_name', 'N/A')}"})
-                        if profile.get("pronouns"):
-                            profile_fields.append({"type": "mrkdwn", "text": f"*Pronouns:* {profile.get('pronouns', 'N/A')}"})
-                        if profile.get("location"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":round_pushpin: *Location:* {profile.get('location', 'N/A')}"})
-                        if profile.get("hometown"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":house: *Hometown:* {profile.get('hometown', 'N/A')}"})
-                        if profile.get("education"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":mortar_board: *Education:* {profile.get('education', 'N/A')}"})
-                        if profile.get("languages"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":speech_balloon: *Languages:* {profile.get(profile.get('languages', 'N/A'))}"})
-                        if profile.get("hobbies"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":clapper: *Hobbies:* {profile.get(profile.get('hobbies', 'N/A'))}"})
-                        if profile.get("birthday"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":birthday: *Birthday:* {profile.get('birthday', 'N/A')}"})
-                        if profile.get("ask_me_about"):
-                            profile_fields.append({"type": "mrkdwn", "text": f":bulb: *Ask Me About:* {profile.get(profile.get('ask_me_about', 'N/A'))}"})
-
-                        # Add fields to the profile blocks
-                        profile_blocks.append({
-                            "type": "section",
-                            "fields": profile_fields
-                        })
-                        
-                        # Add bio if available
-                        profile_blocks.append({
-                            "type": "section",
-                            "text": {"type": "mrkdwn", "text": profile.get("bio", "No bio available.")}
-                        })
-
-                        # Construct the full profile modal
-                        profile_modal = {
-                            "type": "modal",
-                            "title": {"type": "plain_text", "text": "User Profile"},
-                            "blocks": profile_blocks
-                        }
 
-                    # Open the modal to view the profile
-                    client.views_open(
-                        trigger_id=payload["trigger_id"],
-                        view=profile_modal
-                    )
-                else:
-                    print("profile_user_id is missing or None.")
-            else:
-                print("payload['actions'] is not as expected:", payload.get("actions"))
-
-                
-        elif data["type"] == "view_submission":
-            # Handle modal submissions
-            user_id = data["user"]["id"]
-
-            # Check if the submission is from the profile creation modal
-            # Handle modal submissions
-            if data["view"]["callback_id"] == "profile_creation_modal":
-                # Extract user inputs, initializing empty values for optional fields
-                full_name = data["view"]["state"]["values"].get("full_name_input", {}).get("full_name", {}).get("value", "")
-                bio = data["view"]["state"]["values"].get("bio_input", {}).get("bio", {}).get("value", "")
-                pronouns = data["view"]["state"]["values"].get("pronouns_input", {}).get("pronouns", {}).get("value", "")
-                location = data["view"]["state"]["values"].get("location_input", {}).get("location", {}).get("value", "")
-                hometown = data["view"]["state"]["values"].get("hometown_input", {}).get("hometown", {}).get("value", "")
-                education = data["view"]["state"]["values"].get("education_input", {}).get("education", {}).get("value", "")
-                languages = data["view"]["state"]["values"].get("languages_input", {}).get("languages", {}).get("value", "")
-                hobbies = data["view"]["state"]["values"].get("hobbies_input", {}).get("hobbies", {}).get("value", "")
-                birthday = data["view"]["state"]["values"].get("birthday_input", {}).get("birthday", {}).get("value", "")
-                ask_me_about = data["view"]["state"]["values"].get("ask_me_about_input", {}).get("ask_me_about", {}).get("value", "")
-
-                # Store the profile in our simulated storage only if the field is not empty
-                user_profiles[user_id] = {
-                    "full_name": full_name if full_name else None,
-                    "bio": bio if bio else None,
-                    "pronouns": pronouns if pronouns else None,
-                    "location": location if location else None,
-                    "hometown": hometown if hometown else None,
-                    "education": education if education else None,
-                    "languages": languages if languages else None,
-                    "hobbies": hobbies if hobbies else None,
-                    "birthday": birthday if birthday else None,
-                    "ask_me_about": ask_me_about if ask_me_about else None,
-                }
+@action_router.route("view_submission", "profile_creation_modal")
+def handle_profile_creation_modal(data):
+    user_id = data["user"]["id"]
+
+    # Extract user inputs, initializing empty values for optional fields
+    full_name = data["view"]["state"]["values"].get("full_name_input", {}).get("full_name", {}).get("value", "")
+    bio = data["view"]["state"]["values"].get("bio_input", {}).get("bio", {}).get("value", "")
+    pronouns = data["view"]["state"]["values"].get("pronouns_input", {}).get("pronouns", {}).get("value", "")
+    location = data["view"]["state"]["values"].get("location_input", {}).get("location", {}).get("value", "")
+    hometown = data["view"]["state"]["values"].get("hometown_input", {}).get("hometown", {}).get("value", "")
+    education = data["view"]["state"]["values"].get("education_input", {}).get("education", {}).get("value", "")
+    languages = data["view"]["state"]["values"].get("languages_input", {}).get("languages", {}).get("value", "")
+    hobbies = data["view"]["state"]["values"].get("hobbies_input", {}).get("hobbies", {}).get("value", "")
+    birthday = data["view"]["state"]["values"].get("birthday_input", {}).get("birthday", {}).get("value", "")
+    ask_me_about = data["view"]["state"]["values"].get("ask_me_about_input", {}).get("ask_me_about", {}).get("value", "")
+
+    # Store the profile in our simulated storage only if the field is not empty
+    user_profiles[user_id] = {
+        "full_name": full_name if full_name else None,
+        "bio": bio if bio else None,
+        "pronouns": pronouns if pronouns else None,
+        "location": location if location else None,
+        "hometown": hometown if hometown else None,
+        "education": education if education else None,
+        "languages": languages if languages else None,
+        "hobbies": hobbies if hobbies else None,
+        "birthday": birthday if birthday else None,
+        "ask_me_about": ask_me_about if ask_me_about else None,
+    }
+
 
 
+    # Save the profile to the database
+    try:
+        save_profile_to_db(user_id, user_profiles[user_id], current_team_id())
+    except Exception as e:
+        print(f"Error saving profile to database: {e}")
+    # Update the Home Tab to reflect the new profile information
+    update_home_tab({"event": {"user": user_id}}, is_user_opted_in(user_id, current_team_id()))
+
+
+@action_router.route("view_submission", "introduce_yourself_modal")
+def handle_introduce_yourself_modal(data):
+    user_id = data["user"]["id"]
+
+    # Existing "Introduce Yourself" submission handling (no changes)
+    introduction = None
+    selected_channel = None
+
+    # Accessing the introduction input
+    introduction_block = data["view"]["state"]["values"].get("introduction_input", {}).get("Cq4Y/")
+    if introduction_block:
+        # Access the rich text value
+        rich_text_value = introduction_block.get("rich_text_value", {})
+        if "elements" in rich_text_value:
+            # Convert the rich text elements to plain text
+            introduction = convert_rich_text_to_slack_format(rich_text_value)
+
+    # Accessing the selected channel
+    selected_channel_block = data["view"]["state"]["values"].get("channel_select", {}).get("introduction_channel")
+    if selected_channel_block:
+        selected_channel = selected_channel_block["selected_option"]["value"]
+
+
+    # Send the introduction to the selected channel
+    if introduction and selected_channel:
+        try:
+            # Get user profile information to fetch the profile picture URL
+            user_info = user_directory.get(user_id)
+            profile_pic_url = user_info["image_48"]  # You can adjust the size as needed
 
-                # Save the profile to the database
-                try:
-                    save_profile_to_db(user_id, user_profiles[user_id], team_id)
-                except Exception as e:
-                    print(f"Error saving profile to database: {e}")
-                # Update the Home Tab to reflect the new profile information
-                update_home_tab({"event": {"user": user_id}}, is_user_opted_in(user_id, team_id))
-
-        elif data["view"]["callback_id"] == "introduce_yourself_modal":
-            # Existing "Introduce Yourself" submission handling (no changes)
-            introduction = None
-            selected_channel = None
-
-            # Accessing the introduction input
-            introduction_block = data["view"]["state"]["values"].get("introduction_input", {}).get("Cq4Y/")
-            if introduction_block:
-                # Access the rich text value
-                rich_text_value = introduction_block.get("rich_text_value", {})
-                if "elements" in rich_text_value:
-                    # Convert the rich text elements to plain text
-                    introduction = convert_rich_text_to_slack_format(rich_text_value)
-
-            # Accessing the selected channel
-            selected_channel_block = data["view"]["state"]["values"].get("channel_select", {}).get("5YFoV")
-            if selected_channel_block:
-                selected_channel = selected_channel_block["selected_option"]["value"]
-
-
-            # Send the introduction to the selected channel
-            if introduction and selected_channel:
-                try:
-                    # Get user profile information to fetch the profile picture URL
-                    user_info = client.users_info(user=user_id)
-                    profile_pic_url = user_info["user"]["profile"].get("image_48")  # You can adjust the size as needed
-
-                    # Create a message with blocks
-                    blocks = [
+            # Create a message with blocks
+            blocks = [
+                {
+                    "type": "section",
+                    "text": {
+                        "type": "mrkdwn",
+                        "text": f"*New Introduction from <@{user_id}>:*\n\n{introduction}"
+                    },
+                    "accessory": {
+                        "type": "image",
+                        "image_url": profile_pic_url,
+                        "alt_text": f"{user_info['real_name']}'s profile picture"  # Alt text for accessibility
+                    }
+                },
+                {
+                    "type": "actions",
+                    "elements": [
                         {
-                            "type": "section",
+                            "type": "button",
                             "text": {
-                                "type": "mrkdwn",
-                                "text": f"*New Introduction from <@{user_id}>:*\n\n{introduction}"
+                                "type": "plain_text",
+                                "text": "View Profile"
                             },
-                            "accessory": {
-                                "type": "image",
-                                "image_url": profile_pic_url,
-                                "alt_text": f"{user_info['user']['real_name']}'s profile picture"  # Alt text for accessibility
-                            }
-                        },
-                        {
-                            "type": "actions",
-                            "elements": [
-                                {
-                                    "type": "button",
-                                    "text": {
-                                        "type": "plain_text",
-                                        "text": "View Profile"
-                                    },
-                                    "value": user_id,  # Use user ID to link to the profile
-                                    "action_id": "view_profile_button"
-                                }
-                            ]
+                            "value": user_id,  # Use user ID to link to the profile
+                            "action_id": "view_profile_button"
                         }
                     ]
+                }
+            ]
+
+            client.chat_postMessage(
+                channel=selected_channel,
+                blocks=blocks
+            )
+            print("Introduction sent to the selected channel.")
+        except slack_sdk.errors.SlackApiError as e:
+            print(f"Error sending message to the channel: {e.response['error']}")
+    else:
+        print("Introduction or channel selection is missing.")
+
+
+# OAuth install. /slack/install sends the browser to Slack with a fresh `state`, also set
+# as a cookie; /slack/oauth_redirect only accepts a code whose state matches that cookie,
+# so a code from someone else's install flow can't be replayed into this browser (CSRF).
+# The state is signed with the client secret and expires, so any worker can check it.
+OAUTH_STATE_COOKIE = "slack_oauth_state"
+OAUTH_STATE_TTL = int(os.environ.get("OAUTH_STATE_TTL", 600))
+OAUTH_SCOPES = os.environ.get("SLACK_SCOPES", "chat:write,im:write,im:history,users:read,channels:read")
+
+
+def sign_oauth_state(issued_at, nonce):
+    message = f"{issued_at}.{nonce}".encode()
+    return hmac.new(os.environ["SLACK_CLIENT_SECRET"].encode(), message, hashlib.sha256).hexdigest()
 
-                    client.chat_postMessage(
-                        channel=selected_channel,
-                        blocks=blocks
-                    )
-                    print("Introduction sent to the selected channel.")
-                except slack_sdk.errors.SlackApiError as e:
-                    print(f"Error sending message to the channel: {e.response['error']}")
-            else:
-                print("Introduction or channel selection is missing.")
 
-    return "", 200
+def new_oauth_state():
+    issued_at = int(time.time())
+    nonce = secrets.token_urlsafe(16)
+    return f"{issued_at}.{nonce}.{sign_oauth_state(issued_at, nonce)}"
+
+
+def valid_oauth_state(state, cookie):
+    if not state or not cookie or not hmac.compare_digest(state, cookie):
+        return False
+    try:
+        issued_at, nonce, signature = state.split(".")
+        issued_at = int(issued_at)
+    except ValueError:
+        return False
+    if time.time() - issued_at > OAUTH_STATE_TTL:
+        return False
+    return hmac.compare_digest(signature, sign_oauth_state(issued_at, nonce))
+
+
+@app.route("/slack/install", methods=["GET"])
+def oauth_install():
+    if "SLACK_CLIENT_ID" not in os.environ:
+        return "", 404
+    state = new_oauth_state()
+    query = urlencode({"client_id": os.environ["SLACK_CLIENT_ID"], "scope": OAUTH_SCOPES, "state": state})
+    response = redirect(f"https://slack.com/oauth/v2/authorize?{query}")
+    response.set_cookie(OAUTH_STATE_COOKIE, state, max_age=OAUTH_STATE_TTL, secure=True, httponly=True, samesite="Lax")
+    return response
+
+
+# OAuth redirect: exchanges the install code for a bot token and stores it for the workspace
+@app.route("/slack/oauth_redirect", methods=["GET"])
+def oauth_redirect():
+    code = request.args.get("code")
+    if not code or "SLACK_CLIENT_ID" not in os.environ:
+        return "", 400
+    if not valid_oauth_state(request.args.get("state"), request.cookies.get(OAUTH_STATE_COOKIE)):
+        return "This install link has expired or wasn't started here. Please start the installation again.", 403
+    try:
+        response = RateLimitedClient(slack_sdk.WebClient()).oauth_v2_access(
+            client_id=os.environ["SLACK_CLIENT_ID"],
+            client_secret=os.environ["SLACK_CLIENT_SECRET"],
+            code=code
+        )
+    except SlackApiError as e:
+        print(f"Error completing installation: {e.response['error']}")
+        return "Installation failed.", 400
+    # Enterprise Grid org-wide installs have no team; installations are stored per workspace
+    if not response.get("team"):
+        print(f"Rejected an org-wide installation for enterprise {(response.get('enterprise') or {}).get('id')}.")
+        return "Org-wide installation isn't supported. Please install the bot into a single workspace.", 400
+    team_id = response["team"]["id"]
+    installation_store.save(team_id, response["access_token"], response["bot_user_id"])
+    client_pool.evict(team_id)
+    result = make_response("The bot has been installed in your workspace.", 200)
+    result.delete_cookie(OAUTH_STATE_COOKIE)
+    return result
+
+
+# Queue depth, latency, pool and cache counters
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify({
+        "action_queue": action_queue.stats() if action_queue else None,
+        "db_pool": db_pool.stats(),
+        "async_db": async_storage.stats(),
+        "storage": storage.name,
+        "db_replicas": storage.replicas.stats() if storage.replicas else None,
+        "profile_cache": profile_cache.stats(),
+        "opt_in_membership": opt_in_membership.stats(),
+        "slack_api": client.stats(),
+        "slack_clients": client_pool.stats(),
+        "installations": installation_store.stats(),
+        "user_directory": user_directory.stats(),
+        "home_tab": dict(home_tab_stats, hashes=home_tab_hashes.stats()),
+        "profile_modal_cache": profile_modal_cache.stats(),
+        "actions": action_router.stats(),
+        "events": event_dedup.stats(),
+        "startup_seconds": startup_seconds,
+    })
 
 # Set up scheduler
-scheduler = BackgroundScheduler()
-scheduler.add_job(pair_users_weekly, 'interval', minutes=1)
-scheduler.start()
+# APScheduler is imported here rather than at the top so PAIRING_SCHEDULER=0 (tests, extra
+# web replicas that shouldn't run the pairing job) never loads it
+scheduler = None
+
+def start_scheduler():
+    global scheduler
+    from apscheduler.schedulers.background import BackgroundScheduler
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(pair_users_weekly, 'interval', minutes=1)
+    scheduler.start()
+
+# Threads the running bot needs: the default workspace's cache warm-up, the opt-in reconcile
+# and the pairing scheduler. Started by the entry points (python bot.py, the ASGI lifespan),
+# never on import: spawned pairing workers re-import this file as __mp_main__ and must not
+# start a scheduler (and a pairing run) of their own.
+background_started = False
+
+def start_background_work():
+    global background_started
+    if background_started:
+        return
+    background_started = True
+    threading.Thread(target=warm_default_team, name="default-team-warm", daemon=True).start()
+    # Pick up opt-ins and opt-outs written by other processes
+    opt_in_membership.start()
+    if os.environ.get("PAIRING_SCHEDULER", "1") == "1":
+        start_scheduler()
+
+startup_seconds = time.perf_counter() - STARTED_AT
+print(f"Bot loaded in {startup_seconds:.3f}s")
+
+# Servers that import the app without running __main__ or the ASGI lifespan (gunicorn,
+# flask run --no-reload, other WSGI servers) opt in explicitly: PAIRING_SCHEDULER=1 starts
+# the background work when the module is imported as `bot`. `python bot.py` is left to the
+# __main__ block below, and a spawned worker re-running that script as __mp_main__ starts
+# nothing. Every process importing the bot with it set runs the pairing job, so set it for
+# one worker only, and not with gunicorn --preload (the threads would be lost at fork).
+if __name__ == "bot" and os.environ.get("PAIRING_SCHEDULER") == "1":
+    start_background_work()
 
 
 #ngrok testing
 if __name__ == "__main__":
+    # With debug on, the reloader's watcher process runs this too; only the serving child starts the work
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_work()
     app.run(debug=True, port=5002)
@@ -0,0 +1,111 @@
+import bisect
+import contextvars
+import threading
+import time
+
+MAX_OPTIONS = 100   # Slack's limit for external_select options
+
+
+# Cached list of the workspace's public channels with a sorted-name prefix index.
+# Loaded with paginated conversations.list (public channels only, archived excluded)
+# and kept current from channel_created / channel_rename / channel_archive events.
+# Lookups never wait for Slack: an unloaded or stale catalog answers with what it has
+# while a background refresh runs.
+class ChannelCatalog:
+    def __init__(self, client):
+        self.client = client
+        self._names = {}     # channel_id -> name
+        self._index = []     # sorted (lowercase name, channel_id)
+        self._loaded_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        channels = {}
+        cursor = None
+        while True:
+            response = self.client.conversations_list(
+                types="public_channel",
+                exclude_archived=True,
+                limit=1000,
+                cursor=cursor
+            )
+            for channel in response["channels"]:
+                channels[channel["id"]] = channel["name"]
+            cursor = response.get("response_metadata", {}).get("next_cursor")
+            if not cursor:
+                break
+
+        index = sorted((name.lower(), channel_id) for channel_id, name in channels.items())
+        with self._lock:
+            self._names = channels
+            self._index = index
+            self._loaded_at = time.monotonic()
+        return len(channels)
+
+    def warm(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Error loading channel catalog: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def refresh_in_background(self):
+        # One refresh at a time, run in a copy of the caller's context so it calls
+        # Slack as the caller's workspace
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+        threading.Thread(target=contextvars.copy_context().run, args=(self.warm,), daemon=True).start()
+        return True
+
+    def age(self):
+        # Seconds since the last full load, or None if it was never loaded
+        with self._lock:
+            return None if self._loaded_at is None else time.monotonic() - self._loaded_at
+
+    def _remove_locked(self, channel_id):
+        name = self._names.pop(channel_id, None)
+        if name is not None:
+            i = bisect.bisect_left(self._index, (name.lower(), channel_id))
+            if i < len(self._index) and self._index[i] == (name.lower(), channel_id):
+                del self._index[i]
+
+    def upsert(self, channel_id, name):
+        # channel_created and channel_rename
+        with self._lock:
+            self._remove_locked(channel_id)
+            self._names[channel_id] = name
+            bisect.insort(self._index, (name.lower(), channel_id))
+
+    def remove(self, channel_id):
+        # channel_archive and channel_deleted
+        with self._lock:
+            self._remove_locked(channel_id)
+
+    def search(self, prefix, limit=MAX_OPTIONS):
+        # block_suggestion has 3 seconds; a paginated conversations.list can take longer
+        if self.age() is None:
+            self.refresh_in_background()
+        prefix = prefix.lower().lstrip("#")
+        with self._lock:
+            start = bisect.bisect_left(self._index, (prefix, ""))
+            matches = []
+            for name, channel_id in self._index[start:start + limit]:
+                if not name.startswith(prefix):
+                    break
+                matches.append((channel_id, self._names[channel_id]))
+        return matches
+
+    def options(self, prefix, limit=MAX_OPTIONS):
+        # Response body for a block_suggestion request
+        return [
+            {"text": {"type": "plain_text", "text": name}, "value": channel_id}
+            for channel_id, name in self.search(prefix, limit)
+        ]
+
+    def __len__(self):
+        return len(self._names)
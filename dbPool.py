@@ -0,0 +1,154 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+# Bounded, thread-safe pool of DB connections.
+# Connections are health-checked when they've been idle for a while, recycled once
+# they pass max_lifetime, and rolled back when returned so no transaction leaks
+# into the next borrower.
+class ConnectionPool:
+    def __init__(self, connect, size=5, max_lifetime=1800, timeout=10, health_check_after=30):
+        self._connect = connect
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()   # (connection, created_at, last_used_at)
+        self._lock = threading.Lock()
+        self._stats = {
+            "borrowed": 0,
+            "returned": 0,
+            "created": 0,
+            "discarded": 0,
+            "health_check_failures": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+        }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["size"] = self.size
+        stats["idle"] = self._idle.qsize()
+        stats["in_use"] = stats["borrowed"] - stats["returned"]
+        stats["wait_time_avg"] = stats["wait_time_total"] / stats["waits"] if stats["waits"] else 0.0
+        return stats
+
+    def _discard(self, conn):
+        self._count("discarded")
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn, created_at, last_used_at):
+        now = time.monotonic()
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return False
+        if now - last_used_at > self.health_check_after:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                self._count("health_check_failures")
+                return False
+        return True
+
+    def _acquire(self):
+        start = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            acquired = self._slots.acquire(timeout=self.timeout)
+            waited = time.monotonic() - start
+            with self._lock:
+                self._stats["waits"] += 1
+                self._stats["wait_time_total"] += waited
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+                if not acquired:
+                    self._stats["timeouts"] += 1
+            if not acquired:
+                raise PoolTimeoutError(f"No DB connection available after {self.timeout}s (pool size {self.size})")
+
+        while True:
+            try:
+                conn, created_at, last_used_at = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._healthy(conn, created_at, last_used_at):
+                return conn, created_at
+            self._discard(conn)
+
+        try:
+            conn = self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+        self._count("created")
+        return conn, time.monotonic()
+
+    def _release(self, conn, created_at, broken):
+        try:
+            if broken:
+                self._discard(conn)
+                return
+            try:
+                # Never hand an open transaction to the next borrower
+                conn.rollback()
+            except Exception:
+                self._discard(conn)
+                return
+            if self.max_lifetime and time.monotonic() - created_at > self.max_lifetime:
+                self._discard(conn)
+                return
+            self._idle.put((conn, created_at, time.monotonic()))
+        finally:
+            self._count("returned")
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn, created_at = self._acquire()
+        self._count("borrowed")
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            # The connection may be mid-transaction or disconnected; check before reusing it
+            try:
+                broken = not conn.is_connected()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self._release(conn, created_at, broken)
+
+    def close(self):
+        while True:
+            try:
+                conn, _, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+
+def pool_from_env(connect):
+    return ConnectionPool(
+        connect,
+        size=int(os.environ.get("DB_POOL_SIZE", 5)),
+        max_lifetime=float(os.environ.get("DB_POOL_MAX_LIFETIME", 1800)),
+        timeout=float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        health_check_after=float(os.environ.get("DB_POOL_HEALTH_CHECK_AFTER", 30)),
+    )
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# What to do with deliveries Slack marks as retries (X-Slack-Retry-Num):
+#   dedup - process a retry only if its event_id hasn't been seen (default)
+#   ack   - acknowledge every retry without processing it
+#   off   - no deduplication, process every delivery
+RETRY_POLICIES = ("dedup", "ack", "off")
+
+
+# Event IDs seen in this process within the last `window` seconds, capped at max_size
+class MemoryEventStore:
+    def __init__(self, window=3600, max_size=100000):
+        self.window = window
+        self.max_size = max_size
+        self._seen = OrderedDict()   # event_id -> seen_at
+        self._lock = threading.Lock()
+
+    def add(self, event_id):
+        # Returns False if the event was already seen
+        now = time.monotonic()
+        with self._lock:
+            while self._seen:
+                seen_at = next(iter(self._seen.values()))
+                if now - seen_at < self.window and len(self._seen) < self.max_size:
+                    break
+                self._seen.popitem(last=False)
+            if event_id in self._seen:
+                return False
+            self._seen[event_id] = now
+            return True
+
+
+# Event IDs shared by every worker through the processed_events table
+class DbEventStore:
+    def __init__(self, storage, window=3600):
+        self.storage = storage
+        self.window = window
+        self._last_purge = 0.0
+
+    def add(self, event_id):
+        with self.storage.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.execute(self.storage.insert_ignore("processed_events", ("event_id",)), (event_id,))
+            inserted = cursor.rowcount == 1
+            if time.monotonic() - self._last_purge > self.window:
+                self._last_purge = time.monotonic()
+                cursor.execute(self.storage.purge_events, (int(self.window),))
+            db.commit()
+            cursor.close()
+        return inserted
+
+
+class EventDeduplicator:
+    def __init__(self, store=None, policy="dedup", window=3600):
+        if policy not in RETRY_POLICIES:
+            raise ValueError(f"Unknown retry policy {policy!r}, expected one of {RETRY_POLICIES}")
+        self.policy = policy
+        self._local = MemoryEventStore(window)
+        self._store = store
+        self._lock = threading.Lock()
+        self._stats = {"processed": 0, "duplicates": 0, "retries_acked": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def should_skip(self, event_id, retry_num=None):
+        if self.policy == "off" or not event_id:
+            return False
+        if self.policy == "ack" and retry_num:
+            self._count("retries_acked")
+            return True
+        # Check this process first so duplicates in the same worker never touch the shared store
+        first = self._local.add(event_id)
+        if first and self._store is not None:
+            first = self._store.add(event_id)
+        self._count("processed" if first else "duplicates")
+        return not first
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, policy=self.policy)
+
+
+def deduplicator_from_env(storage):
+    window = float(os.environ.get("EVENT_DEDUP_WINDOW", 3600))
+    store = DbEventStore(storage, window) if os.environ.get("EVENT_DEDUP_BACKEND", "memory") == "db" else None
+    return EventDeduplicator(store, policy=os.environ.get("SLACK_RETRY_POLICY", "dedup"), window=window)
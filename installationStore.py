@@ -0,0 +1,184 @@
+import contextvars
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import slack_sdk
+
+from slackClient import RateLimitedClient, RateLimiter
+from ttlCache import TTLCache
+
+_NOT_CACHED = object()
+
+# Workspace the current request, event or job is for
+current_team = contextvars.ContextVar("slack_team_id", default=None)
+
+
+class UnknownTeamError(LookupError):
+    pass
+
+
+@contextmanager
+def team_scope(team_id):
+    # Routes every TeamClient call (and current_team lookup) inside the block to team_id
+    token = current_team.set(team_id)
+    try:
+        yield team_id
+    finally:
+        current_team.reset(token)
+
+
+def team_from_payload(payload):
+    # Interactivity payloads carry team.id; Events API envelopes carry team_id
+    team = payload.get("team") or {}
+    return (
+        team.get("id")
+        or payload.get("team_id")
+        or (payload.get("user") or {}).get("team_id")
+        or (payload.get("view") or {}).get("team_id")
+    )
+
+
+# team_id -> bot installation, read from the installations table through a small cache.
+# The SLACK_TOKEN workspace, if set, is always installed. Its identity is resolved once,
+# on first use, with auth.test, unless default_team_id and default_bot_user_id are given.
+class InstallationStore:
+    def __init__(self, storage, default_token=None, default_team_id=None, default_bot_user_id=None, cache_size=None, cache_ttl=None):
+        self.storage = storage
+        self.default_token = default_token
+        self._default = None
+        if default_token is not None and default_team_id and default_bot_user_id:
+            self._default = {"team_id": default_team_id, "bot_token": default_token, "bot_user_id": default_bot_user_id}
+        self._default_lock = threading.Lock()
+        self._cache = TTLCache(
+            max_size=cache_size or int(os.environ.get("INSTALLATION_CACHE_SIZE", 1000)),
+            ttl=cache_ttl or float(os.environ.get("INSTALLATION_CACHE_TTL", 300)),
+        )
+
+    def default_installation(self):
+        if self.default_token is None:
+            return None
+        with self._default_lock:
+            if self._default is None:
+                identity = RateLimitedClient(slack_sdk.WebClient(token=self.default_token)).auth_test()
+                self._default = {
+                    "team_id": identity["team_id"],
+                    "bot_token": self.default_token,
+                    "bot_user_id": identity["user_id"],
+                }
+            return self._default
+
+    def default_team_id(self):
+        installation = self.default_installation()
+        return installation["team_id"] if installation else None
+
+    def find(self, team_id):
+        cached = self._cache.get(team_id, _NOT_CACHED)
+        if cached is not _NOT_CACHED:
+            return cached
+
+        with self.storage.pool.connection() as db:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute("SELECT team_id, bot_token, bot_user_id FROM installations WHERE team_id = %s", (team_id,))
+            installation = cursor.fetchone()
+            cursor.close()
+
+        if installation is None:
+            default = self.default_installation()
+            if default is not None and default["team_id"] == team_id:
+                installation = default
+        self._cache.set(team_id, installation)
+        return installation
+
+    def save(self, team_id, bot_token, bot_user_id):
+        with self.storage.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.execute(
+                self.storage.upsert("installations", ("team_id",), ("bot_token", "bot_user_id")),
+                (team_id, bot_token, bot_user_id)
+            )
+            db.commit()
+            cursor.close()
+        self._cache.invalidate(team_id)
+
+    def delete(self, team_id):
+        # app_uninstalled / tokens_revoked
+        with self.storage.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.execute("DELETE FROM installations WHERE team_id = %s", (team_id,))
+            db.commit()
+            cursor.close()
+        self._cache.invalidate(team_id)
+
+    def stats(self):
+        return self._cache.stats()
+
+
+# One rate-limited WebClient per workspace, created on first use and kept in a bounded LRU.
+# Each workspace gets its own limiter because Slack's rate limits are per workspace.
+class ClientPool:
+    def __init__(self, store, max_size=None):
+        self.store = store
+        self.max_size = max_size or int(os.environ.get("SLACK_CLIENT_POOL_SIZE", 256))
+        self._clients = OrderedDict()   # team_id -> RateLimitedClient
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "created": 0, "evictions": 0}
+
+    def get(self, team_id=None):
+        team_id = team_id or current_team.get() or self.store.default_team_id()
+        with self._lock:
+            client = self._clients.get(team_id)
+            if client is not None:
+                self._clients.move_to_end(team_id)
+                self._stats["hits"] += 1
+                return client
+
+        installation = self.store.find(team_id) if team_id else None
+        if installation is None:
+            raise UnknownTeamError(f"No installation for team {team_id}")
+        client = RateLimitedClient(slack_sdk.WebClient(token=installation["bot_token"]), limiter=RateLimiter())
+
+        with self._lock:
+            # Another thread may have created one while we were reading the store
+            existing = self._clients.get(team_id)
+            if existing is not None:
+                return existing
+            self._clients[team_id] = client
+            self._stats["created"] += 1
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self._stats["evictions"] += 1
+        return client
+
+    def evict(self, team_id):
+        with self._lock:
+            self._clients.pop(team_id, None)
+
+    def api_stats(self):
+        # Per-method Slack API counters summed over every pooled workspace
+        with self._lock:
+            clients = list(self._clients.values())
+        totals = {}
+        for client in clients:
+            for method, stats in client.stats().items():
+                total = totals.setdefault(method, {"calls": 0, "retries": 0, "throttled_time": 0.0, "gave_up": 0})
+                for key in total:
+                    total[key] += stats[key]
+        return totals
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=len(self._clients), max_size=self.max_size)
+
+
+# Stands in for a WebClient: each call goes to the client of the team in current_team
+class TeamClient:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __getattr__(self, name):
+        return getattr(self.pool.get(), name)
+
+    def stats(self):
+        return self.pool.api_stats()
@@ -0,0 +1,239 @@
+import random
+import time
+from collections import deque, namedtuple
+
+# groups: list of tuples of Slack user IDs (pairs, plus at most a few trios)
+# leftovers: users that could not be matched with anyone they haven't met yet
+MatchResult = namedtuple("MatchResult", ["groups", "leftovers"])
+
+# Caps the swap/trio search so a team where everyone has already met still finishes quickly
+REPAIR_CHECKS_PER_USER = 64
+
+# Caps the augmenting-path search per team (about a second); a full search is O(users^2)
+# checks, so this is exact for teams up to ~1000 leftover-heavy users and best-effort beyond
+AUGMENT_MAX_CHECKS = 2_000_000
+
+
+def augment(ids, pairs, leftovers, allowed, budget):
+    # Edmonds' blossom search for an augmenting path from each leftover, over the
+    # "never paired" graph. Once no leftover has one the matching is maximum, whatever
+    # the greedy and swap passes left behind. Every candidate check costs one unit of
+    # budget; when it runs out the remaining leftovers stay as they are.
+    # Returns the new pairs and leftovers.
+    n = len(ids)
+    local = {index: i for i, index in enumerate(ids)}
+    match = [-1] * n
+    for a, b in pairs:
+        match[local[a]] = local[b]
+        match[local[b]] = local[a]
+
+    def find_path(root):
+        nonlocal budget
+        used = [False] * n
+        parent = [-1] * n
+        base = list(range(n))
+        used[root] = True
+        queue = deque([root])
+
+        def lca(a, b):
+            seen = [False] * n
+            while True:
+                a = base[a]
+                seen[a] = True
+                if match[a] == -1:
+                    break
+                a = parent[match[a]]
+            while True:
+                b = base[b]
+                if seen[b]:
+                    return b
+                b = parent[match[b]]
+
+        def mark_path(v, b, child, in_blossom):
+            while base[v] != b:
+                in_blossom[base[v]] = in_blossom[base[match[v]]] = True
+                parent[v] = child
+                child = match[v]
+                v = parent[match[v]]
+
+        while queue:
+            v = queue.popleft()
+            for to in range(n):
+                budget -= 1
+                if budget <= 0:
+                    return -1, parent
+                if to == v or base[v] == base[to] or match[v] == to or not allowed(ids[v], ids[to]):
+                    continue
+                if to == root or (match[to] != -1 and parent[match[to]] != -1):
+                    # Odd cycle: contract the blossom onto its base
+                    current_base = lca(v, to)
+                    in_blossom = [False] * n
+                    mark_path(v, current_base, to, in_blossom)
+                    mark_path(to, current_base, v, in_blossom)
+                    for i in range(n):
+                        if in_blossom[base[i]]:
+                            base[i] = current_base
+                            if not used[i]:
+                                used[i] = True
+                                queue.append(i)
+                elif parent[to] == -1:
+                    parent[to] = v
+                    if match[to] == -1:
+                        return to, parent
+                    used[match[to]] = True
+                    queue.append(match[to])
+        return -1, parent
+
+    for user in leftovers:
+        root = local[user]
+        if match[root] != -1:
+            continue
+        v, parent = find_path(root)
+        while v != -1:
+            # Flip the path: every unmatched edge on it becomes matched
+            previous = match[parent[v]]
+            match[v] = parent[v]
+            match[parent[v]] = v
+            v = previous
+        if budget <= 0:
+            break
+
+    new_pairs = [(ids[i], ids[match[i]]) for i in range(n) if match[i] > i]
+    new_leftovers = [ids[i] for i in range(n) if match[i] == -1]
+    return new_pairs, new_leftovers
+
+
+# Match users over the "never paired" graph.
+# 1. Greedy pass: each user takes the first unmatched candidate they haven't met.
+#    Every rejected candidate is one of the user's past partners, so a user scans
+#    at most (past partners + 1) candidates and the pass is O(users + history).
+# 2. Repair pass: leftovers are matched with each other, or swapped into an
+#    existing pair (a, b) + (x, y) -> (a, x) + (b, y) when that avoids a repeat.
+# 3. Augmenting paths: any leftovers still unmatched get a bounded blossom search,
+#    which makes the matching maximum when the budget allows (it nearly always does:
+#    leftovers are rare on large teams and the graph is small on the others).
+# 4. Trio fallback: an odd user out joins a pair where they've met neither person.
+def match_users(users, history, rng=None):
+    rng = rng or random.Random()
+    users = list(dict.fromkeys(users))
+    if len(users) < 2:
+        return MatchResult([], users)
+
+    ids = [history.intern(user) for user in users]
+    neighbours = {index: history.neighbours(history.user_id(index)) for index in ids}
+
+    def allowed(a, b):
+        return b not in neighbours[a]
+
+    # Unmatched pool with O(1) removal (swap with last element)
+    pool = ids[:]
+    rng.shuffle(pool)
+    position = {index: i for i, index in enumerate(pool)}
+
+    def remove(index):
+        i = position.pop(index)
+        last = pool.pop()
+        if last != index:
+            pool[i] = last
+            position[last] = i
+
+    pairs = []
+    leftovers = []
+    order = pool[:]
+    for user in order:
+        if user not in position:
+            continue
+        remove(user)
+        if not pool:
+            leftovers.append(user)
+            break
+
+        start = rng.randrange(len(pool))
+        limit = min(len(pool), len(neighbours[user]) + 1)
+        partner = None
+        for step in range(limit):
+            candidate = pool[(start + step) % len(pool)]
+            if allowed(user, candidate):
+                partner = candidate
+                break
+        if partner is None:
+            leftovers.append(user)
+        else:
+            remove(partner)
+            pairs.append((user, partner))
+
+    budget = REPAIR_CHECKS_PER_USER * len(users)
+
+    # Repair: pair leftovers directly, or swap them into existing pairs
+    stuck = []
+    while len(leftovers) > 1 and budget > 0:
+        a = leftovers.pop()
+        match = None
+        for i, b in enumerate(leftovers):
+            budget -= 1
+            if allowed(a, b):
+                match = i
+                break
+        if match is not None:
+            pairs.append((a, leftovers.pop(match)))
+            continue
+
+        swapped = False
+        for b_index, b in enumerate(leftovers):
+            for p, (x, y) in enumerate(pairs):
+                budget -= 1
+                if budget <= 0:
+                    break
+                if allowed(a, x) and allowed(b, y):
+                    pairs[p] = (a, x)
+                    pairs.append((b, y))
+                    swapped = True
+                elif allowed(a, y) and allowed(b, x):
+                    pairs[p] = (a, y)
+                    pairs.append((b, x))
+                    swapped = True
+                if swapped:
+                    leftovers.pop(b_index)
+                    break
+            if swapped or budget <= 0:
+                break
+        if not swapped:
+            stuck.append(a)
+    leftovers.extend(stuck)
+
+    # An augmenting path joins two unmatched users, so one odd user out needs no search
+    if len(leftovers) > 1:
+        pairs, leftovers = augment(ids, pairs, leftovers, allowed, AUGMENT_MAX_CHECKS)
+
+    # Trio fallback: odd users out join a pair where they've met neither person
+    budget = REPAIR_CHECKS_PER_USER * len(users)
+    groups = [list(pair) for pair in pairs]
+    trio_slots = list(range(len(groups)))
+    rng.shuffle(trio_slots)
+    remaining = []
+    for user in leftovers:
+        placed = False
+        for slot_index, g in enumerate(trio_slots):
+            budget -= 1
+            if budget <= 0:
+                break
+            x, y = groups[g]
+            if allowed(user, x) and allowed(user, y):
+                groups[g].append(user)
+                trio_slots.pop(slot_index)
+                placed = True
+                break
+        if not placed:
+            remaining.append(user)
+
+    return MatchResult(
+        [tuple(history.user_id(index) for index in group) for group in groups],
+        [history.user_id(index) for index in remaining],
+    )
+
+
+# Entry point for the pairing job's process pool: everything in and out is picklable
+def match_team(team_id, users, history):
+    started_at = time.perf_counter()
+    result = match_users(users, history)
+    return team_id, result, time.perf_counter() - started_at
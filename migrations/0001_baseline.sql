@@ -0,0 +1,29 @@
+-- Tables as originally checked in under Databases/
+
+CREATE TABLE IF NOT EXISTS introductions (
+    intro_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id VARCHAR(50),
+    intro_text TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS pairings (
+    pairing_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id1 VARCHAR(50),
+    user_id2 VARCHAR(50),
+    pairing_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS user_profiles (
+    user_id VARCHAR(50) PRIMARY KEY,
+    full_name VARCHAR(100),
+    pronouns VARCHAR(50),
+    location VARCHAR(100),
+    hometown VARCHAR(100),
+    education VARCHAR(200),
+    languages VARCHAR(200),
+    hobbies VARCHAR(200),
+    birthday VARCHAR(50),
+    ask_me_about TEXT,
+    bio TEXT
+);
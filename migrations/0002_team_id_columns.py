@@ -0,0 +1,18 @@
+# Every query filters on team_id, but the baseline tables never had the column.
+# Databases that were patched by hand already have it (possibly nullable), so add it
+# only where it's missing and otherwise normalise it. Legacy rows without a team get ''.
+TABLES = ("introductions", "pairings", "user_profiles")
+
+
+def upgrade(cursor):
+    for table in TABLES:
+        cursor.execute(
+            "SELECT COUNT(*) AS found FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = 'team_id'",
+            (table,)
+        )
+        if cursor.fetchone()["found"]:
+            cursor.execute(f"UPDATE {table} SET team_id = '' WHERE team_id IS NULL")
+            cursor.execute(f"ALTER TABLE {table} MODIFY COLUMN team_id VARCHAR(50) NOT NULL DEFAULT ''")
+        else:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN team_id VARCHAR(50) NOT NULL DEFAULT ''")
@@ -0,0 +1,13 @@
+-- One opt-in per (team_id, user_id): makes opt_in_user's ON DUPLICATE KEY UPDATE fire,
+-- and serves is_user_opted_in, the per-team member list and the pairing cleanup DELETE.
+-- Duplicate opt-ins collected while there was no key are dropped first, keeping the oldest.
+
+DELETE newer FROM introductions newer
+JOIN introductions older
+    ON newer.team_id = older.team_id
+    AND newer.user_id = older.user_id
+    AND newer.intro_id > older.intro_id;
+
+ALTER TABLE introductions
+    MODIFY COLUMN user_id VARCHAR(50) NOT NULL,
+    ADD UNIQUE KEY introductions_team_user (team_id, user_id);
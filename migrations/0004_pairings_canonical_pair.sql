@@ -0,0 +1,19 @@
+-- A pair is the same whichever way round it was stored, so key it on the ordered
+-- (least_user, greatest_user) columns. The unique key also serves the per-team
+-- history load (team_id prefix) and a single-probe "have these two met" lookup.
+
+ALTER TABLE pairings
+    MODIFY COLUMN user_id1 VARCHAR(50) NOT NULL,
+    MODIFY COLUMN user_id2 VARCHAR(50) NOT NULL,
+    ADD COLUMN least_user VARCHAR(50) AS (LEAST(user_id1, user_id2)) STORED,
+    ADD COLUMN greatest_user VARCHAR(50) AS (GREATEST(user_id1, user_id2)) STORED;
+
+DELETE newer FROM pairings newer
+JOIN pairings older
+    ON newer.team_id = older.team_id
+    AND newer.least_user = older.least_user
+    AND newer.greatest_user = older.greatest_user
+    AND newer.pairing_id > older.pairing_id;
+
+ALTER TABLE pairings
+    ADD UNIQUE KEY pairings_team_pair (team_id, least_user, greatest_user);
@@ -0,0 +1,6 @@
+-- Profiles are per workspace: key them on (team_id, user_id) so save_profile_to_db's
+-- ON DUPLICATE KEY UPDATE and load_profile_from_db's lookup both use the primary key.
+
+ALTER TABLE user_profiles
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (team_id, user_id);
@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS processed_events (
+    event_id VARCHAR(64) PRIMARY KEY,
+    seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX processed_events_seen_at (seen_at)
+);
@@ -0,0 +1,6 @@
+CREATE TABLE IF NOT EXISTS installations (
+    team_id VARCHAR(50) PRIMARY KEY,
+    bot_token VARCHAR(255) NOT NULL,
+    bot_user_id VARCHAR(50),
+    installed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -0,0 +1,17 @@
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    idempotency_key CHAR(64) NOT NULL,
+    team_id VARCHAR(50) NOT NULL,
+    users VARCHAR(200) NOT NULL,
+    payload TEXT NOT NULL,
+    status ENUM('pending', 'sent', 'failed') NOT NULL DEFAULT 'pending',
+    available_at DOUBLE NOT NULL DEFAULT 0,
+    attempts INT NOT NULL DEFAULT 0,
+    lease_owner CHAR(32),
+    channel VARCHAR(50),
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at DOUBLE,
+    UNIQUE KEY notification_outbox_key (idempotency_key),
+    INDEX notification_outbox_due (status, available_at, id)
+);
@@ -0,0 +1,76 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from installationStore import team_scope
+
+METADATA_EVENT_TYPE = "pairing_notification"
+DUPLICATE_CHECK_MESSAGES = 20   # recent DM messages searched for a retried key
+
+
+# Sends pairing notifications concurrently with bounded parallelism.
+# Each notification is a dict with "team_id", "users", "text" and "blocks", and is sent
+# under that team's scope, so a TeamClient posts with the right workspace's token.
+# Outbox notifications also carry "idempotency_key" and "attempts": the key goes into the
+# message metadata, and a retry first checks the DM for a message already carrying it.
+class NotificationDispatcher:
+    def __init__(self, client, max_workers=None):
+        self.client = client
+        self.max_workers = max_workers or int(os.environ.get("PAIRING_NOTIFY_WORKERS", 8))
+
+    def _send(self, notification):
+        started_at = time.monotonic()
+        result = {"team_id": notification["team_id"], "users": notification["users"], "ok": False, "channel": None, "error": None}
+        try:
+            with team_scope(notification["team_id"]):
+                self._post(notification, result)
+            result["ok"] = True
+        except Exception as e:
+            result["error"] = str(e)
+            print(f"Error notifying {notification['users']} in team {notification['team_id']}: {e}")
+        result["latency"] = time.monotonic() - started_at
+        return result
+
+    def _post(self, notification, result):
+        group_dm = self.client.conversations_open(users=list(notification["users"]))
+        result["channel"] = group_dm["channel"]["id"]
+
+        key = notification.get("idempotency_key")
+        if key is None:
+            self.client.chat_postMessage(
+                channel=result["channel"],
+                text=notification["text"],
+                blocks=notification["blocks"]
+            )
+            return
+
+        if notification.get("attempts", 1) > 1 and self._already_posted(result["channel"], key):
+            result["duplicate"] = True
+            return
+        self.client.chat_postMessage(
+            channel=result["channel"],
+            text=notification["text"],
+            blocks=notification["blocks"],
+            metadata={"event_type": METADATA_EVENT_TYPE, "event_payload": {"idempotency_key": key}}
+        )
+
+    def _already_posted(self, channel, key):
+        # An earlier attempt may have posted and then died before recording it
+        history = self.client.conversations_history(channel=channel, limit=DUPLICATE_CHECK_MESSAGES, include_all_metadata=True)
+        for message in history.get("messages", []):
+            metadata = message.get("metadata") or {}
+            if metadata.get("event_type") == METADATA_EVENT_TYPE and metadata.get("event_payload", {}).get("idempotency_key") == key:
+                return True
+        return False
+
+    def send_all(self, notifications):
+        # Returns one result per notification, in the same order
+        if not notifications:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(notifications))) as executor:
+            return list(executor.map(self._send, notifications))
+
+
+def summarize(results):
+    sent = sum(1 for result in results if result["ok"])
+    return {"sent": sent, "failed": len(results) - sent}
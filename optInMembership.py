@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+# Per-team sets of opted-in users, so "is this user opted in?" and "how many are in?"
+# are set lookups instead of a COUNT(*) per Home tab render or profile save.
+# A team is loaded from introductions on first use; after that opt_in_user, opt_out_user
+# and the pairing job's cleanup update it in place once their writes commit. Writes
+# made by other processes are picked up by reconcile(), which reloads every cached
+# team every `reconcile_interval` seconds once start() has been called.
+class OptInMembership:
+    def __init__(self, storage, max_teams=None, reconcile_interval=None):
+        self.storage = storage
+        self.max_teams = max_teams or int(os.environ.get("OPT_IN_CACHE_TEAMS", 1000))
+        self.reconcile_interval = reconcile_interval or float(os.environ.get("OPT_IN_RECONCILE_INTERVAL", 300))
+        self._teams = OrderedDict()   # team_id -> set of user_ids
+        self._generations = {}        # team_id -> generation of the newest load started
+        self._loading = {}            # team_id -> {generation: [(op, user_ids)] seen while that load read the DB}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {"hits": 0, "loads": 0, "superseded_loads": 0, "reconciles": 0,
+                       "drift_added": 0, "drift_removed": 0, "evictions": 0}
+
+    def _apply(self, members, op, user_ids):
+        if op == "add":
+            members.update(user_ids)
+        else:
+            members.difference_update(user_ids)
+
+    def _update(self, team_id, op, user_ids):
+        with self._lock:
+            members = self._teams.get(team_id)
+            if members is not None:
+                self._apply(members, op, user_ids)
+            for buffer in self._loading.get(team_id, {}).values():
+                buffer.append((op, user_ids))
+
+    def _read(self, team_id, cursor=None):
+        if cursor is not None:
+            return set(self.storage.team_members(cursor, team_id))
+        with self.storage.read_connection((team_id,)) as db:
+            cursor = db.cursor(dictionary=True)
+            members = set(self.storage.team_members(cursor, team_id))
+            cursor.close()
+        return members
+
+    def _finish_load(self, team_id, generation):
+        # Drops this load's buffer; returns it and whether a newer load has started since
+        buffers = self._loading[team_id]
+        buffer = buffers.pop(generation)
+        superseded = generation != self._generations[team_id]
+        if not buffers:
+            del self._loading[team_id]
+            del self._generations[team_id]
+        return buffer, superseded
+
+    def load(self, team_id, cursor=None):
+        # Reads the team from the DB and replays the updates that raced with the read.
+        # Each load has its own buffer; a load that a newer one has overtaken doesn't
+        # publish, since the newer read started later. Returns a copy of what was read.
+        with self._lock:
+            generation = self._generations.get(team_id, 0) + 1
+            self._generations[team_id] = generation
+            self._loading.setdefault(team_id, {})[generation] = []
+        try:
+            members = self._read(team_id, cursor)
+        except Exception:
+            with self._lock:
+                self._finish_load(team_id, generation)
+            raise
+        with self._lock:
+            buffer, superseded = self._finish_load(team_id, generation)
+            for op, user_ids in buffer:
+                self._apply(members, op, user_ids)
+            if superseded:
+                self._stats["superseded_loads"] += 1
+                return frozenset(members)
+            previous = self._teams.get(team_id)
+            if previous is not None:
+                self._stats["drift_added"] += len(members - previous)
+                self._stats["drift_removed"] += len(previous - members)
+            self._teams[team_id] = members
+            self._teams.move_to_end(team_id)
+            while len(self._teams) > self.max_teams:
+                self._teams.popitem(last=False)
+                self._stats["evictions"] += 1
+            self._stats["loads"] += 1
+            return frozenset(members)
+
+    def _cached(self, team_id):
+        # The team's live set, or None; call with the lock held
+        members = self._teams.get(team_id)
+        if members is not None:
+            self._teams.move_to_end(team_id)
+            self._stats["hits"] += 1
+        return members
+
+    def contains(self, user_id, team_id):
+        with self._lock:
+            members = self._cached(team_id)
+            if members is not None:
+                return user_id in members
+        return user_id in self.load(team_id)
+
+    def team_size(self, team_id):
+        with self._lock:
+            members = self._cached(team_id)
+            if members is not None:
+                return len(members)
+        return len(self.load(team_id))
+
+    def members(self, team_id, cursor=None):
+        # Snapshot of the team's opted-in users
+        with self._lock:
+            members = self._cached(team_id)
+            if members is not None:
+                return list(members)
+        return list(self.load(team_id, cursor))
+
+    def add(self, user_id, team_id):
+        self._update(team_id, "add", (user_id,))
+
+    def remove(self, user_id, team_id):
+        self._update(team_id, "remove", (user_id,))
+
+    def remove_many(self, team_id, user_ids):
+        self._update(team_id, "remove", tuple(user_ids))
+
+    def reconcile(self):
+        # Reloads every cached team; load() counts how far the cache had drifted
+        with self._lock:
+            teams = list(self._teams)
+        for team_id in teams:
+            self.load(team_id)
+            with self._lock:
+                self._stats["reconciles"] += 1
+        return len(teams)
+
+    def _reconcile_forever(self):
+        while True:
+            time.sleep(self.reconcile_interval)
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"Error reconciling opt-in membership: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._reconcile_forever, name="opt-in-reconcile", daemon=True)
+            self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["teams"] = len(self._teams)
+            stats["members"] = sum(len(members) for members in self._teams.values())
+        return stats
@@ -0,0 +1,179 @@
+# Delivers pairing notifications from the notification_outbox table.
+#
+# pair_users_weekly writes each group's notification in the same transaction as the
+# pairing itself, so a crash can never leave users messaged-but-unrecorded or
+# recorded-but-unmessaged. This drainer claims pending rows under a lease, sends them,
+# and marks them sent. Rows whose drainer died are picked up again once the lease
+# expires; every message carries its row's idempotency key in the message metadata,
+# so a retried row that had already been posted is recognised and not sent twice.
+# available_at and sent_at are Unix timestamps, so none of the queries need date functions.
+# A batch is sized to finish well within its lease (each row costs one tier-3
+# conversations.open), and results are only recorded while the lease is still ours: a
+# drainer that overran its lease leaves the rows to whoever claimed them next.
+#
+#   python outboxDrainer.py            # run until interrupted
+#   python outboxDrainer.py --once     # drain what's pending and exit
+import argparse
+import json
+import os
+import time
+import uuid
+
+from notifier import NotificationDispatcher, summarize
+from slackClient import METHOD_TIERS, TIER_LIMITS
+
+OUTBOX_LEASE_SECONDS = float(os.environ.get("OUTBOX_LEASE_SECONDS", 120))
+# Fraction of the lease a batch may spend sending, at conversations.open's rate limit
+OUTBOX_LEASE_BUDGET = 0.5
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 5))
+OUTBOX_RETRY_BACKOFF = float(os.environ.get("OUTBOX_RETRY_BACKOFF", 30))
+OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", 5))
+
+
+def batch_size_for_lease(lease_seconds):
+    # Rows one drainer can open a DM for in half its lease (50 at the 120s default)
+    per_second = TIER_LIMITS[METHOD_TIERS["conversations.open"]] / 60.0
+    return max(1, int(lease_seconds * OUTBOX_LEASE_BUDGET * per_second))
+
+
+def outbox_row(team_id, notification, idempotency_key, available_at):
+    # Row for notification_outbox, in insert_outbox's column order
+    payload = json.dumps({"text": notification["text"], "blocks": notification["blocks"]})
+    return (idempotency_key, team_id, ",".join(notification["users"]), payload, available_at)
+
+
+class OutboxDrainer:
+    def __init__(self, pool, client, batch_size=None, lease_seconds=None, max_attempts=None, max_workers=None):
+        self.pool = pool
+        self.dispatcher = NotificationDispatcher(client, max_workers=max_workers)
+        self.lease_seconds = lease_seconds or OUTBOX_LEASE_SECONDS
+        self.batch_size = batch_size or int(os.environ.get("OUTBOX_BATCH_SIZE", 0)) or batch_size_for_lease(self.lease_seconds)
+        self.max_attempts = max_attempts or OUTBOX_MAX_ATTEMPTS
+
+    def claim(self):
+        # Leases up to batch_size due rows to this call. The UPDATE re-checks that each row
+        # is still due, so two drainers racing for the same rows can't both win one.
+        now = time.time()
+        lease = uuid.uuid4().hex
+        with self.pool.connection() as db:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT id FROM notification_outbox WHERE status = 'pending' AND available_at <= %s ORDER BY id LIMIT %s",
+                (now, self.batch_size)
+            )
+            ids = [row["id"] for row in cursor.fetchall()]
+            if not ids:
+                cursor.close()
+                return []
+
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(
+                f"UPDATE notification_outbox SET lease_owner = %s, available_at = %s, attempts = attempts + 1 "
+                f"WHERE status = 'pending' AND available_at <= %s AND id IN ({placeholders})",
+                (lease, now + self.lease_seconds, now, *ids)
+            )
+            cursor.execute(
+                f"SELECT id, idempotency_key, team_id, users, payload, attempts FROM notification_outbox "
+                f"WHERE lease_owner = %s AND id IN ({placeholders}) ORDER BY id",
+                (lease, *ids)
+            )
+            rows = cursor.fetchall()
+            db.commit()
+            cursor.close()
+
+        notifications = []
+        for row in rows:
+            payload = json.loads(row["payload"])
+            notifications.append({
+                "outbox_id": row["id"],
+                "lease": lease,
+                "idempotency_key": row["idempotency_key"],
+                "attempts": row["attempts"],
+                "team_id": row["team_id"],
+                "users": tuple(row["users"].split(",")),
+                "text": payload["text"],
+                "blocks": payload["blocks"],
+            })
+        return notifications
+
+    def record(self, notifications, results):
+        # Each UPDATE only applies while the row is still leased to this batch; a row whose
+        # lease ran out and was claimed again is counted as lost and left alone
+        now = time.time()
+        counts = {"sent": 0, "retrying": 0, "failed": 0, "lost": 0}
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            for notification, result in zip(notifications, results):
+                if result["ok"]:
+                    outcome = "sent"
+                    cursor.execute(
+                        "UPDATE notification_outbox SET status = 'sent', sent_at = %s, channel = %s, last_error = NULL "
+                        "WHERE id = %s AND lease_owner = %s",
+                        (now, result["channel"], notification["outbox_id"], notification["lease"])
+                    )
+                elif notification["attempts"] >= self.max_attempts:
+                    outcome = "failed"
+                    cursor.execute(
+                        "UPDATE notification_outbox SET status = 'failed', last_error = %s WHERE id = %s AND lease_owner = %s",
+                        (result["error"], notification["outbox_id"], notification["lease"])
+                    )
+                else:
+                    # Back off a little more on every attempt
+                    outcome = "retrying"
+                    cursor.execute(
+                        "UPDATE notification_outbox SET available_at = %s, last_error = %s WHERE id = %s AND lease_owner = %s",
+                        (now + OUTBOX_RETRY_BACKOFF * notification["attempts"], result["error"],
+                         notification["outbox_id"], notification["lease"])
+                    )
+                counts[outcome if cursor.rowcount else "lost"] += 1
+            db.commit()
+            cursor.close()
+        return counts
+
+    def drain_once(self):
+        # Sends one claimed batch; returns the dispatcher's results for it
+        notifications = self.claim()
+        if not notifications:
+            return []
+        results = self.dispatcher.send_all(notifications)
+        counts = self.record(notifications, results)
+        print(f"Outbox batch: {counts['sent']} sent, {counts['retrying']} retrying, {counts['failed']} failed, "
+              f"{counts['lost']} lost to an expired lease.")
+        return results
+
+    def drain(self):
+        # Keeps claiming until nothing is due
+        results = []
+        while True:
+            batch = self.drain_once()
+            if not batch:
+                return results
+            results.extend(batch)
+
+    def run_forever(self, poll_interval=None):
+        poll_interval = poll_interval or OUTBOX_POLL_INTERVAL
+        while True:
+            try:
+                if not self.drain_once():
+                    time.sleep(poll_interval)
+            except Exception as e:
+                print(f"Error draining notification outbox: {e}")
+                time.sleep(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver pending pairing notifications")
+    parser.add_argument("--once", action="store_true", help="drain what's due and exit")
+    args = parser.parse_args()
+
+    from sqlConnector import db_pool, client
+    drainer = OutboxDrainer(db_pool, client)
+    if args.once:
+        summary = summarize(drainer.drain())
+        print(f"Outbox drained: {summary['sent']} sent, {summary['failed']} failed.")
+    else:
+        drainer.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# In-memory index of who has already been paired with whom in a team.
+# Slack user IDs are interned to small ints so the adjacency sets stay compact,
+# and the whole team's history is loaded with a single query per pairing run.
+class PairHistory:
+    def __init__(self, team_id=None):
+        self.team_id = team_id
+        self._ids = {}          # Slack user ID -> compact int
+        self._user_ids = []     # compact int -> Slack user ID
+        self._neighbours = []   # compact int -> set of compact ints already paired with
+
+    @classmethod
+    def load(cls, cursor, team_id):
+        # Bulk read of the whole team's pairing history
+        history = cls(team_id)
+        cursor.execute("SELECT user_id1, user_id2 FROM pairings WHERE team_id = %s", (team_id,))
+        for row in cursor.fetchall():
+            history.add_pair(row["user_id1"], row["user_id2"])
+        return history
+
+    def __len__(self):
+        return len(self._user_ids)
+
+    def intern(self, user_id):
+        index = self._ids.get(user_id)
+        if index is None:
+            index = len(self._user_ids)
+            self._ids[user_id] = index
+            self._user_ids.append(user_id)
+            self._neighbours.append(set())
+        return index
+
+    def user_id(self, index):
+        return self._user_ids[index]
+
+    def add_pair(self, user1, user2):
+        if user1 == user2:
+            return
+        i, j = self.intern(user1), self.intern(user2)
+        self._neighbours[i].add(j)
+        self._neighbours[j].add(i)
+
+    def add_group(self, users):
+        # Record every pair within a pairing (two users) or trio (three users)
+        for a in range(len(users)):
+            for b in range(a + 1, len(users)):
+                self.add_pair(users[a], users[b])
+
+    def has_paired(self, user1, user2):
+        i = self._ids.get(user1)
+        j = self._ids.get(user2)
+        if i is None or j is None:
+            return False
+        return j in self._neighbours[i]
+
+    def neighbours(self, user_id):
+        # Compact IDs of everyone this user has already been paired with
+        index = self._ids.get(user_id)
+        if index is None:
+            return set()
+        return self._neighbours[index]
+
+    def all_paired(self, users):
+        # True when every combination of the given users has already been paired
+        members = {self.intern(user) for user in users}
+        needed = len(members) - 1
+        for index in members:
+            neighbours = self._neighbours[index]
+            if len(neighbours) < needed or len(neighbours & members) < needed:
+                return False
+        return True
@@ -0,0 +1,125 @@
+import itertools
+import os
+import threading
+import time
+
+from ttlCache import TTLCache
+
+
+# Picks a read replica for read-only queries.
+# A replica is used only while its last measured lag is at most max_lag seconds; lag is
+# re-measured at most every check_interval seconds, by whichever reader finds it stale.
+# Keys written through wrote() (a user's profile, a team's opt-ins) are read from the
+# primary for sticky_seconds afterwards, so a user always sees their own save.
+# pool_for() returns None whenever the read should go to the primary; replica_for() makes
+# the same choice but returns the replica's name, for callers with their own pools.
+class ReplicaRouter:
+    def __init__(self, pools, max_lag=5, check_interval=5, sticky_seconds=None, sticky_keys=10000):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        # Long enough to outlast the lag of any replica we would still read from
+        self.sticky_seconds = sticky_seconds if sticky_seconds is not None else max_lag + check_interval
+        self._replicas = [
+            {"name": name, "pool": pool, "lag": None, "checked_at": float("-inf"), "reads": 0, "check_failures": 0}
+            for name, pool in pools
+        ]
+        self._recent_writes = TTLCache(max_size=sticky_keys, ttl=self.sticky_seconds)
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._checking = threading.Lock()
+        self._stats = {"replica_reads": 0, "primary_reads": 0, "sticky_reads": 0, "no_healthy_replica": 0}
+
+    def _measure(self, replica):
+        with replica["pool"].connection() as db:
+            cursor = db.cursor(dictionary=True)
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except Exception:
+                # MySQL before 8.0.22
+                cursor.execute("SHOW SLAVE STATUS")
+            row = cursor.fetchone()
+            cursor.close()
+        if row is None:
+            return None   # not replicating from anything
+        lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+        return float(lag) if lag is not None else None
+
+    def needs_check(self):
+        now = time.monotonic()
+        return any(now - replica["checked_at"] >= self.check_interval for replica in self._replicas)
+
+    def refresh(self):
+        # One thread re-measures stale replicas; the others use the last known lag
+        if not self._checking.acquire(blocking=False):
+            return
+        try:
+            for replica in self._replicas:
+                if time.monotonic() - replica["checked_at"] < self.check_interval:
+                    continue
+                try:
+                    lag = self._measure(replica)
+                except Exception as e:
+                    print(f"Error checking lag on replica {replica['name']}: {e}")
+                    lag = None
+                    replica["check_failures"] += 1
+                replica["lag"] = lag
+                replica["checked_at"] = time.monotonic()
+        finally:
+            self._checking.release()
+
+    def wrote(self, key):
+        self._recent_writes.set(key, True)
+
+    def _choose(self, key, refresh):
+        if key is not None and self._recent_writes.get(key, False):
+            with self._lock:
+                self._stats["sticky_reads"] += 1
+                self._stats["primary_reads"] += 1
+            return None
+
+        if refresh:
+            self.refresh()
+        healthy = [replica for replica in self._replicas if replica["lag"] is not None and replica["lag"] <= self.max_lag]
+        with self._lock:
+            if not healthy:
+                self._stats["no_healthy_replica"] += 1
+                self._stats["primary_reads"] += 1
+                return None
+            replica = healthy[next(self._next) % len(healthy)]
+            replica["reads"] += 1
+            self._stats["replica_reads"] += 1
+        return replica
+
+    def pool_for(self, key=None):
+        replica = self._choose(key, refresh=True)
+        return replica["pool"] if replica is not None else None
+
+    def replica_for(self, key=None, refresh=True):
+        # With refresh=False the last measured lag is used as is, so the call never blocks
+        replica = self._choose(key, refresh)
+        return replica["name"] if replica is not None else None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["replicas"] = {
+                replica["name"]: {
+                    "lag": replica["lag"],
+                    "reads": replica["reads"],
+                    "check_failures": replica["check_failures"],
+                    "pool": replica["pool"].stats(),
+                }
+                for replica in self._replicas
+            }
+        stats["max_lag"] = self.max_lag
+        stats["sticky_keys"] = len(self._recent_writes)
+        return stats
+
+
+def replica_router_from_env(pools):
+    return ReplicaRouter(
+        pools,
+        max_lag=float(os.environ.get("DB_REPLICA_MAX_LAG", 5)),
+        check_interval=float(os.environ.get("DB_REPLICA_CHECK_INTERVAL", 5)),
+        sticky_seconds=float(os.environ["DB_REPLICA_STICKY_SECONDS"]) if "DB_REPLICA_STICKY_SECONDS" in os.environ else None,
+    )
@@ -0,0 +1,198 @@
+# Versioned schema migrations for the bot's database.
+#
+# Migrations live in migrations/ as NNNN_name.sql (statements separated by ";") or
+# NNNN_name.py (an upgrade(cursor) function, for steps that depend on the current
+# schema). Each one runs once, in order, and is recorded in schema_migrations with a
+# checksum so an edited migration that has already been applied is reported.
+# MySQL commits DDL as it goes, so a failed migration stops the run and has to be
+# fixed forward; everything before it stays recorded.
+#
+#   python schemaMigrator.py status
+#   python schemaMigrator.py migrate [--target 0005]
+#   python schemaMigrator.py verify      # EXPLAIN the hot queries against their indexes
+import argparse
+import hashlib
+import importlib.util
+import re
+from pathlib import Path
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.(sql|py)$")
+
+# The queries the bot runs on every request or pairing run, with the index each should use
+QUERY_CHECKS = [
+    ("team members", "SELECT user_id FROM introductions WHERE team_id = %s",
+     ("T0",), "introductions_team_user"),
+    ("pairing cleanup", "DELETE FROM introductions WHERE team_id = %s AND user_id IN (%s, %s)",
+     ("T0", "U0", "U1"), "introductions_team_user"),
+    ("pairing history", "SELECT user_id1, user_id2 FROM pairings WHERE team_id = %s",
+     ("T0",), "pairings_team_pair"),
+    ("pair probe", "SELECT 1 FROM pairings WHERE team_id = %s AND least_user = LEAST(%s, %s) AND greatest_user = GREATEST(%s, %s)",
+     ("T0", "U0", "U1", "U0", "U1"), "pairings_team_pair"),
+    ("profile lookup", "SELECT * FROM user_profiles WHERE user_id = %s AND team_id = %s",
+     ("U0", "T0"), "PRIMARY"),
+    ("installation lookup", "SELECT team_id, bot_token, bot_user_id FROM installations WHERE team_id = %s",
+     ("T0",), "PRIMARY"),
+    ("outbox claim", "SELECT id FROM notification_outbox WHERE status = 'pending' AND available_at <= %s ORDER BY id LIMIT %s",
+     (0, 500), "notification_outbox_due"),
+]
+
+# EXPLAIN on a near-empty table can short-circuit a unique-key lookup without naming the key
+CONST_LOOKUP_NOTES = ("const table", "Impossible WHERE", "no matching row")
+
+
+class MigrationError(Exception):
+    pass
+
+
+def discover(directory=MIGRATIONS_DIR):
+    migrations = []
+    for path in sorted(directory.iterdir()):
+        match = MIGRATION_FILE.match(path.name)
+        if match:
+            migrations.append({
+                "version": match.group(1),
+                "name": match.group(2),
+                "path": path,
+                "checksum": hashlib.sha256(path.read_bytes()).hexdigest(),
+            })
+    versions = [migration["version"] for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def sql_statements(text):
+    # Drops "--" comment lines and splits on ";" at the end of a line
+    lines = [line for line in text.splitlines() if not line.strip().startswith("--")]
+    statements = re.split(r";\s*$", "\n".join(lines), flags=re.MULTILINE)
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+def run_migration(cursor, migration):
+    if migration["path"].suffix == ".sql":
+        for statement in sql_statements(migration["path"].read_text()):
+            cursor.execute(statement)
+    else:
+        spec = importlib.util.spec_from_file_location(f"migration_{migration['version']}", migration["path"])
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.upgrade(cursor)
+
+
+class Migrator:
+    def __init__(self, pool, directory=MIGRATIONS_DIR):
+        self.pool = pool
+        self.directory = directory
+
+    def _ensure_table(self, cursor):
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version CHAR(4) PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+
+    def applied(self):
+        with self.pool.connection() as db:
+            cursor = db.cursor(dictionary=True)
+            self._ensure_table(cursor)
+            cursor.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+            rows = {row["version"]: row for row in cursor.fetchall()}
+            cursor.close()
+        return rows
+
+    def status(self):
+        applied = self.applied()
+        report = []
+        for migration in discover(self.directory):
+            row = applied.get(migration["version"])
+            if row is None:
+                state = "pending"
+            elif row["checksum"] != migration["checksum"]:
+                state = "changed since applied"
+            else:
+                state = f"applied {row['applied_at']}"
+            report.append((migration["version"], migration["name"], state))
+        return report
+
+    def migrate(self, target=None):
+        # Applies every pending migration up to and including target; returns their versions
+        applied = self.applied()
+        done = []
+        for migration in discover(self.directory):
+            if target is not None and migration["version"] > target:
+                break
+            if migration["version"] in applied:
+                continue
+
+            print(f"Applying {migration['version']}_{migration['name']}...")
+            with self.pool.connection() as db:
+                cursor = db.cursor(dictionary=True)
+                try:
+                    run_migration(cursor, migration)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                        (migration["version"], migration["name"], migration["checksum"])
+                    )
+                    db.commit()
+                except Exception as e:
+                    raise MigrationError(f"Migration {migration['version']}_{migration['name']} failed: {e}") from e
+                finally:
+                    cursor.close()
+            done.append(migration["version"])
+        return done
+
+    def verify(self):
+        # EXPLAINs each hot query; a check passes only when the optimizer chose the expected
+        # index (listing it in possible_keys while scanning the table doesn't count)
+        results = []
+        with self.pool.connection() as db:
+            cursor = db.cursor(dictionary=True)
+            for name, query, params, index in QUERY_CHECKS:
+                cursor.execute(f"EXPLAIN {query}", params)
+                plan = cursor.fetchall()[0]
+                extra = plan.get("Extra") or ""
+                ok = plan.get("key") == index or any(note in extra for note in CONST_LOOKUP_NOTES)
+                results.append({
+                    "check": name,
+                    "expected": index,
+                    "key": plan.get("key"),
+                    "type": plan.get("type"),
+                    "rows": plan.get("rows"),
+                    "ok": ok,
+                })
+            cursor.close()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply and check the bot's schema migrations")
+    parser.add_argument("command", choices=["status", "migrate", "verify"])
+    parser.add_argument("--target", help="last migration version to apply, e.g. 0005")
+    args = parser.parse_args()
+
+    from sqlConnector import storage
+    if storage.name != "mysql":
+        raise SystemExit(f"Migrations are for MySQL; the {storage.name} backend creates its schema on connect.")
+    migrator = Migrator(storage.pool)
+
+    if args.command == "status":
+        for version, name, state in migrator.status():
+            print(f"{version}  {name:<32} {state}")
+    elif args.command == "migrate":
+        done = migrator.migrate(args.target)
+        print(f"Applied {len(done)} migration(s)." if done else "Schema is up to date.")
+    else:
+        results = migrator.verify()
+        for result in results:
+            print(f"{'ok ' if result['ok'] else 'FAIL'} {result['check']:<20} expected {result['expected']:<26} "
+                  f"used {result['key']} ({result['type']}, ~{result['rows']} rows)")
+        if not all(result["ok"] for result in results):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
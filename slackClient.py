@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import OrderedDict
+
+from slack_sdk.errors import SlackApiError
+
+# Requests per minute for each Slack rate-limit tier
+TIER_LIMITS = {1: 1, 2: 20, 3: 50, 4: 100}
+
+# Web API methods we call, by tier (https://api.slack.com/docs/rate-limits)
+METHOD_TIERS = {
+    "auth.test": 4,
+    "chat.postMessage": "channel",   # ~1 message per second per channel
+    "conversations.history": 3,
+    "conversations.info": 3,
+    "conversations.list": 2,
+    "conversations.open": 3,
+    "oauth.v2.access": 4,
+    "users.info": 4,
+    "users.list": 2,
+    "views.open": 4,
+    "views.publish": 4,
+    "views.push": 4,
+    "views.update": 4,
+}
+DEFAULT_TIER = 3
+MAX_CHANNEL_BUCKETS = 10000
+MAX_RETRIES = 5
+
+# Methods that spend a trigger_id, which Slack expires 3 seconds after the interaction.
+# Waiting longer than this for a token (or a Retry-After) can only end in expired_trigger_id.
+TRIGGER_METHODS = ("views.open", "views.push")
+TRIGGER_MAX_WAIT = 2.5
+
+
+class RateLimitWaitError(Exception):
+    pass
+
+
+# Token bucket: refills at `rate` tokens per second up to `capacity`.
+# acquire() blocks until a token is free and returns how long it waited; with max_wait it
+# returns None, without taking a token, as soon as it knows the wait would be longer.
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        # Slack told us to back off (Retry-After); nobody takes a token until then
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+    def acquire(self, max_wait=None):
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                    self._updated_at = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    delay = (1 - self._tokens) / self.rate
+                if max_wait is not None and waited + delay > max_wait:
+                    return None
+            time.sleep(delay)
+            waited += delay
+
+
+def _bucket_for_tier(tier):
+    per_minute = TIER_LIMITS[tier]
+    return TokenBucket(rate=per_minute / 60.0, capacity=max(1, per_minute // 10))
+
+
+# Keeps one bucket per Web API method, plus one per channel for chat.postMessage,
+# and counts calls, 429 retries and time spent throttled.
+class RateLimiter:
+    def __init__(self):
+        self._buckets = {}
+        self._channel_buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def bucket(self, method, channel=None):
+        tier = METHOD_TIERS.get(method, DEFAULT_TIER)
+        with self._lock:
+            if tier == "channel":
+                key = channel or ""
+                bucket = self._channel_buckets.get(key)
+                if bucket is None:
+                    bucket = self._channel_buckets[key] = TokenBucket(rate=1.0, capacity=1)
+                    while len(self._channel_buckets) > MAX_CHANNEL_BUCKETS:
+                        self._channel_buckets.popitem(last=False)
+                else:
+                    self._channel_buckets.move_to_end(key)
+                return bucket
+            bucket = self._buckets.get(method)
+            if bucket is None:
+                bucket = self._buckets[method] = _bucket_for_tier(tier)
+            return bucket
+
+    def record(self, method, throttled=0.0, retried=False, gave_up=False):
+        with self._lock:
+            stats = self._stats.setdefault(method, {"calls": 0, "retries": 0, "throttled_time": 0.0, "gave_up": 0})
+            if gave_up:
+                stats["gave_up"] += 1
+            elif not retried:
+                stats["calls"] += 1
+            else:
+                stats["retries"] += 1
+            stats["throttled_time"] += throttled
+
+    def stats(self):
+        with self._lock:
+            return {method: dict(stats) for method, stats in self._stats.items()}
+
+
+# Shared by every wrapper in the process so bot.py and sqlConnector.py draw on the same limits
+default_limiter = RateLimiter()
+
+
+def _api_method(name):
+    # chat_postMessage -> chat.postMessage
+    return name.replace("_", ".", 1)
+
+
+# Drop-in wrapper around slack_sdk.WebClient.
+# Calls wait for a token instead of failing, and a 429 pauses the method's bucket
+# for Retry-After seconds before the call is retried. views.open and views.push raise
+# RateLimitWaitError instead when the wait would outlast their trigger_id.
+# Every Web API call the bot makes goes through one of these, including the one-off
+# auth.test for SLACK_TOKEN and the oauth.v2.access of an install.
+class RateLimitedClient:
+    def __init__(self, client, limiter=None):
+        self._client = client
+        self.limiter = limiter or default_limiter
+
+    def _call(self, method, func, *args, **kwargs):
+        bucket = self.limiter.bucket(method, kwargs.get("channel"))
+        max_wait = TRIGGER_MAX_WAIT if method in TRIGGER_METHODS else None
+        started_at = time.monotonic()
+        retried = False
+        for attempt in range(MAX_RETRIES + 1):
+            # A trigger's time budget covers every attempt, not just this one
+            remaining = max_wait - (time.monotonic() - started_at) if max_wait is not None else None
+            throttled = bucket.acquire(remaining)
+            if throttled is None:
+                self.limiter.record(method, gave_up=True)
+                raise RateLimitWaitError(f"{method} would wait more than {max_wait}s for a rate-limit token; "
+                                         f"its trigger_id would expire first")
+            try:
+                response = func(*args, **kwargs)
+                self.limiter.record(method, throttled, retried)
+                return response
+            except SlackApiError as e:
+                if e.response.status_code != 429 or attempt == MAX_RETRIES:
+                    self.limiter.record(method, throttled, retried)
+                    raise
+                retry_after = float(e.response.headers.get("Retry-After", 1))
+                print(f"Rate limited on {method}, retrying in {retry_after}s")
+                bucket.pause(retry_after)
+                self.limiter.record(method, throttled, retried)
+                retried = True
+
+    def api_call(self, api_method, *args, **kwargs):
+        return self._call(api_method, self._client.api_call, api_method, *args, **kwargs)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+        method = _api_method(name)
+
+        def call(*args, **kwargs):
+            return self._call(method, attr, *args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+    def stats(self):
+        return self.limiter.stats()
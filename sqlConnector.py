@@ -1,319 +1,362 @@
-import mysql.connector
-import random
-import slack_sdk
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from flask import Flask
-from slackeventsapi import SlackEventAdapter
-import datetime
-from slack_sdk import WebClient
+import time
+import hashlib
+import itertools
+import uuid
+from matchingEngine import match_team
+from storage import storage_from_env
+from asyncStorage import async_storage_for
+from ttlCache import TTLCache
+from optInMembership import OptInMembership
+from installationStore import InstallationStore, ClientPool, TeamClient
+from notifier import summarize
+from outboxDrainer import OutboxDrainer, outbox_row
 
 env_path = Path('.') / '.env'
 load_dotenv(dotenv_path=env_path)
 
-# For connecting to the server that the bot is in
-app = Flask(__name__)
-slack_event_adapter = SlackEventAdapter(os.environ['SIGNING_SECRET'], '/slack/events', app)
 
-# Gets slack token
-client = slack_sdk.WebClient(token= os.environ['SLACK_TOKEN'])
+# MySQL or embedded SQLite, picked by DB_BACKEND; every helper goes through it
+storage = storage_from_env()
+db_pool = storage.pool
 
+# The same storage for code on an event loop (the ASGI server); the scheduler stays sync
+async_storage = async_storage_for(storage)
 
-def connect_to_db():
-    return mysql.connector.connect(
-        host="localhost",
-        user="gaudi",
-        password="mypassword",
-        database="slackdb"
-    )
+# Bot tokens per workspace; SLACK_TOKEN stays installed for its own workspace.
+# Setting SLACK_TEAM_ID and SLACK_BOT_USER_ID skips the auth.test lookup (offline runs and tests).
+installation_store = InstallationStore(
+    storage,
+    default_token=os.environ.get('SLACK_TOKEN'),
+    default_team_id=os.environ.get('SLACK_TEAM_ID'),
+    default_bot_user_id=os.environ.get('SLACK_BOT_USER_ID'),
+)
 
+# One rate-limited WebClient per workspace, and a client that calls whichever team is current
+client_pool = ClientPool(installation_store)
+client = TeamClient(client_pool)
 
-def save_profile_to_db(user_id, profile, team_id):
-    db = connect_to_db()
-    cursor = db.cursor()
-    print(team_id)
-
-    query = """
-    INSERT INTO user_profiles (user_id, full_name, pronouns, location, hometown, education, languages, hobbies, birthday, ask_me_about, bio, team_id)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-    full_name = VALUES(full_name),
-    pronouns = VALUES(pronouns),
-    location = VALUES(location),
-    hometown = VALUES(hometown),
-    education = VALUES(education),
-    languages = VALUES(languages),
-    hobbies = VALUES(hobbies),
-    birthday = VALUES(birthday),
-    ask_me_about = VALUES(ask_me_about),
-    bio = VALUES(bio),
-    team_id = VALUES(team_id)
-    """
-    cursor.execute(query, (
-        user_id,  
-        profile.get('full_name', ''),
-        profile.get('pronouns', ''),
-        profile.get('location', ''),
-        profile.get('hometown', ''),
-        profile.get('education', ''),
-        profile.get('languages', ''),
-        profile.get('hobbies', ''),
-        profile.get('birthday', ''),
-        profile.get('ask_me_about', ''),
-        profile.get('bio', ''),
-        team_id
-    ))
-
-    db.commit()
-    cursor.close()
-    db.close()
+# Read-through cache of user_profiles rows keyed on (team_id, user_id).
+# Missing profiles are cached too (as None) so repeated lookups don't hit the DB.
+profile_cache = TTLCache(
+    max_size=int(os.environ.get("PROFILE_CACHE_SIZE", 5000)),
+    ttl=float(os.environ.get("PROFILE_CACHE_TTL", 300)),
+)
+_NOT_CACHED = object()
 
+# Max rows per multi-row INSERT / DELETE ... IN (...) in the pairing job
+PAIRING_BATCH_SIZE = int(os.environ.get("PAIRING_BATCH_SIZE", 500))
 
-def load_profile_from_db(user_id, team_id):
-    db = connect_to_db()
-    cursor = db.cursor(dictionary=True)
+# Processes used to match teams in parallel; 1 keeps matching in the scheduler thread
+PAIRING_WORKERS = int(os.environ.get("PAIRING_WORKERS", 1))
 
-    query = "SELECT * FROM user_profiles WHERE user_id = %s AND team_id = %s"
-    cursor.execute(query, (user_id, team_id))
-    result = cursor.fetchone()
+# 1: the pairing job drains the notification outbox itself once its transaction commits.
+# 0: leave delivery to a separate `python outboxDrainer.py` process.
+OUTBOX_INLINE_DRAIN = os.environ.get("OUTBOX_INLINE_DRAIN", "1") == "1"
 
-    cursor.close()
-    db.close()
 
-    return result
+# Opted-in users per team, kept in memory so opt-in checks and team sizes don't query
+# introductions; bot.py starts its periodic reconcile against the DB
+opt_in_membership = OptInMembership(storage)
 
-def is_user_opted_in(user_id, team_id):
-    db = connect_to_db()
-    cursor = db.cursor()
 
-    # Check if the user_id exists in the introductions table for the specific team
-    cursor.execute("SELECT COUNT(*) FROM introductions WHERE user_id = %s AND team_id = %s", (user_id, team_id))
-    count = cursor.fetchone()[0]
+# Bumped on every profile change so anything rendered from a profile can be keyed on it.
+# Versions come from one counter, so none is ever reused, and a user without a recent change
+# is at version 0. An entry must outlive anything cached under the version before it (the
+# profile modal cache keeps renders for 300s), hence the longer TTL.
+_next_profile_version = itertools.count(1)
+profile_versions = TTLCache(
+    max_size=int(os.environ.get("PROFILE_VERSION_SIZE", 100000)),
+    ttl=float(os.environ.get("PROFILE_VERSION_TTL", 3600)),
+)
 
-    cursor.close()
-    db.close()
 
-    return count > 0
+def profile_version(user_id, team_id):
+    return profile_versions.get((team_id, user_id), 0)
 
-def opt_in_user(user_id, team_id, full_name):
-    db = connect_to_db()
-    cursor = db.cursor()
-    intro_text = f"{full_name} has opted in!"
-    query = """
-    INSERT INTO introductions (user_id, team_id, intro_text)
-    VALUES (%s, %s, %s)
-    ON DUPLICATE KEY UPDATE intro_text = VALUES(intro_text)
-    """
-    cursor.execute(query, (user_id, team_id, intro_text))
-    db.commit()
-    cursor.close()
-    db.close()
 
+def invalidate_profile(user_id, team_id):
+    profile_cache.invalidate((team_id, user_id))
+    profile_versions.set((team_id, user_id), next(_next_profile_version))
 
-def opt_out_user(user_id, team_id):
-    db = connect_to_db()
-    cursor = db.cursor()
 
-    cursor.execute("DELETE FROM introductions WHERE user_id = %s AND team_id = %s", (user_id, team_id))
-    db.commit()
-    cursor.close()
-    db.close()
+def save_profile_to_db(user_id, profile, team_id):
+    storage.save_profile(user_id, team_id, profile)
+    invalidate_profile(user_id, team_id)
 
 
+def _cache_profile(user_id, team_id, result, version):
+    # A save that landed while the read was in flight bumped the version; caching the older
+    # row would outlive that save's invalidation, so leave the slot empty for the next read
+    if profile_version(user_id, team_id) == version:
+        profile_cache.set((team_id, user_id), result)
 
-def check_pairing_exists(cursor, user1, user2, team_id):
-    # Check if a pairing between two users already exists
-    cursor.execute(
-        "SELECT COUNT(*) FROM pairings WHERE team_id = %s AND "
-        "((user_id1 = %s AND user_id2 = %s) OR (user_id1 = %s AND user_id2 = %s))",
-        (team_id, user1, user2, user2, user1)
-    )
-    count = cursor.fetchone()["COUNT(*)"]
-    return count > 0
 
-def all_users_already_paired(cursor, users, team_id):
-    num_users = len(users)
+def load_profile_from_db(user_id, team_id):
+    cached = profile_cache.get((team_id, user_id), _NOT_CACHED)
+    if cached is not _NOT_CACHED:
+        return dict(cached) if cached is not None else None
 
-    # Quick checks
-    if num_users < 2:
-        return True  # No pairs can be formed with less than 2 users
+    version = profile_version(user_id, team_id)
+    result = storage.load_profile(user_id, team_id)
+    _cache_profile(user_id, team_id, result, version)
+    return dict(result) if result is not None else None
 
-    # Retrieve existing pairs and store in a set
-    cursor.execute("SELECT user_id1, user_id2 FROM pairings WHERE team_id = %s", (team_id,))
-    existing_pairs = set()
-    
-    for row in cursor.fetchall():
-        existing_pairs.add(frozenset([row['user_id1'], row['user_id2']]))
+def is_user_opted_in(user_id, team_id):
+    return opt_in_membership.contains(user_id, team_id)
 
-    # Check if all combinations of the users have already been paired
-    for i in range(num_users):
-        for j in range(i + 1, num_users):
-            if frozenset([users[i], users[j]]) not in existing_pairs:
-                return False
 
-    return True
+def opted_in_count(team_id):
+    return opt_in_membership.team_size(team_id)
 
 
-def pair_users_weekly():
-    db = connect_to_db()
-    cursor = db.cursor(dictionary=True)
-
-    # Get unique team_ids from introductions to process each server separately
-    cursor.execute("SELECT DISTINCT team_id FROM introductions")
-    teams = cursor.fetchall()
-
-    for team in teams:
-        team_id = team["team_id"]
-
-        # Fetch all opted-in users for this team
-        cursor.execute("SELECT user_id FROM introductions WHERE team_id = %s", (team_id,))
-        users = [row["user_id"] for row in cursor.fetchall()]
-        # Check if all users have already been paired
-        if len(users) < 2 or all_users_already_paired(cursor, users, team_id):
-            print(f"All users have already been paired or not enough users in team {team_id}. Skipping pairing.")
-            continue  # Skip pairing if all users are paired or if there are less than 2 users
-
-        random.shuffle(users)
-        pairs = []
-
-        while len(users) > 1:
-            if len(users) == 3:
-                # Attempt to pair three users
-                user1, user2, user3 = users.pop(), users.pop(), users.pop()
-
-                # Check if any of the users have been paired together before
-                if (not check_pairing_exists(cursor, user1, user2, team_id) and
-                    not check_pairing_exists(cursor, user1, user3, team_id) and
-                    not check_pairing_exists(cursor, user2, user3, team_id)):
-                    
-                    pairs.append((user1, user2, user3))
-                    group_dm = client.conversations_open(users=[user1, user2, user3])
-
-                    # Message with buttons for viewing each other's profiles
-                    blocks = [
-                        {
-                            "type": "section",
-                            "text": {
-                                "type": "mrkdwn",
-                                "text": f":wave: You've been paired with <@{user2}> and <@{user3}> this week!"
-                            }
-                        },
-                        {
-                            "type": "actions",
-                            "elements": [
-                                {
-                                    "type": "button",
-                                    "text": {"type": "plain_text", "text": "View Profile"},
-                                    "value": user1,
-                                    "action_id": "view_profile_button1"
-                                },
-                                {
-                                    "type": "button",
-                                    "text": {"type": "plain_text", "text": "View Profile"},
-                                    "value": user2,
-                                    "action_id": "view_profile_button2"
-                                },
-                                {
-                                    "type": "button",
-                                    "text": {"type": "plain_text", "text": "View Profile"},
-                                    "value": user3,
-                                    "action_id": "view_profile_button3"
-                                }
-                            ]
-                        }
-                    ]
-
-                    client.chat_postMessage(
-                        channel=group_dm["channel"]["id"],
-                        text="You've been paired with teammates this week!",
-                        blocks=blocks
-                    )
-
-                    # Log the pairing in the database
-                    cursor.execute(
-                        "INSERT INTO pairings (team_id, user_id1, user_id2) VALUES (%s, %s, %s)",
-                        (team_id, user1, user2)
-                    )
-                    cursor.execute(
-                        "INSERT INTO pairings (team_id, user_id1, user_id2) VALUES (%s, %s, %s)",
-                        (team_id, user1, user3)
-                    )
-                    cursor.execute(
-                        "INSERT INTO pairings (team_id, user_id1, user_id2) VALUES (%s, %s, %s)",
-                        (team_id, user2, user3)
-                    )
-                else:
-                    # If pairing is invalid, push users back and continue
-                    users.insert(0, user3)
-                    users.insert(0, user2)
-                    users.insert(0, user1)
-
-            else:
-                # Attempt to pair two users
-                user1, user2 = users.pop(), users.pop()
-
-                # Check if the pair has been paired together before
-                if not check_pairing_exists(cursor, user1, user2, team_id):
-                    pairs.append((user1, user2))
-                    group_dm = client.conversations_open(users=[user1, user2])
-
-                    # Message with buttons for viewing each other's profiles
-                    blocks = [
-                        {
-                            "type": "section",
-                            "text": {
-                                "type": "mrkdwn",
-                                "text": f":wave: You've been paired with <@{user1}> and <@{user2}> this week!"
-                            }
-                        },
-                        {
-                            "type": "actions",
-                            "elements": [
-                                {
-                                    "type": "button",
-                                    "text": {"type": "plain_text", "text": "View Profile"},
-                                    "value": user1,
-                                    "action_id": "view_profile_button4"
-                                },
-                                {
-                                    "type": "button",
-                                    "text": {"type": "plain_text", "text": "View Profile"},
-                                    "value": user2,
-                                    "action_id": "view_profile_button5"
-                                }
-                            ]
-                        }
-                    ]
-
-                    client.chat_postMessage(
-                        channel=group_dm["channel"]["id"],
-                        text="You've been paired with a teammate this week!",
-                        blocks=blocks
-                    )
-
-                    # Log the pairing in the database
-                    cursor.execute(
-                        "INSERT INTO pairings (team_id, user_id1, user_id2) VALUES (%s, %s, %s)",
-                        (team_id, user1, user2)
-                    )
-                else:
-                    # If pairing is invalid, push users back and continue
-                    users.insert(0, user2)
-                    users.insert(0, user1)
+def opt_in_user(user_id, team_id, full_name):
+    storage.opt_in(user_id, team_id, f"{full_name} has opted in!")
+    opt_in_membership.add(user_id, team_id)
 
-        # Remove paired users from introductions table for this team
-        for pair in pairs:
-            for user in pair:
-                cursor.execute("DELETE FROM introductions WHERE user_id = %s AND team_id = %s", (user, team_id))
 
-    db.commit()
-    cursor.close()
-    db.close()
+def opt_out_user(user_id, team_id):
+    storage.opt_out(user_id, team_id)
+    opt_in_membership.remove(user_id, team_id)
 
 
+# Async profile read for the ASGI prefetch, sharing the profile cache
+async def load_profile_from_db_async(user_id, team_id):
+    cached = profile_cache.get((team_id, user_id), _NOT_CACHED)
+    if cached is not _NOT_CACHED:
+        return dict(cached) if cached is not None else None
 
+    version = profile_version(user_id, team_id)
+    result = await async_storage.load_profile(user_id, team_id)
+    _cache_profile(user_id, team_id, result, version)
+    return dict(result) if result is not None else None
 
 
+def all_users_already_paired(history, users):
+    # Quick checks
+    if len(users) < 2:
+        return True  # No pairs can be formed with less than 2 users
+
+    # Check if all combinations of the users have already been paired
+    return history.all_paired(users)
+
+
+def _batches(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def insert_pairings(cursor, team_id, groups, stats):
+    # One row per pair within each group (three rows for a trio), sent as multi-row INSERTs
+    rows = [
+        (team_id, group[a], group[b])
+        for group in groups
+        for a in range(len(group))
+        for b in range(a + 1, len(group))
+    ]
+    for batch in _batches(rows, PAIRING_BATCH_SIZE):
+        cursor.executemany("INSERT INTO pairings (team_id, user_id1, user_id2) VALUES (%s, %s, %s)", batch)
+        stats["statements"] += 1
+        stats["rows"] += len(batch)
+
+
+def delete_introductions(cursor, team_id, users, stats):
+    for batch in _batches(users, PAIRING_BATCH_SIZE):
+        placeholders = ", ".join(["%s"] * len(batch))
+        cursor.execute(
+            f"DELETE FROM introductions WHERE team_id = %s AND user_id IN ({placeholders})",
+            (team_id, *batch)
+        )
+        stats["statements"] += 1
+        stats["rows"] += len(batch)
+
+
+def insert_outbox(cursor, team_id, notifications, run_id, stats):
+    # Pending notifications, written in the same transaction as the pairings they announce
+    rows = [
+        outbox_row(
+            team_id,
+            notification,
+            hashlib.sha256(f"{team_id}:{run_id}:{','.join(notification['users'])}".encode("utf-8")).hexdigest(),
+            0
+        )
+        for notification in notifications
+    ]
+    for batch in _batches(rows, PAIRING_BATCH_SIZE):
+        cursor.executemany(
+            "INSERT INTO notification_outbox (idempotency_key, team_id, users, payload, available_at) VALUES (%s, %s, %s, %s, %s)",
+            batch
+        )
+        stats["statements"] += 1
+        stats["rows"] += len(batch)
+
+
+def build_pairing_notification(team_id, group):
+    # Message with buttons for viewing each other's profiles
+    if len(group) == 3:
+        user1, user2, user3 = group
+        blocks = [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f":wave: You've been paired with <@{user2}> and <@{user3}> this week!"
+                }
+            },
+            {
+                "type": "actions",
+                "elements": [
+                    {
+                        "type": "button",
+                        "text": {"type": "plain_text", "text": "View Profile"},
+                        "value": user1,
+                        "action_id": "view_profile_button1"
+                    },
+                    {
+                        "type": "button",
+                        "text": {"type": "plain_text", "text": "View Profile"},
+                        "value": user2,
+                        "action_id": "view_profile_button2"
+                    },
+                    {
+                        "type": "button",
+                        "text": {"type": "plain_text", "text": "View Profile"},
+                        "value": user3,
+                        "action_id": "view_profile_button3"
+                    }
+                ]
+            }
+        ]
+        text = "You've been paired with teammates this week!"
+    else:
+        user1, user2 = group
+        blocks = [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f":wave: You've been paired with <@{user1}> and <@{user2}> this week!"
+                }
+            },
+            {
+                "type": "actions",
+                "elements": [
+                    {
+                        "type": "button",
+                        "text": {"type": "plain_text", "text": "View Profile"},
+                        "value": user1,
+                        "action_id": "view_profile_button4"
+                    },
+                    {
+                        "type": "button",
+                        "text": {"type": "plain_text", "text": "View Profile"},
+                        "value": user2,
+                        "action_id": "view_profile_button5"
+                    }
+                ]
+            }
+        ]
+        text = "You've been paired with a teammate this week!"
+
+    return {"team_id": team_id, "users": tuple(group), "text": text, "blocks": blocks}
 
 
+def pair_users_weekly():
+    run_id = uuid.uuid4().hex
+    queued = 0
+    write_stats = {"statements": 0, "rows": 0}
+    paired_by_team = {}
+
+    # Matching is CPU-bound, so with PAIRING_WORKERS > 1 teams are matched in a process pool
+    # while this process keeps doing the DB reads and the writes in order
+    # (spawned rather than forked, since the scheduler process is multi-threaded)
+    executor = None
+    if PAIRING_WORKERS > 1:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(
+            max_workers=PAIRING_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    try:
+        # Teams, members and pair history are read from a replica when one is within the
+        # lag threshold, so the history scans stay off the primary; writes go to the primary
+        with storage.pool.connection() as db, storage.read_connection(primary=db) as read_db:
+            cursor = db.cursor(dictionary=True)
+            read_cursor = read_db.cursor(dictionary=True)
+
+            # Get unique team_ids from introductions to process each server separately
+            teams = storage.opted_in_teams(read_cursor)
+
+            # Read each team and start its matching as soon as its history is loaded
+            pending = []
+            for team_id in teams:
+                started_at = time.perf_counter()
+
+                # Opted-in users for this team, read fresh so an opt-out handled by another
+                # process is never paired; the reload also refreshes the membership cache
+                users = sorted(opt_in_membership.load(team_id, read_cursor))
+
+                # Load the team's pairing history once and share it with the matching loop
+                history = storage.load_history(read_cursor, team_id)
+
+                # Check if all users have already been paired
+                if len(users) < 2 or all_users_already_paired(history, users):
+                    print(f"All users have already been paired or not enough users in team {team_id}. Skipping pairing.")
+                    continue  # Skip pairing if all users are paired or if there are less than 2 users
+
+                read_time = time.perf_counter() - started_at
+                if executor:
+                    pending.append((executor.submit(match_team, team_id, users, history), read_time))
+                else:
+                    pending.append((match_team(team_id, users, history), read_time))
+
+            # Write the results back in team order
+            for job, read_time in pending:
+                team_id, result, match_time = job.result() if executor else job
+                started_at = time.perf_counter()
+
+                if result.leftovers:
+                    print(f"Could not find a new match for {len(result.leftovers)} user(s) in team {team_id}: {result.leftovers}")
+
+                notifications = [build_pairing_notification(team_id, group) for group in result.groups]
+
+                # Log the pairings, queue their notifications and remove paired users from
+                # introductions in batches, all in the one transaction
+                insert_pairings(cursor, team_id, result.groups, write_stats)
+                insert_outbox(cursor, team_id, notifications, run_id, write_stats)
+                paired_by_team[team_id] = [user for group in result.groups for user in group]
+                delete_introductions(cursor, team_id, paired_by_team[team_id], write_stats)
+                queued += len(notifications)
+
+                write_time = time.perf_counter() - started_at
+                print(f"Team {team_id}: {len(result.groups)} groups, {len(result.leftovers)} unmatched "
+                      f"(read {read_time:.3f}s, match {match_time:.3f}s, write {write_time:.3f}s)")
+
+            read_cursor.close()
+            db.commit()
+            cursor.close()
+
+        # Only once the deletes are committed
+        for team_id, paired in paired_by_team.items():
+            storage.wrote((team_id,))
+            opt_in_membership.remove_many(team_id, paired)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    print(f"Pairing writes: {write_stats['statements']} statements, {write_stats['rows']} rows.")
+
+    if not OUTBOX_INLINE_DRAIN:
+        print(f"Pairing notifications: {queued} queued for the outbox drainer.")
+        return []
+
+    # Delivered from the outbox after the commit; this also picks up anything an earlier
+    # run queued but never sent
+    results = OutboxDrainer(storage.pool, client).drain()
+    summary = summarize(results)
+    print(f"Pairing notifications: {summary['sent']} sent, {summary['failed']} failed.")
+    return results
@@ -0,0 +1,335 @@
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from dbPool import ConnectionPool, pool_from_env
+from pairHistory import PairHistory
+from replicaRouter import replica_router_from_env
+
+PROFILE_FIELDS = (
+    "full_name", "pronouns", "location", "hometown", "education",
+    "languages", "hobbies", "birthday", "ask_me_about", "bio",
+)
+
+_PARAM = re.compile(r"%s")
+
+
+# Profiles, opt-ins and pair history on top of a pooled DB-API connection.
+# The SQL is shared; subclasses supply connect() and the few statements whose
+# syntax differs between MySQL and SQLite (upserts, insert-or-ignore, event purging).
+# Writes go to `pool`; reads can go to read replicas when `replicas` is set.
+class SqlStorage:
+    name = None
+
+    def __init__(self, pool=None, replicas=None):
+        self.pool = pool or pool_from_env(self.connect)
+        self.replicas = replicas
+
+    # Read routing. Keys are (team_id, user_id) for a profile and (team_id,) for a team's opt-ins.
+
+    def wrote(self, key):
+        if self.replicas is not None:
+            self.replicas.wrote(key)
+
+    @contextmanager
+    def read_connection(self, key=None, primary=None):
+        # A replica connection when one is within the lag threshold and key wasn't just
+        # written; otherwise the caller's own primary connection, or one from the pool
+        pool = self.replicas.pool_for(key) if self.replicas is not None else None
+        if pool is None and primary is not None:
+            yield primary
+            return
+        with (pool or self.pool).connection() as db:
+            yield db
+
+    # Profiles
+
+    def load_profile(self, user_id, team_id):
+        with self.read_connection((team_id, user_id)) as db:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM user_profiles WHERE user_id = %s AND team_id = %s", (user_id, team_id))
+            result = cursor.fetchone()
+            cursor.close()
+        return result
+
+    def save_profile(self, user_id, team_id, profile):
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.execute(
+                self.upsert("user_profiles", ("team_id", "user_id"), PROFILE_FIELDS),
+                (team_id, user_id, *(profile.get(field, '') for field in PROFILE_FIELDS))
+            )
+            db.commit()
+            cursor.close()
+        self.wrote((team_id, user_id))
+
+    # Opt-ins
+
+    def opt_in(self, user_id, team_id, intro_text):
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.execute(self.upsert("introductions", ("team_id", "user_id"), ("intro_text",)), (team_id, user_id, intro_text))
+            db.commit()
+            cursor.close()
+        self.wrote((team_id,))
+
+    def opt_out(self, user_id, team_id):
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.execute("DELETE FROM introductions WHERE user_id = %s AND team_id = %s", (user_id, team_id))
+            db.commit()
+            cursor.close()
+        self.wrote((team_id,))
+
+    # Pairing job reads, on whichever cursor the job reads through
+
+    def opted_in_teams(self, cursor):
+        cursor.execute("SELECT DISTINCT team_id FROM introductions")
+        return [row["team_id"] for row in cursor.fetchall()]
+
+    def team_members(self, cursor, team_id):
+        cursor.execute("SELECT user_id FROM introductions WHERE team_id = %s", (team_id,))
+        return [row["user_id"] for row in cursor.fetchall()]
+
+    def load_history(self, cursor, team_id):
+        return PairHistory.load(cursor, team_id)
+
+    def stats(self):
+        stats = {"backend": self.name, "pool": self.pool.stats()}
+        if self.replicas is not None:
+            stats["replicas"] = self.replicas.stats()
+        return stats
+
+
+class MySQLStorage(SqlStorage):
+    name = "mysql"
+
+    def __init__(self, user, password, host="localhost", database="slackdb", pool=None, replica_hosts=()):
+        self.params = {"host": host, "user": user, "password": password, "database": database}
+        replicas = None
+        if replica_hosts:
+            replicas = replica_router_from_env([
+                (replica_host, pool_from_env(lambda replica_host=replica_host: self.connect(replica_host)))
+                for replica_host in replica_hosts
+            ])
+        super().__init__(pool, replicas)
+
+    def connect(self, host=None):
+        # Imported on first connect so importing this module stays cheap
+        import mysql.connector
+        params = dict(self.params)
+        if host is not None:
+            # "host" or "host:port"
+            params["host"], _, port = host.partition(":")
+            if port:
+                params["port"] = int(port)
+        return mysql.connector.connect(**params)
+
+    def upsert(self, table, keys, columns):
+        names = (*keys, *columns)
+        updates = ", ".join(f"{column} = VALUES({column})" for column in columns)
+        return (f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))}) "
+                f"ON DUPLICATE KEY UPDATE {updates}")
+
+    def insert_ignore(self, table, columns):
+        return f"INSERT IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+
+    # Takes the window in seconds
+    purge_events = "DELETE FROM processed_events WHERE seen_at < NOW() - INTERVAL %s SECOND"
+
+
+# Same tables and keys as migrations/, in SQLite's dialect
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_profiles (
+    team_id TEXT NOT NULL DEFAULT '',
+    user_id TEXT NOT NULL,
+    full_name TEXT, pronouns TEXT, location TEXT, hometown TEXT, education TEXT,
+    languages TEXT, hobbies TEXT, birthday TEXT, ask_me_about TEXT, bio TEXT,
+    PRIMARY KEY (team_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS introductions (
+    intro_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    team_id TEXT NOT NULL DEFAULT '',
+    user_id TEXT NOT NULL,
+    intro_text TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (team_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS pairings (
+    pairing_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    team_id TEXT NOT NULL DEFAULT '',
+    user_id1 TEXT NOT NULL,
+    user_id2 TEXT NOT NULL,
+    pairing_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    least_user TEXT GENERATED ALWAYS AS (min(user_id1, user_id2)) STORED,
+    greatest_user TEXT GENERATED ALWAYS AS (max(user_id1, user_id2)) STORED,
+    UNIQUE (team_id, least_user, greatest_user)
+);
+CREATE TABLE IF NOT EXISTS processed_events (
+    event_id TEXT PRIMARY KEY,
+    seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS processed_events_seen_at ON processed_events (seen_at);
+CREATE TABLE IF NOT EXISTS installations (
+    team_id TEXT PRIMARY KEY,
+    bot_token TEXT NOT NULL,
+    bot_user_id TEXT,
+    installed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    team_id TEXT NOT NULL,
+    users TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    available_at REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    channel TEXT,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS notification_outbox_due ON notification_outbox (status, available_at, id);
+"""
+
+
+# Cursor that takes the MySQL paramstyle and returns dict rows like mysql-connector's
+# cursor(dictionary=True). Statements are passed to sqlite3 with their parameters, so
+# each distinct query is compiled once and reused from the connection's statement cache.
+class SQLiteCursor:
+    def __init__(self, conn, dictionary, counter):
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+        self._counter = counter
+
+    def _sql(self, query):
+        self._counter(query)
+        return _PARAM.sub("?", query)
+
+    def execute(self, query, params=()):
+        self._cursor.execute(self._sql(query), params)
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(self._sql(query), rows)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+# The subset of mysql-connector's connection API the pool and the helpers use
+class SQLiteConnection:
+    def __init__(self, conn, counter):
+        self._conn = conn
+        self._counter = counter
+
+    def cursor(self, dictionary=False):
+        return SQLiteCursor(self._conn, dictionary, self._counter)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self._conn.close()
+
+
+# Embedded backend for tests, benchmarks and single-process deployments: no server,
+# WAL journaling so readers don't block the writer, and the schema created on first connect.
+# ":memory:" gives a private database per connection, so it is served from a pool of one.
+class SQLiteStorage(SqlStorage):
+    name = "sqlite"
+
+    def __init__(self, path="slackdb.sqlite3", pool=None):
+        self.path = path
+        self.statements = Counter()   # statements run, by leading keyword
+        self._lock = threading.Lock()
+        if pool is None and path == ":memory:":
+            pool = ConnectionPool(self.connect, size=1, max_lifetime=0, health_check_after=float("inf"))
+        super().__init__(pool)
+
+    def _count(self, query):
+        with self._lock:
+            self.statements[query.split(None, 1)[0].upper()] += 1
+
+    def connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,   # the pool hands each connection to one thread at a time
+            timeout=float(os.environ.get("SQLITE_BUSY_TIMEOUT", 5)),
+            cached_statements=int(os.environ.get("SQLITE_STATEMENT_CACHE", 256)),
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SQLITE_SCHEMA)
+        return SQLiteConnection(conn, self._count)
+
+    def upsert(self, table, keys, columns):
+        names = (*keys, *columns)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns)
+        return (f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))}) "
+                f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}")
+
+    def insert_ignore(self, table, columns):
+        return f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+
+    # Takes the window in seconds
+    purge_events = "DELETE FROM processed_events WHERE seen_at < datetime('now', '-' || %s || ' seconds')"
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats["statements"] = dict(self.statements)
+        return stats
+
+
+def storage_from_env():
+    # DB_BACKEND=mysql (default) or sqlite
+    backend = os.environ.get("DB_BACKEND", "mysql")
+    if backend == "sqlite":
+        return SQLiteStorage(os.environ.get("SQLITE_PATH", "slackdb.sqlite3"))
+    if backend == "mysql":
+        # No fallback credentials: a deployment that forgot them should fail here, not connect as someone else
+        missing = [name for name in ("DB_USER", "DB_PASSWORD") if not os.environ.get(name)]
+        if missing:
+            raise ValueError(f"DB_BACKEND=mysql needs {' and '.join(missing)} set")
+        return MySQLStorage(
+            host=os.environ.get("DB_HOST", "localhost"),
+            user=os.environ["DB_USER"],
+            password=os.environ["DB_PASSWORD"],
+            database=os.environ.get("DB_NAME", "slackdb"),
+            # Comma-separated "host" or "host:port" read replicas of DB_HOST
+            replica_hosts=[host.strip() for host in os.environ.get("DB_REPLICA_HOSTS", "").split(",") if host.strip()],
+        )
+    raise ValueError(f"Unknown DB_BACKEND {backend!r}, expected 'mysql' or 'sqlite'")
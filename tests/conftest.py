@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# sqlConnector and bot read these at import time: embedded storage, a fixed bot
+# identity (no auth.test), no scheduler and no Slack delivery from the pairing job
+TEST_ENV = {
+    "DB_BACKEND": "sqlite",
+    "SQLITE_PATH": os.path.join(tempfile.mkdtemp(prefix="slackbot-tests-"), "slackdb.sqlite3"),
+    "SIGNING_SECRET": "test-secret",
+    "SLACK_TOKEN": "xoxb-test",
+    "SLACK_TEAM_ID": "T1",
+    "SLACK_BOT_USER_ID": "B1",
+    "PAIRING_SCHEDULER": "0",
+    "OUTBOX_INLINE_DRAIN": "0",
+}
+for key, value in TEST_ENV.items():
+    os.environ.setdefault(key, value)
+
+
+@pytest.fixture
+def sqlite_storage():
+    from storage import SQLiteStorage
+    storage = SQLiteStorage(":memory:")
+    yield storage
+    storage.pool.close()
+
+
+def query_rows(storage, query, params=()):
+    with storage.pool.connection() as db:
+        cursor = db.cursor(dictionary=True)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
@@ -0,0 +1,51 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import urlencode
+
+import pytest
+
+pytest.importorskip("slack_sdk")
+pytest.importorskip("asgiref")
+
+import asgiApp  # noqa: E402
+import bot  # noqa: E402
+
+
+def signed(body):
+    timestamp = str(int(time.time()))
+    signature = hmac.new(b"test-secret", f"v0:{timestamp}:{body}".encode(), hashlib.sha256).hexdigest()
+    return {"X-Slack-Request-Timestamp": timestamp, "X-Slack-Signature": f"v0={signature}"}
+
+
+def post_to_asgi(body, headers):
+    sent = []
+    messages = [{"type": "http.request", "body": body.encode(), "more_body": False}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgiApp.handle_actions({}, receive, send, headers))
+    return sent[0]["status"]
+
+
+@pytest.mark.parametrize("payload", ["[1, 2]", '"block_actions"', "null"])
+def test_payload_that_is_not_an_object_is_rejected(payload):
+    body = urlencode({"payload": payload})
+    headers = signed(body)
+
+    response = bot.app.test_client().post(
+        "/slack/actions", data=body, headers=dict(headers, **{"Content-Type": "application/x-www-form-urlencoded"})
+    )
+    assert response.status_code == 400
+    assert post_to_asgi(body, headers) == 400
+
+
+def test_unknown_action_is_acked():
+    body = urlencode({"payload": json.dumps({"type": "block_actions", "actions": [{"action_id": "nobody_handles_this"}]})})
+    assert post_to_asgi(body, signed(body)) == 200
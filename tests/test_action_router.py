@@ -0,0 +1,37 @@
+from actionRouter import ActionRouter, routing_key
+
+
+def block_action(action_id):
+    return {"type": "block_actions", "actions": [{"action_id": action_id}]}
+
+
+def test_routing_keys():
+    assert routing_key(block_action("save")) == ("block_actions", "save")
+    assert routing_key({"type": "block_suggestion", "action_id": "channel_select"}) == ("block_suggestion", "channel_select")
+    assert routing_key({"type": "view_submission", "view": {"callback_id": "profile"}}) == ("view_submission", "profile")
+    assert routing_key({"type": "shortcut"}) == ("shortcut", None)
+
+
+def test_exact_routes_win_over_prefixes():
+    router = ActionRouter()
+
+    @router.route("block_actions", prefix="view_profile_button")
+    def any_profile(payload):
+        return "prefix"
+
+    @router.route("block_actions", "view_profile_button_self")
+    def own_profile(payload):
+        return "exact"
+
+    assert router.dispatch(block_action("view_profile_button_self")) == "exact"
+    assert router.dispatch(block_action("view_profile_button3")) == "prefix"
+    assert router.stats()["handlers"]["any_profile"]["calls"] == 1
+
+
+def test_unknown_payloads_are_counted_not_dispatched():
+    router = ActionRouter()
+    router.route("view_submission", "profile")(lambda payload: "saved")
+    assert not router.handles(block_action("nobody"))
+    assert router.dispatch({"type": "view_submission", "view": {"callback_id": "other"}}) is None
+    assert router.handles({"type": "view_submission", "view": {"callback_id": "profile"}})
+    assert router.unhandled == 2
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiomysql")
+
+from asyncStorage import AsyncMySQLStorage  # noqa: E402
+from replicaRouter import ReplicaRouter  # noqa: E402
+from test_replica_router import FakeReplicaPool  # noqa: E402
+
+
+class FakeAsyncPool:
+    # Enough of an aiomysql pool for AsyncMySQLStorage.cursor; rows come back tagged with the host
+    def __init__(self, host):
+        self.host = host
+        self.size = 1
+        self.freesize = 1
+
+    async def acquire(self):
+        pool = self
+
+        class Cursor:
+            async def execute(self, query, params=()):
+                pass
+
+            async def fetchone(self):
+                return {"host": pool.host}
+
+            async def close(self):
+                pass
+
+        class Connection:
+            async def cursor(self, cursor_class=None):
+                return Cursor()
+
+            async def rollback(self):
+                pass
+
+        return Connection()
+
+    def release(self, conn):
+        pass
+
+
+class FakeMySQLStorage:
+    params = {"host": "primary", "user": "u", "password": "p", "database": "slackdb"}
+
+    def __init__(self, replicas=None):
+        self.replicas = replicas
+
+
+def test_failed_pool_creation_is_retried():
+    async_storage = AsyncMySQLStorage(FakeMySQLStorage(), size=1, timeout=1)
+    attempts = []
+
+    async def create_pool(host=None):
+        attempts.append(host)
+        if len(attempts) == 1:
+            raise ConnectionError("primary unreachable")
+        return FakeAsyncPool("primary")
+
+    async_storage._create_pool = create_pool
+
+    async def run():
+        with pytest.raises(ConnectionError):
+            await async_storage.load_profile("U1", "T1")
+        return await async_storage.load_profile("U1", "T1")
+
+    assert asyncio.run(run()) == {"host": "primary"}
+    assert attempts == [None, None]
+
+
+def test_reads_follow_the_replica_router():
+    router = ReplicaRouter([("replica-1", FakeReplicaPool(0))], max_lag=5, check_interval=60, sticky_seconds=60)
+    async_storage = AsyncMySQLStorage(FakeMySQLStorage(router), size=1, timeout=1)
+
+    async def create_pool(host=None):
+        return FakeAsyncPool(host or "primary")
+
+    async_storage._create_pool = create_pool
+
+    async def run():
+        before = await async_storage.load_profile("U1", "T1")
+        router.wrote(("T1", "U1"))
+        after = await async_storage.load_profile("U1", "T1")
+        other = await async_storage.load_profile("U2", "T1")
+        return before, after, other
+
+    # A user who just saved their profile reads it back from the primary
+    assert asyncio.run(run()) == ({"host": "replica-1"}, {"host": "primary"}, {"host": "replica-1"})
@@ -0,0 +1,37 @@
+import contextvars
+import threading
+import time
+
+from channelCatalog import ChannelCatalog
+
+team = contextvars.ContextVar("team", default=None)
+
+
+class SlowClient:
+    def __init__(self):
+        self.release = threading.Event()
+        self.teams = []
+
+    def conversations_list(self, **kwargs):
+        self.teams.append(team.get())
+        self.release.wait(5)
+        return {"channels": [{"id": "C1", "name": "general"}, {"id": "C2", "name": "gardening"}]}
+
+
+def test_search_does_not_wait_for_the_first_load():
+    client = SlowClient()
+    catalog = ChannelCatalog(client)
+    team.set("T2")
+
+    started_at = time.monotonic()
+    assert catalog.search("g") == []
+    assert time.monotonic() - started_at < 1
+    assert catalog.search("g") == []   # a second lookup doesn't start another load
+
+    client.release.set()
+    deadline = time.monotonic() + 5
+    while catalog.age() is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert catalog.search("gar") == [("C2", "gardening")]
+    assert client.teams == ["T2"]
@@ -0,0 +1,125 @@
+import threading
+
+import pytest
+
+from dbPool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self):
+        self.rollbacks = 0
+        self.closed = False
+        self.connected = True
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def ping(self, reconnect=False):
+        if not self.connected:
+            raise ConnectionError("gone")
+
+    def is_connected(self):
+        return self.connected
+
+    def close(self):
+        self.closed = True
+
+
+def test_reuses_connections_and_rolls_back_on_return():
+    created = []
+    pool = ConnectionPool(lambda: created.append(FakeConnection()) or created[-1], size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second and len(created) == 1
+    assert first.rollbacks == 2
+
+
+def test_waits_then_times_out_when_exhausted():
+    pool = ConnectionPool(FakeConnection, size=1, timeout=0.05)
+    with pool.connection():
+        with pytest.raises(PoolTimeoutError):
+            with pool.connection():
+                pass
+    stats = pool.stats()
+    assert stats["timeouts"] == 1 and stats["in_use"] == 0
+
+
+def test_never_hands_out_more_than_size():
+    pool = ConnectionPool(FakeConnection, size=3, timeout=5)
+    in_use = []
+    peak = []
+    lock = threading.Lock()
+
+    def borrow():
+        with pool.connection():
+            with lock:
+                in_use.append(1)
+                peak.append(len(in_use))
+            threading.Event().wait(0.01)
+            with lock:
+                in_use.pop()
+
+    threads = [threading.Thread(target=borrow) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) <= 3
+
+
+def test_discards_a_connection_that_broke_mid_use():
+    created = []
+    pool = ConnectionPool(lambda: created.append(FakeConnection()) or created[-1], size=1)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.connected = False
+            raise RuntimeError("query failed")
+    assert conn.closed
+    with pool.connection() as fresh:
+        assert fresh is not conn
+
+
+def test_health_checks_idle_connections():
+    created = []
+    pool = ConnectionPool(lambda: created.append(FakeConnection()) or created[-1], size=1, health_check_after=0)
+    with pool.connection() as conn:
+        pass
+    conn.connected = False
+    with pool.connection() as fresh:
+        assert fresh is not conn
+    assert pool.stats()["health_check_failures"] == 1
+
+
+def test_recycles_connections_past_max_lifetime(monkeypatch):
+    import dbPool
+    now = [1000.0]
+    monkeypatch.setattr(dbPool.time, "monotonic", lambda: now[0])
+    created = []
+    pool = ConnectionPool(lambda: created.append(FakeConnection()) or created[-1], size=1, max_lifetime=60)
+    with pool.connection() as conn:
+        pass
+    now[0] += 61
+    with pool.connection() as fresh:
+        assert fresh is not conn
+    assert conn.closed and len(created) == 2
+
+
+def test_failed_connect_gives_the_slot_back():
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("refused")
+        return FakeConnection()
+
+    pool = ConnectionPool(connect, size=1, timeout=0.05)
+    with pytest.raises(ConnectionError):
+        with pool.connection():
+            pass
+    # The only slot must still be free, or this would time out
+    with pool.connection():
+        pass
+    assert pool.stats()["timeouts"] == 0
@@ -0,0 +1,44 @@
+import pytest
+
+from eventDedup import DbEventStore, EventDeduplicator, MemoryEventStore
+
+
+def test_memory_store_forgets_events_after_the_window(monkeypatch):
+    import eventDedup
+    now = [0.0]
+    monkeypatch.setattr(eventDedup.time, "monotonic", lambda: now[0])
+    store = MemoryEventStore(window=60)
+    assert store.add("Ev1")
+    assert not store.add("Ev1")
+    now[0] = 61
+    assert store.add("Ev1")
+
+
+def test_memory_store_is_capped():
+    store = MemoryEventStore(window=3600, max_size=2)
+    for event_id in ("Ev1", "Ev2", "Ev3"):
+        assert store.add(event_id)
+    # Ev1 was pushed out to make room
+    assert store.add("Ev1")
+
+
+def test_duplicates_are_skipped_across_workers(sqlite_storage):
+    # Two processes, each with its own memory store, sharing processed_events
+    first = EventDeduplicator(DbEventStore(sqlite_storage))
+    second = EventDeduplicator(DbEventStore(sqlite_storage))
+    assert not first.should_skip("Ev1")
+    assert second.should_skip("Ev1", retry_num="1")
+    assert first.stats()["processed"] == 1 and second.stats()["duplicates"] == 1
+
+
+def test_retry_policies():
+    ack = EventDeduplicator(policy="ack")
+    assert not ack.should_skip("Ev1")
+    assert ack.should_skip("Ev2", retry_num="1")
+    assert ack.stats()["retries_acked"] == 1
+
+    off = EventDeduplicator(policy="off")
+    assert not off.should_skip("Ev1") and not off.should_skip("Ev1")
+
+    with pytest.raises(ValueError):
+        EventDeduplicator(policy="sometimes")
@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("slack_sdk")
+
+from installationStore import ClientPool, InstallationStore, UnknownTeamError, team_from_payload, team_scope  # noqa: E402
+
+
+@pytest.fixture
+def store(sqlite_storage):
+    return InstallationStore(sqlite_storage, default_token="xoxb-default", default_team_id="T0", default_bot_user_id="B0")
+
+
+def test_finds_saved_and_default_installations(store):
+    assert store.find("T1") is None
+    store.save("T1", "xoxb-one", "B1")
+    assert store.find("T1") == {"team_id": "T1", "bot_token": "xoxb-one", "bot_user_id": "B1"}
+    assert store.find("T0")["bot_token"] == "xoxb-default"
+
+    store.delete("T1")
+    assert store.find("T1") is None
+
+
+def test_client_pool_follows_the_current_team(store):
+    store.save("T1", "xoxb-one", "B1")
+    pool = ClientPool(store, max_size=1)
+    with team_scope("T1"):
+        client = pool.get()
+    assert pool.get("T1") is client
+    assert pool.get() is not client   # no team in scope: the default workspace
+
+    # The default workspace's client pushed T1's out
+    assert pool.stats()["evictions"] == 1
+    with pytest.raises(UnknownTeamError):
+        pool.get("T9")
+
+
+def test_team_from_payload():
+    assert team_from_payload({"team": {"id": "T1"}}) == "T1"
+    assert team_from_payload({"team_id": "T2"}) == "T2"
+    assert team_from_payload({"user": {"team_id": "T3"}}) == "T3"
+    assert team_from_payload({}) is None
@@ -0,0 +1,85 @@
+import itertools
+import random
+
+import pytest
+
+from matchingEngine import match_users
+from pairHistory import PairHistory
+
+
+def random_team(seed, min_size=2, max_size=12):
+    rng = random.Random(seed)
+    users = [f"U{i:02d}" for i in range(rng.randint(min_size, max_size))]
+    history = PairHistory()
+    density = rng.random()
+    for a, b in itertools.combinations(users, 2):
+        if rng.random() < density:
+            history.add_pair(a, b)
+    return users, history
+
+
+def maximum_matching(users, history):
+    # Brute force over small teams
+    best = 0
+
+    def search(rest, size):
+        nonlocal best
+        best = max(best, size)
+        if len(rest) < 2 or size + len(rest) // 2 <= best:
+            return
+        first = rest[0]
+        for i in range(1, len(rest)):
+            if not history.has_paired(first, rest[i]):
+                search(rest[1:i] + rest[i + 1:], size + 1)
+        search(rest[1:], size)
+
+    search(list(users), 0)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_never_repeats_a_pair_and_places_everyone_once(seed):
+    users, history = random_team(seed)
+    result = match_users(users, history, random.Random(seed))
+
+    placed = [user for group in result.groups for user in group] + result.leftovers
+    assert sorted(placed) == sorted(users)
+    for group in result.groups:
+        assert len(group) in (2, 3)
+        for a, b in itertools.combinations(group, 2):
+            assert not history.has_paired(a, b)
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_matching_is_maximum(seed):
+    users, history = random_team(seed)
+    result = match_users(users, history, random.Random(seed))
+    # A trio is a matched pair plus one user who would otherwise be left over
+    assert len(result.groups) == maximum_matching(users, history)
+
+
+@pytest.mark.parametrize("size", [3, 5, 7, 21, 101])
+def test_odd_team_gets_one_trio(size):
+    users = [f"U{i:03d}" for i in range(size)]
+    result = match_users(users, PairHistory(), random.Random(size))
+    assert sorted(len(group) for group in result.groups) == [2] * (size // 2 - 1) + [3]
+    assert result.leftovers == []
+
+
+def test_trio_only_with_two_new_people():
+    # U2 has met U0 and U1, so it can't join them; it is left over instead
+    history = PairHistory()
+    history.add_pair("U0", "U2")
+    history.add_pair("U1", "U2")
+    result = match_users(["U0", "U1", "U2"], history, random.Random(0))
+    assert result.groups == [("U0", "U1")] or result.groups == [("U1", "U0")]
+    assert result.leftovers == ["U2"]
+
+
+def test_team_that_has_all_met_returns_everyone_as_leftovers():
+    users = [f"U{i}" for i in range(6)]
+    history = PairHistory()
+    history.add_group(users)
+    result = match_users(users, history, random.Random(0))
+    assert result.groups == []
+    assert sorted(result.leftovers) == users
@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("slack_sdk")
+
+import bot  # noqa: E402
+
+
+@pytest.fixture
+def oauth(monkeypatch):
+    monkeypatch.setenv("SLACK_CLIENT_ID", "client-id")
+    monkeypatch.setenv("SLACK_CLIENT_SECRET", "client-secret")
+    responses = []
+    monkeypatch.setattr(bot.slack_sdk.WebClient, "oauth_v2_access", lambda self, **kwargs: responses.pop(0))
+    saved = []
+    monkeypatch.setattr(bot.installation_store, "save", lambda *args: saved.append(args))
+    return responses, saved
+
+
+def start_install(client):
+    response = client.get("/slack/install")
+    assert response.status_code == 302
+    return response.headers["Location"].split("state=")[1]
+
+
+def test_install_completes_with_the_state_it_was_started_with(oauth):
+    responses, saved = oauth
+    responses.append({"team": {"id": "T7"}, "access_token": "xoxb-7", "bot_user_id": "B7"})
+    client = bot.app.test_client()
+    state = start_install(client)
+
+    assert client.get(f"/slack/oauth_redirect?code=abc&state={state}").status_code == 200
+    assert saved == [("T7", "xoxb-7", "B7")]
+
+
+def test_redirect_without_a_matching_state_is_refused(oauth):
+    responses, saved = oauth
+    client = bot.app.test_client()
+    assert client.get("/slack/oauth_redirect?code=abc").status_code == 403
+
+    # A valid state from another browser's install flow doesn't match this one's cookie
+    state = start_install(bot.app.test_client())
+    assert client.get(f"/slack/oauth_redirect?code=abc&state={state}").status_code == 403
+    assert saved == []
+
+
+def test_expired_state_is_refused(oauth, monkeypatch):
+    client = bot.app.test_client()
+    state = start_install(client)
+    now = bot.time.time()
+    monkeypatch.setattr(bot.time, "time", lambda: now + bot.OAUTH_STATE_TTL + 1)
+    assert client.get(f"/slack/oauth_redirect?code=abc&state={state}").status_code == 403
+
+
+def test_org_wide_install_is_rejected(oauth):
+    responses, saved = oauth
+    responses.append({"team": None, "enterprise": {"id": "E1"}, "is_enterprise_install": True,
+                      "access_token": "xoxb-org", "bot_user_id": "B1"})
+    client = bot.app.test_client()
+    state = start_install(client)
+    assert client.get(f"/slack/oauth_redirect?code=abc&state={state}").status_code == 400
+    assert saved == []
@@ -0,0 +1,68 @@
+import threading
+import time
+
+from optInMembership import OptInMembership
+
+
+class ScriptedStorage:
+    # The test passes (release event, rows) as the cursor, so each read returns when told to
+    def team_members(self, cursor, team_id):
+        release, rows = cursor
+        release.wait(5)
+        return list(rows)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_tracks_opt_ins_and_outs(sqlite_storage):
+    membership = OptInMembership(sqlite_storage)
+    sqlite_storage.opt_in("U1", "T1", "hi")
+    assert membership.contains("U1", "T1")
+    assert membership.team_size("T1") == 1
+
+    sqlite_storage.opt_in("U2", "T1", "hi")
+    membership.add("U2", "T1")
+    membership.remove("U1", "T1")
+    assert sorted(membership.members("T1")) == ["U2"]
+    assert not membership.contains("U1", "T2")
+
+
+def test_reconcile_picks_up_writes_from_other_processes(sqlite_storage):
+    membership = OptInMembership(sqlite_storage)
+    sqlite_storage.opt_in("U1", "T1", "hi")
+    assert membership.team_size("T1") == 1
+
+    sqlite_storage.opt_in("U2", "T1", "hi")
+    sqlite_storage.opt_out("U1", "T1")
+    assert membership.reconcile() == 1
+    assert sorted(membership.members("T1")) == ["U2"]
+    stats = membership.stats()
+    assert (stats["drift_added"], stats["drift_removed"]) == (1, 1)
+
+
+def test_overtaken_load_does_not_publish_stale_members():
+    membership = OptInMembership(ScriptedStorage())
+    first, second = threading.Event(), threading.Event()
+
+    # The first load's read sees U1; the second, newer load started before U1's opt-in committed
+    a = threading.Thread(target=membership.load, args=("T1", (first, ["U1"])))
+    a.start()
+    wait_for(lambda: membership._generations.get("T1") == 1)
+    b = threading.Thread(target=membership.load, args=("T1", (second, [])))
+    b.start()
+    wait_for(lambda: membership._generations.get("T1") == 2)
+    membership.add("U1", "T1")
+
+    first.set()
+    a.join()
+    second.set()
+    b.join()
+
+    assert membership.members("T1") == ["U1"]
+    assert membership.stats()["superseded_loads"] == 1
+    assert membership._loading == {} and membership._generations == {}
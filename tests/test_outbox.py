@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+
+from conftest import query_rows
+
+pytest.importorskip("slack_sdk")
+
+from outboxDrainer import OutboxDrainer, batch_size_for_lease, outbox_row  # noqa: E402
+
+
+@pytest.fixture
+def file_storage(tmp_path):
+    # A file database, so two drainers really do use separate connections
+    from storage import SQLiteStorage
+    storage = SQLiteStorage(str(tmp_path / "outbox.sqlite3"))
+    yield storage
+    storage.pool.close()
+
+
+def queue_notifications(storage, count):
+    rows = [
+        outbox_row("T1", {"users": (f"U{i}a", f"U{i}b"), "text": "hi", "blocks": []}, f"key-{i}", 0)
+        for i in range(count)
+    ]
+    with storage.pool.connection() as db:
+        cursor = db.cursor()
+        cursor.executemany(
+            "INSERT INTO notification_outbox (idempotency_key, team_id, users, payload, available_at) VALUES (%s, %s, %s, %s, %s)",
+            rows
+        )
+        db.commit()
+        cursor.close()
+
+
+def test_concurrent_drainers_never_claim_the_same_row(file_storage):
+    queue_notifications(file_storage, 200)
+    drainers = [OutboxDrainer(file_storage.pool, None, batch_size=7) for _ in range(4)]
+    claimed = [[] for _ in drainers]
+    start = threading.Barrier(len(drainers))
+
+    def drain(i):
+        start.wait()
+        while True:
+            batch = drainers[i].claim()
+            if not batch:
+                return
+            claimed[i].extend(notification["outbox_id"] for notification in batch)
+
+    threads = [threading.Thread(target=drain, args=(i,)) for i in range(len(drainers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = [outbox_id for batch in claimed for outbox_id in batch]
+    assert len(ids) == len(set(ids)) == 200
+
+
+def test_claimed_row_is_leased_until_it_expires(file_storage, monkeypatch):
+    queue_notifications(file_storage, 1)
+    first = OutboxDrainer(file_storage.pool, None, lease_seconds=60)
+    second = OutboxDrainer(file_storage.pool, None, lease_seconds=60)
+
+    assert [n["attempts"] for n in first.claim()] == [1]
+    assert second.claim() == []
+
+    # The first drainer died; once its lease is over the row is due again
+    import outboxDrainer
+    now = outboxDrainer.time.time()
+    monkeypatch.setattr(outboxDrainer.time, "time", lambda: now + 61)
+    assert [n["attempts"] for n in second.claim()] == [2]
+
+
+def test_failed_send_is_retried_then_given_up(file_storage, monkeypatch):
+    queue_notifications(file_storage, 1)
+    drainer = OutboxDrainer(file_storage.pool, None, max_attempts=2)
+    error = {"ok": False, "error": "channel_not_found"}
+
+    notifications = drainer.claim()
+    assert drainer.record(notifications, [error]) == {"sent": 0, "retrying": 1, "failed": 0, "lost": 0}
+
+    import outboxDrainer
+    now = outboxDrainer.time.time()
+    monkeypatch.setattr(outboxDrainer.time, "time", lambda: now + 3600)
+    notifications = drainer.claim()
+    assert drainer.record(notifications, [error]) == {"sent": 0, "retrying": 0, "failed": 1, "lost": 0}
+    assert query_rows(file_storage, "SELECT status, attempts FROM notification_outbox") == [{"status": "failed", "attempts": 2}]
+
+
+def test_expired_lease_cannot_overwrite_the_new_owner(file_storage, monkeypatch):
+    queue_notifications(file_storage, 1)
+    slow = OutboxDrainer(file_storage.pool, None, lease_seconds=60)
+    fresh = OutboxDrainer(file_storage.pool, None, lease_seconds=60)
+    stale = slow.claim()
+
+    import outboxDrainer
+    now = outboxDrainer.time.time()
+    monkeypatch.setattr(outboxDrainer.time, "time", lambda: now + 61)
+    claimed = fresh.claim()
+
+    # The slow drainer finishes after its lease ran out; only the new owner's result lands
+    assert slow.record(stale, [{"ok": False, "error": "timeout"}]) == {"sent": 0, "retrying": 0, "failed": 0, "lost": 1}
+    assert fresh.record(claimed, [{"ok": True, "channel": "D1"}]) == {"sent": 1, "retrying": 0, "failed": 0, "lost": 0}
+    assert query_rows(file_storage, "SELECT status, channel, last_error FROM notification_outbox") == [
+        {"status": "sent", "channel": "D1", "last_error": None}
+    ]
+
+
+def test_default_batch_fits_in_the_lease(monkeypatch):
+    monkeypatch.delenv("OUTBOX_BATCH_SIZE", raising=False)
+    # conversations.open allows 50 a minute, so a batch may take at most half the lease
+    assert batch_size_for_lease(120) == 50
+    assert OutboxDrainer(None, None, lease_seconds=120).batch_size == 50
+    assert OutboxDrainer(None, None, lease_seconds=1).batch_size == 1
+    monkeypatch.setenv("OUTBOX_BATCH_SIZE", "10")
+    assert OutboxDrainer(None, None, lease_seconds=120).batch_size == 10
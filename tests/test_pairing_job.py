@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT, query_rows
+
+pytest.importorskip("dotenv")
+pytest.importorskip("slack_sdk")
+
+
+@pytest.fixture
+def pairing(sqlite_storage, monkeypatch):
+    import sqlConnector
+    from optInMembership import OptInMembership
+    monkeypatch.setattr(sqlConnector, "storage", sqlite_storage)
+    monkeypatch.setattr(sqlConnector, "opt_in_membership", OptInMembership(sqlite_storage))
+    return sqlConnector
+
+
+def opt_in_team(pairing, team_id, size):
+    users = [f"U{team_id}{i:03d}" for i in range(size)]
+    for user in users:
+        pairing.opt_in_user(user, team_id, user)
+    return users
+
+
+def paired_groups(storage):
+    # Pairs within each group share the outbox row that announces them
+    return [row["users"].split(",") for row in query_rows(storage, "SELECT users FROM notification_outbox ORDER BY id")]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pairs_every_user_once(pairing, monkeypatch, workers):
+    monkeypatch.setattr(pairing, "PAIRING_WORKERS", workers)
+    users = opt_in_team(pairing, "T1", 9) + opt_in_team(pairing, "T2", 4)
+
+    pairing.pair_users_weekly()
+
+    grouped = [user for group in paired_groups(pairing.storage) for user in group]
+    assert sorted(grouped) == sorted(users)
+    assert query_rows(pairing.storage, "SELECT user_id FROM introductions") == []
+    assert pairing.opted_in_count("T1") == 0
+
+
+def test_worker_reimport_of_bot_has_no_side_effects():
+    # A spawned worker re-runs the parent's __main__ as __mp_main__; with the bot started
+    # as `python bot.py` that must not start threads or a scheduler of its own
+    script = (
+        "import runpy, threading\n"
+        "module = runpy.run_path('bot.py', run_name='__mp_main__')\n"
+        "print(module['scheduler'], sorted(t.name for t in threading.enumerate()))\n"
+    )
+    env = dict(os.environ, PAIRING_SCHEDULER="1")
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "None ['MainThread']"
+
+
+def test_wsgi_import_starts_background_work_when_opted_in():
+    # gunicorn and `flask run --no-reload` only import the app
+    script = "import bot\nprint(bot.scheduler is not None, bot.background_started)\n"
+    for setting, expected in (("1", "True True"), ("0", "False False")):
+        env = dict(os.environ, PAIRING_SCHEDULER=setting)
+        env.pop("WERKZEUG_RUN_MAIN", None)
+        result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip().splitlines()[-1] == expected
+
+
+def test_opt_out_from_another_process_is_not_paired(pairing):
+    opt_in_team(pairing, "T1", 4)
+    assert pairing.opted_in_count("T1") == 4
+
+    # Written straight to the DB, so this process's membership cache still has the user
+    pairing.storage.opt_out("UT1000", "T1")
+    pairing.pair_users_weekly()
+
+    grouped = [user for group in paired_groups(pairing.storage) for user in group]
+    assert "UT1000" not in grouped
+    assert sorted(grouped) == ["UT1001", "UT1002", "UT1003"]
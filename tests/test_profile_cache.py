@@ -0,0 +1,50 @@
+from ttlCache import TTLCache
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used(monkeypatch):
+    import ttlCache
+    now = [0.0]
+    monkeypatch.setattr(ttlCache.time, "monotonic", lambda: now[0])
+    cache = TTLCache(max_size=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1   # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("c") == 3
+
+    now[0] = 11
+    assert cache.get("a", "gone") == "gone"
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["expirations"] == 1 and stats["size"] == 1
+
+
+def test_ttl_cache_caches_none_distinctly_from_a_miss():
+    cache = TTLCache()
+    missing = object()
+    cache.set("nobody", None)
+    assert cache.get("nobody", missing) is None
+    cache.invalidate("nobody")
+    assert cache.get("nobody", missing) is missing
+
+
+def test_save_during_a_read_is_not_overwritten_by_the_older_row(sqlite_storage, monkeypatch):
+    import sqlConnector
+    monkeypatch.setattr(sqlConnector, "storage", sqlite_storage)
+    monkeypatch.setattr(sqlConnector, "profile_cache", TTLCache())
+    sqlConnector.save_profile_to_db("U1", {"full_name": "Old"}, "T1")
+
+    read = sqlite_storage.load_profile
+
+    def slow_read(user_id, team_id):
+        row = read(user_id, team_id)
+        # Another request saves while this read is in flight
+        sqlConnector.save_profile_to_db("U1", {"full_name": "New"}, "T1")
+        return row
+
+    monkeypatch.setattr(sqlite_storage, "load_profile", slow_read)
+    assert sqlConnector.load_profile_from_db("U1", "T1")["full_name"] == "Old"
+
+    monkeypatch.setattr(sqlite_storage, "load_profile", read)
+    assert sqlConnector.load_profile_from_db("U1", "T1")["full_name"] == "New"
+    assert sqlConnector.load_profile_from_db("U1", "T1")["full_name"] == "New"
+    assert sqlConnector.profile_cache.stats()["hits"] == 1
@@ -0,0 +1,119 @@
+from contextlib import contextmanager
+
+from replicaRouter import ReplicaRouter
+
+
+class FakeReplicaPool:
+    # Answers SHOW REPLICA STATUS with its current lag; lag="down" makes the check fail
+    def __init__(self, lag):
+        self.lag = lag
+
+    @contextmanager
+    def connection(self):
+        pool = self
+
+        class Cursor:
+            def execute(self, query, params=()):
+                if pool.lag == "down":
+                    raise ConnectionError("replica unreachable")
+
+            def fetchone(self):
+                return {"Seconds_Behind_Source": pool.lag}
+
+            def close(self):
+                pass
+
+        class Connection:
+            def cursor(self, dictionary=False):
+                return Cursor()
+
+        yield Connection()
+
+    def stats(self):
+        return {}
+
+
+def test_uses_only_replicas_within_the_lag_threshold():
+    fresh, lagging, down = FakeReplicaPool(1), FakeReplicaPool(30), FakeReplicaPool("down")
+    router = ReplicaRouter([("fresh", fresh), ("lagging", lagging), ("down", down)], max_lag=5, check_interval=0)
+    assert {router.pool_for() for _ in range(5)} == {fresh}
+
+    fresh.lag = 10
+    assert router.pool_for() is None
+    stats = router.stats()
+    assert stats["no_healthy_replica"] == 1
+    assert stats["replicas"]["down"]["lag"] is None
+
+
+def test_spreads_reads_over_healthy_replicas():
+    a, b = FakeReplicaPool(0), FakeReplicaPool(2)
+    router = ReplicaRouter([("a", a), ("b", b)], max_lag=5, check_interval=60)
+    assert {router.pool_for() for _ in range(4)} == {a, b}
+
+
+def test_reads_own_writes_from_the_primary():
+    replica = FakeReplicaPool(0)
+    router = ReplicaRouter([("replica", replica)], max_lag=5, check_interval=60, sticky_seconds=60)
+    router.wrote(("T1", "U1"))
+    assert router.pool_for(("T1", "U1")) is None
+    assert router.pool_for(("T1", "U2")) is replica
+    assert router.stats()["sticky_reads"] == 1
+
+
+def test_stickiness_expires():
+    replica = FakeReplicaPool(0)
+    router = ReplicaRouter([("replica", replica)], max_lag=5, check_interval=60, sticky_seconds=0)
+    router.wrote(("T1",))
+    assert router.pool_for(("T1",)) is replica
+
+
+def test_storage_falls_back_to_the_callers_primary_connection(sqlite_storage):
+    with sqlite_storage.pool.connection() as db:
+        with sqlite_storage.read_connection(primary=db) as read_db:
+            assert read_db is db
+
+
+class OldMySQLReplicaPool(FakeReplicaPool):
+    # MySQL before 8.0.22: no SHOW REPLICA STATUS, and the lag column is named after the master
+    @contextmanager
+    def connection(self):
+        pool = self
+
+        class Cursor:
+            def execute(self, query, params=()):
+                if query == "SHOW REPLICA STATUS":
+                    raise RuntimeError("You have an error in your SQL syntax")
+
+            def fetchone(self):
+                return {"Seconds_Behind_Master": pool.lag}
+
+            def close(self):
+                pass
+
+        class Connection:
+            def cursor(self, dictionary=False):
+                return Cursor()
+
+        yield Connection()
+
+
+def test_measures_lag_on_older_mysql():
+    old = OldMySQLReplicaPool(3)
+    router = ReplicaRouter([("old", old)], max_lag=5, check_interval=0)
+    assert router.pool_for() is old
+    old.lag = 9
+    assert router.pool_for() is None
+
+
+def test_replica_for_without_refresh_uses_the_last_measurement():
+    replica = FakeReplicaPool(0)
+    router = ReplicaRouter([("replica-1", replica)], max_lag=5, check_interval=60, sticky_seconds=60)
+    # Never measured yet, so the primary serves the read
+    assert router.needs_check()
+    assert router.replica_for(refresh=False) is None
+
+    router.refresh()
+    assert not router.needs_check()
+    assert router.replica_for(("T1", "U1"), refresh=False) == "replica-1"
+    router.wrote(("T1", "U1"))
+    assert router.replica_for(("T1", "U1"), refresh=False) is None
@@ -0,0 +1,89 @@
+import pytest
+
+from conftest import query_rows
+from schemaMigrator import QUERY_CHECKS, MigrationError, Migrator, discover, sql_statements
+
+
+def write_migrations(directory, files):
+    for name, text in files.items():
+        (directory / name).write_text(text)
+
+
+def test_sql_statements_skip_comments_and_split_on_line_ends():
+    text = "-- header\nCREATE TABLE a (x INT);\nINSERT INTO a VALUES (1);\n\n"
+    assert sql_statements(text) == ["CREATE TABLE a (x INT)", "INSERT INTO a VALUES (1)"]
+
+
+def test_repository_migrations_are_numbered_without_gaps():
+    versions = [migration["version"] for migration in discover()]
+    assert versions == [f"{i:04d}" for i in range(1, len(versions) + 1)]
+
+
+def test_migrates_in_order_once_and_reports_edits(sqlite_storage, tmp_path):
+    write_migrations(tmp_path, {
+        "0001_widgets.sql": "CREATE TABLE widgets (id INTEGER PRIMARY KEY, name TEXT);",
+        "0002_seed.py": "def upgrade(cursor):\n    cursor.execute(\"INSERT INTO widgets (name) VALUES ('first')\")\n",
+        "notes.txt": "not a migration",
+    })
+    migrator = Migrator(sqlite_storage.pool, tmp_path)
+    assert migrator.migrate(target="0001") == ["0001"]
+    assert migrator.migrate() == ["0002"]
+    assert migrator.migrate() == []
+    assert query_rows(sqlite_storage, "SELECT name FROM widgets") == [{"name": "first"}]
+
+    (tmp_path / "0001_widgets.sql").write_text("CREATE TABLE widgets (id INTEGER PRIMARY KEY);")
+    states = {version: state for version, _, state in migrator.status()}
+    assert states["0001"] == "changed since applied"
+    assert states["0002"].startswith("applied")
+
+
+def test_failed_migration_stops_the_run(sqlite_storage, tmp_path):
+    write_migrations(tmp_path, {
+        "0001_ok.sql": "CREATE TABLE gadgets (id INTEGER PRIMARY KEY);",
+        "0002_broken.sql": "CREATE TABLE gadgets (id INTEGER PRIMARY KEY);",
+        "0003_never.sql": "CREATE TABLE gizmos (id INTEGER PRIMARY KEY);",
+    })
+    migrator = Migrator(sqlite_storage.pool, tmp_path)
+    with pytest.raises(MigrationError):
+        migrator.migrate()
+    assert [state for _, _, state in migrator.status()][1:] == ["pending", "pending"]
+
+
+class ExplainPool:
+    # Answers every EXPLAIN with the same plan row
+    def __init__(self, plan):
+        self.plan = plan
+
+    def connection(self):
+        pool = self
+
+        class Cursor:
+            def execute(self, query, params=()):
+                pass
+
+            def fetchall(self):
+                return [pool.plan]
+
+            def close(self):
+                pass
+
+        class Connection:
+            def cursor(self, dictionary=False):
+                return Cursor()
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+        return Connection()
+
+
+def test_verify_requires_the_chosen_index():
+    scan = {"key": None, "possible_keys": "introductions_team_user", "type": "ALL", "rows": 1000, "Extra": "Using where"}
+    assert not any(result["ok"] for result in Migrator(ExplainPool(scan)).verify())
+
+    const = {"key": None, "type": None, "rows": None, "Extra": "no matching row in const table"}
+    results = Migrator(ExplainPool(const)).verify()
+    assert len(results) == len(QUERY_CHECKS) and all(result["ok"] for result in results)
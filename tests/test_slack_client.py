@@ -0,0 +1,86 @@
+import pytest
+
+pytest.importorskip("slack_sdk")
+
+from slack_sdk.errors import SlackApiError  # noqa: E402
+
+import slackClient  # noqa: E402
+from slackClient import RateLimitedClient, RateLimiter, RateLimitWaitError, TokenBucket  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Fake time: sleeping advances the clock instead of blocking
+    now = [1000.0]
+    monkeypatch.setattr(slackClient.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(slackClient.time, "sleep", lambda seconds: now.__setitem__(0, now[0] + seconds))
+    return now
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def __getitem__(self, key):
+        return "ratelimited"
+
+
+class FakeWebClient:
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = []
+
+    def _call(self, name, kwargs):
+        self.calls.append(name)
+        if self.failures:
+            raise SlackApiError("failed", self.failures.pop(0))
+        return {"ok": True}
+
+    def chat_postMessage(self, **kwargs):
+        return self._call("chat_postMessage", kwargs)
+
+    def views_open(self, **kwargs):
+        return self._call("views_open", kwargs)
+
+
+def test_bucket_allows_a_burst_then_paces(clock):
+    bucket = TokenBucket(rate=2.0, capacity=2)
+    assert bucket.acquire() == 0 and bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.5)
+
+
+def test_bucket_gives_up_without_taking_a_token(clock):
+    bucket = TokenBucket(rate=0.1, capacity=1)
+    bucket.acquire()
+    assert bucket.acquire(max_wait=2.5) is None
+    clock[0] += 10
+    assert bucket.acquire(max_wait=2.5) == 0
+
+
+def test_retry_after_pauses_then_retries(clock):
+    web = FakeWebClient([FakeResponse(429, {"Retry-After": "3"})])
+    client = RateLimitedClient(web, RateLimiter())
+    started = clock[0]
+    assert client.chat_postMessage(channel="C1", text="hi") == {"ok": True}
+    assert web.calls == ["chat_postMessage", "chat_postMessage"]
+    assert clock[0] - started >= 3
+    assert client.stats()["chat.postMessage"]["retries"] == 1
+
+
+def test_other_errors_are_not_retried(clock):
+    web = FakeWebClient([FakeResponse(400)])
+    client = RateLimitedClient(web, RateLimiter())
+    with pytest.raises(SlackApiError):
+        client.chat_postMessage(channel="C1", text="hi")
+    assert web.calls == ["chat_postMessage"]
+
+
+def test_views_open_fails_fast_rather_than_outlive_its_trigger(clock):
+    web = FakeWebClient([FakeResponse(429, {"Retry-After": "30"})])
+    client = RateLimitedClient(web, RateLimiter())
+    with pytest.raises(RateLimitWaitError):
+        client.views_open(trigger_id="1.2", view={})
+    # One attempt, then no 30s wait for a trigger that expires in 3s
+    assert web.calls == ["views_open"]
+    assert client.stats()["views.open"]["gave_up"] == 1
@@ -0,0 +1,22 @@
+import pytest
+
+from storage import MySQLStorage, storage_from_env
+
+
+def test_mysql_backend_requires_credentials(monkeypatch):
+    monkeypatch.setenv("DB_BACKEND", "mysql")
+    monkeypatch.setenv("DB_USER", "bot")
+    monkeypatch.delenv("DB_PASSWORD", raising=False)
+    with pytest.raises(ValueError, match="DB_PASSWORD"):
+        storage_from_env()
+
+    monkeypatch.setenv("DB_PASSWORD", "secret")
+    storage = storage_from_env()
+    assert isinstance(storage, MySQLStorage)
+    assert (storage.params["user"], storage.params["password"]) == ("bot", "secret")
+
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setenv("DB_BACKEND", "postgres")
+    with pytest.raises(ValueError):
+        storage_from_env()
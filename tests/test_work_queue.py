@@ -0,0 +1,40 @@
+import threading
+
+from workQueue import PRIORITY_DEFAULT, PRIORITY_TRIGGER, WorkQueue
+
+
+def test_trigger_jobs_run_before_queued_default_jobs():
+    work = WorkQueue(workers=1, max_size=10)
+    gate = threading.Event()
+    order = []
+    work.submit(gate.wait)   # occupies the only worker while the others queue up
+    for i in range(3):
+        work.submit(order.append, f"default-{i}", priority=PRIORITY_DEFAULT)
+    work.submit(order.append, "trigger", priority=PRIORITY_TRIGGER, has_trigger=True)
+    gate.set()
+    work._queue.join()
+    assert order == ["trigger", "default-0", "default-1", "default-2"]
+
+
+def test_full_queue_rejects_instead_of_blocking():
+    work = WorkQueue(workers=1, max_size=1)
+    gate = threading.Event()
+    started = threading.Event()
+    work.submit(lambda: (started.set(), gate.wait()))
+    started.wait()
+    assert work.submit(int)
+    assert not work.submit(int)
+    gate.set()
+    work._queue.join()
+    assert work.stats()["rejected"] == 1
+
+
+def test_a_failing_job_does_not_stop_the_worker():
+    work = WorkQueue(workers=1, max_size=10)
+    done = []
+    work.submit(lambda: 1 / 0)
+    work.submit(done.append, True)
+    work._queue.join()
+    stats = work.stats()
+    assert done == [True]
+    assert stats["failed"] == 1 and stats["completed"] == 1
@@ -0,0 +1,110 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ttlCache import TTLCache
+
+
+def _entry_from_user(user):
+    # Keep just what the bot renders: display name and avatar URLs
+    profile = user.get("profile", {})
+    return {
+        "id": user["id"],
+        "real_name": user.get("real_name") or profile.get("real_name") or "User",
+        "image_48": profile.get("image_48"),
+        "image_192": profile.get("image_192"),
+        "image_512": profile.get("image_512"),
+        "deleted": user.get("deleted", False),
+    }
+
+
+# Local cache of the workspace's users, so rendering a name or avatar doesn't cost a users.info call.
+# Warmed in bulk from users.list, kept current from user_change/team_join events, and
+# served stale-while-revalidate: entries older than ttl are still returned (up to stale_ttl)
+# while a background users.info refresh runs. At most max_size users are kept (LRU), and
+# entries are dropped once they pass stale_ttl.
+class UserDirectory:
+    def __init__(self, client, ttl=None, stale_ttl=None, max_size=None):
+        self.client = client
+        self.ttl = ttl if ttl is not None else float(os.environ.get("USER_DIRECTORY_TTL", 3600))
+        self.stale_ttl = stale_ttl if stale_ttl is not None else float(os.environ.get("USER_DIRECTORY_STALE_TTL", 86400))
+        self.max_size = max_size or int(os.environ.get("USER_DIRECTORY_SIZE", 50000))
+        self._entries = TTLCache(max_size=self.max_size, ttl=self.stale_ttl)   # user_id -> (entry, fetched_at)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="user-directory")
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "warmed": 0}
+
+    def _store(self, entry):
+        self._entries.set(entry["id"], (entry, time.monotonic()))
+
+    def warm(self):
+        # Bulk load every user with paginated users.list calls
+        cursor = None
+        loaded = 0
+        try:
+            while True:
+                response = self.client.users_list(limit=200, cursor=cursor)
+                for user in response["members"]:
+                    self._store(_entry_from_user(user))
+                    loaded += 1
+                cursor = response.get("response_metadata", {}).get("next_cursor")
+                if not cursor:
+                    break
+        except Exception as e:
+            print(f"Error warming user directory: {e}")
+        with self._lock:
+            self._stats["warmed"] += loaded
+        return loaded
+
+    def update_from_user(self, user):
+        # user_change and team_join events carry the full user object
+        self._store(_entry_from_user(user))
+
+    def _fetch(self, user_id):
+        user_info = self.client.users_info(user=user_id)
+        entry = _entry_from_user(user_info["user"])
+        self._store(entry)
+        return entry
+
+    def _refresh(self, user_id):
+        try:
+            self._fetch(user_id)
+        except Exception as e:
+            print(f"Error refreshing user {user_id}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(user_id)
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached is not None:
+                entry, fetched_at = cached
+                age = now - fetched_at
+                if age < self.ttl:
+                    self._stats["hits"] += 1
+                    return entry
+                if age < self.stale_ttl:
+                    self._stats["stale_hits"] += 1
+                    if user_id not in self._refreshing:
+                        self._refreshing.add(user_id)
+                        self._stats["refreshes"] += 1
+                        # Carry the caller's context so the refresh uses the same workspace's client
+                        self._refresher.submit(contextvars.copy_context().run, self._refresh, user_id)
+                    return entry
+            self._stats["misses"] += 1
+        return self._fetch(user_id)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        cache = self._entries.stats()
+        stats["size"] = cache["size"]
+        stats["max_size"] = self.max_size
+        stats["evictions"] = cache["evictions"]
+        stats["expirations"] = cache["expirations"]
+        return stats
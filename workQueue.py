@@ -0,0 +1,83 @@
+import itertools
+import queue
+import threading
+import time
+
+# Jobs carrying a trigger_id (views.open) go first: Slack expires triggers after 3 seconds
+PRIORITY_TRIGGER = 0
+PRIORITY_DEFAULT = 1
+TRIGGER_TTL = 3.0
+
+
+# Bounded priority queue drained by a fixed pool of worker threads.
+# Records queue depth and per-job wait/run latency for stats().
+class WorkQueue:
+    def __init__(self, workers=8, max_size=1000, name="work"):
+        self.name = name
+        self._queue = queue.PriorityQueue(maxsize=max_size)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "rejected": 0,
+            "completed": 0,
+            "failed": 0,
+            "expired_triggers": 0,
+            "max_depth": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "run_time_total": 0.0,
+            "run_time_max": 0.0,
+        }
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"{name}-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, func, *args, priority=PRIORITY_DEFAULT, has_trigger=False, **kwargs):
+        # Returns False when the queue is full so the caller can run the job inline instead
+        job = (priority, next(self._sequence), time.monotonic(), has_trigger, func, args, kwargs)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._stats["rejected"] += 1
+            return False
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["max_depth"] = max(self._stats["max_depth"], self._queue.qsize())
+        return True
+
+    def _worker(self):
+        while True:
+            priority, _, enqueued_at, has_trigger, func, args, kwargs = self._queue.get()
+            started_at = time.monotonic()
+            waited = started_at - enqueued_at
+            failed = False
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                failed = True
+                print(f"Error running {self.name} job {getattr(func, '__name__', func)}: {e}")
+            finally:
+                ran = time.monotonic() - started_at
+                with self._lock:
+                    self._stats["failed" if failed else "completed"] += 1
+                    self._stats["wait_time_total"] += waited
+                    self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+                    self._stats["run_time_total"] += ran
+                    self._stats["run_time_max"] = max(self._stats["run_time_max"], ran)
+                    if has_trigger and waited > TRIGGER_TTL:
+                        self._stats["expired_triggers"] += 1
+                self._queue.task_done()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["depth"] = self._queue.qsize()
+        stats["workers"] = len(self._threads)
+        finished = stats["completed"] + stats["failed"]
+        stats["wait_time_avg"] = stats["wait_time_total"] / finished if finished else 0.0
+        stats["run_time_avg"] = stats["run_time_total"] / finished if finished else 0.0
+        return stats